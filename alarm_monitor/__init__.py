@@ -0,0 +1 @@
+# Alarm Monitor Module
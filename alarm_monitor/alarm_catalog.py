@@ -0,0 +1,73 @@
+"""
+Alarm catalog for the alarm monitor
+
+Which alarms each machine type publishes on plc/{machine_id}/{type}/alarms,
+as (payload key, alarm type) pairs; the alarm type is the UI/InfluxDB name
+used in ALARM_RESPONSE_MANUAL.md. ALARM_CATALOG_FILE can replace or add
+machine types with a JSON file of the same shape:
+
+    {"bottlefiller": {"Overfill": "AlarmOverfill", ...}, "mixer": {"over_temp": "AlarmOverTemp"}}
+
+The catalog is loaded once and each machine type is compiled into an
+extractor that turns a payload into a bitmask (bit i = i-th alarm true), the
+same way the writer's decoders are compiled. Transition checks then work on
+the XOR of two ints, whatever the number of alarm types.
+"""
+import json
+
+CATALOG = {
+    "bottlefiller": (
+        ("Overfill", "AlarmOverfill"),
+        ("Underfill", "AlarmUnderfill"),
+        ("LowProductLevel", "AlarmLowProductLevel"),
+        ("CapMissing", "AlarmCapMissing"),
+    ),
+    "lathe": (
+        ("spindle_overload", "AlarmSpindleOverload"),
+        ("chuck_not_clamped", "AlarmChuckNotClamped"),
+        ("door_open", "AlarmDoorOpen"),
+        ("tool_wear", "AlarmToolWear"),
+        ("coolant_low", "AlarmCoolantLow"),
+    ),
+}
+
+_MISSING = object()
+
+
+class AlarmSet:
+    def __init__(self, machine_type, alarms):
+        """alarms: ordered (payload key, alarm type) pairs; the position is the bit"""
+        self.machine_type = machine_type
+        self.keys = tuple(key for key, _ in alarms)
+        self.alarm_types = tuple(alarm_type for _, alarm_type in alarms)
+        self.extract = self._compile(self.keys)
+
+    @staticmethod
+    def _compile(keys):
+        """
+        Build extract(payload) -> (mask, present): bit i of mask is set when
+        keys[i] is truthy, bit i of present when keys[i] is in the payload
+        """
+        lines = ["def extract(payload):", "    mask = present = 0"]
+        for bit, key in enumerate(keys):
+            lines += [
+                f"    value = payload.get({key!r}, _MISSING)",
+                f"    if value is not _MISSING:",
+                f"        present |= {1 << bit}",
+                f"        if value:",
+                f"            mask |= {1 << bit}",
+            ]
+        lines.append("    return mask, present")
+        namespace = {"_MISSING": _MISSING}
+        exec("\n".join(lines), namespace)
+        return namespace["extract"]
+
+
+def load_catalog(path=None):
+    """{machine_type: AlarmSet} from CATALOG, overlaid with the JSON file at path"""
+    table = {machine_type: list(alarms) for machine_type, alarms in CATALOG.items()}
+    if path:
+        with open(path, "r") as f:
+            for machine_type, alarms in json.load(f).items():
+                table[machine_type] = list(alarms.items())
+    return {machine_type: AlarmSet(machine_type, alarms) for machine_type, alarms in table.items()}
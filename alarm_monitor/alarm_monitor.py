@@ -4,20 +4,41 @@ Alarm Monitor - Subscribes to MQTT and tracks alarm state transitions
 Stores alarm events with timestamps for real-time display
 Broadcasts alarm changes via WebSocket for real-time UI notifications
 Saves alarm events to InfluxDB for persistent storage
+
+ALARM_MONITOR_MODE=asyncio runs MQTT ingestion, transition detection, the
+event log and WebSocket fan-out on a single event loop: on_message puts
+messages on a bounded inbox queue that one task drains, and broadcasts go
+straight to the client queues. The default (threaded) runs paho's
+loop_forever on the main thread and WebSockets on a second thread.
 """
 import asyncio
 import paho.mqtt.client as mqtt
 import json
 import os
 import ssl
+import sys
+import time
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 import websockets
 from threading import Thread
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alarm_monitor.event_log import AlarmEventLog
+from alarm_monitor.alarm_catalog import load_catalog
+from alarm_monitor.alarm_stream import AlarmStream, alarm_message, encode_alarm_event, event_keys
+from alarm_monitor.debounce import AlarmDebouncer
+from alarm_monitor.fanout import Broadcaster, DIMENSIONS
+from alarm_monitor.mqtt_asyncio import AsyncioMqtt
+from influxdb_writer.batch_writer import BatchWriter
+from influxdb_writer.line_protocol import LineProtocolEncoder
+from influxdb_writer.metrics import MetricsRegistry
+from influxdb_writer.spool import Spool
+
 # MQTT Configuration
 MQTT_BROKER = os.getenv("MQTT_BROKER_HOST", "localhost")
 MQTT_PORT = int(os.getenv("MQTT_BROKER_PORT", "8883"))
@@ -29,13 +50,21 @@ MQTT_TLS_ENABLED = os.getenv("MQTT_TLS_ENABLED", "true").lower() == "true"
 CA_CERT_PATH = os.getenv("CA_CERT_PATH", "mosquitto/config/certs/ca.crt")
 MQTT_TLS_CHECK_HOSTNAME = os.getenv("MQTT_TLS_CHECK_HOSTNAME", "false").lower() == "true"
 
+# Threading model: threaded (MQTT and WebSocket loops on separate threads) | asyncio (one event loop)
+ALARM_MONITOR_MODE = os.getenv("ALARM_MONITOR_MODE", "threaded").lower()
+ALARM_INBOX_SIZE = int(os.getenv("ALARM_INBOX_SIZE", "10000"))  # asyncio mode: MQTT messages waiting to be processed
+
 # WebSocket Configuration
 WS_HOST = os.getenv("WS_HOST", "0.0.0.0")
 WS_PORT = int(os.getenv("WS_PORT", "8765"))
+WS_CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE_SIZE", "256"))  # Outbound messages buffered per client
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")  # drop_oldest | disconnect
 
-# Alarm event storage (for debugging/verification)
-ALARM_EVENTS_FILE = os.getenv("ALARM_EVENTS_FILE", "/tmp/alarm_events.json")
-MAX_EVENTS = 1000  # Keep last 1000 events
+# Alarm event storage: append-only JSON-lines segments (for debugging/verification)
+ALARM_EVENTS_DIR = os.getenv("ALARM_EVENTS_DIR", "/tmp/alarm_events")
+ALARM_EVENTS_SEGMENT_MB = float(os.getenv("ALARM_EVENTS_SEGMENT_MB", "8"))
+ALARM_EVENTS_MAX_MB = float(os.getenv("ALARM_EVENTS_MAX_MB", "1024"))  # Oldest segments are deleted past this
+MAX_EVENTS = 1000  # Recent events kept in memory
 
 # InfluxDB Configuration for alarm events
 INFLUXDB_URL = os.getenv("INFLUXDB_URL", "http://localhost:8086")
@@ -43,171 +72,141 @@ INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token")
 INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "myorg")
 INFLUXDB_BUCKET_ALARMS = os.getenv("INFLUXDB_BUCKET_ALARMS", "alarm_events")  # Separate bucket for alarms
 
-# Track previous alarm states per machine
-previous_alarms = {}
+# Background alarm persistence (batched, retried from a disk spool while InfluxDB is down)
+ALARM_WRITER_BATCH_SIZE = int(os.getenv("ALARM_WRITER_BATCH_SIZE", "100"))
+ALARM_WRITER_FLUSH_INTERVAL = float(os.getenv("ALARM_WRITER_FLUSH_INTERVAL", "0.5"))  # seconds
+ALARM_WRITER_QUEUE_SIZE = int(os.getenv("ALARM_WRITER_QUEUE_SIZE", "10000"))
+ALARM_SPOOL_DIR = os.getenv("ALARM_SPOOL_DIR", "/tmp/alarm_monitor_spool")  # empty disables retry
+
+# Prometheus metrics endpoint (0 disables)
+ALARM_METRICS_PORT = int(os.getenv("ALARM_METRICS_PORT", "9109"))
+
+# Alarm debouncing / flap suppression (all 0: report every raw change immediately)
+ALARM_ON_DELAY = float(os.getenv("ALARM_ON_DELAY", "0"))  # seconds an alarm must stay true before RAISED
+ALARM_OFF_DELAY = float(os.getenv("ALARM_OFF_DELAY", "0"))  # seconds it must stay false before CLEARED
+ALARM_FLAP_COUNT = int(os.getenv("ALARM_FLAP_COUNT", "0"))  # toggles within ALARM_FLAP_WINDOW that mean FLAPPING
+ALARM_FLAP_WINDOW = float(os.getenv("ALARM_FLAP_WINDOW", "60"))
+ALARM_FLAP_CLEAR = float(os.getenv("ALARM_FLAP_CLEAR", "120"))  # quiet seconds before a flapping alarm settles
+
+# Alarms per machine type (alarm_catalog.py, optionally overlaid from a JSON file)
+ALARM_CATALOG_FILE = os.getenv("ALARM_CATALOG_FILE", "")
+catalog = load_catalog(ALARM_CATALOG_FILE or None)
+
+# Alarm state per (machine, alarm)
+debouncer = AlarmDebouncer(ALARM_ON_DELAY, ALARM_OFF_DELAY, ALARM_FLAP_WINDOW, ALARM_FLAP_COUNT, ALARM_FLAP_CLEAR)
 
-# WebSocket connected clients
-connected_clients = set()
 
 # Global event loop for WebSocket (will be set in main)
 ws_loop = None
 
+# asyncio mode: MQTT messages waiting for the processing task (will be set in main)
+inbox = None
+inbox_dropped = 0
+
 # InfluxDB client for alarm events (will be initialized in main)
 _influx_client = None
 _influx_write_api = None
+_alarm_writer = None
+_alarm_encoder = LineProtocolEncoder("alarm_events")
 
-def load_alarm_events():
-    """Load alarm events from file"""
-    if os.path.exists(ALARM_EVENTS_FILE):
-        try:
-            with open(ALARM_EVENTS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+# Metrics
+metrics = MetricsRegistry()
+m_alarm_events = metrics.counter("alarm_events_total", "Alarm transitions recorded", ("state",))
+m_broadcast_delay = metrics.histogram("alarm_broadcast_delay_seconds",
+                                      "Delay from MQTT receive to the alarm being sent to a WebSocket client")
+
+# WebSocket connected clients, each with its own bounded queue and sender task
+broadcaster = Broadcaster(
+    queue_size=WS_CLIENT_QUEUE_SIZE,
+    policy=WS_SLOW_CLIENT_POLICY,
+    on_sent=lambda received: m_broadcast_delay.observe(value=time.perf_counter() - received)
+)
+metrics.gauge("alarm_ws_clients", "Connected WebSocket clients", callback=lambda: len(broadcaster))
+metrics.gauge("alarm_ws_queued", "Messages waiting in WebSocket client queues", callback=lambda: broadcaster.queued)
+metrics.counter("alarm_ws_dropped_total", "Messages dropped for slow WebSocket clients",
+                callback=lambda: broadcaster.dropped)
+metrics.counter("alarm_ws_slow_disconnects_total", "WebSocket clients disconnected for being too slow",
+                callback=lambda: broadcaster.disconnected)
+metrics.gauge("alarm_inbox_depth", "MQTT messages waiting to be processed (asyncio mode)",
+              callback=lambda: inbox.qsize() if inbox is not None else 0)
+metrics.counter("alarm_inbox_dropped_total", "MQTT messages dropped because the inbox was full (asyncio mode)",
+                callback=lambda: inbox_dropped)
+metrics.gauge("alarm_influx_queue_depth", "Alarm events waiting to be written to InfluxDB",
+              callback=lambda: _alarm_writer.queue.qsize() if _alarm_writer else 0)
+metrics.counter("alarm_influx_written_total", "Alarm events written to InfluxDB",
+                callback=lambda: _alarm_writer.written if _alarm_writer else 0)
+metrics.counter("alarm_influx_dropped_total", "Alarm events dropped because the write queue was full",
+                callback=lambda: _alarm_writer.dropped if _alarm_writer else 0)
+
+# Alarm event log and sequenced stream state (will be initialized in main)
+event_log = None
+alarm_stream = AlarmStream()
 
 def save_alarm_to_influxdb(event):
-    """Save alarm event to InfluxDB for persistent storage"""
-    global _influx_write_api
-    
-    if _influx_write_api is None:
+    """Queue alarm event for the background InfluxDB writer (never blocks the MQTT loop)"""
+    if _alarm_writer is None:
         return  # InfluxDB not initialized, skip silently
     
     try:
-        # Parse timestamp
-        timestamp = datetime.fromisoformat(event["timestamp"].replace('Z', '+00:00'))
-        
-        # Create InfluxDB point
-        point = Point("alarm_events") \
-            .tag("machine_id", event["machine_id"]) \
-            .tag("alarm_type", event["alarm_type"]) \
-            .tag("alarm_name", event.get("alarm_name", event["alarm_type"])) \
-            .tag("state", event["state"]) \
-            .field("value", event["value"]) \
-            .field("alarm_label", event.get("alarm_label", event["alarm_type"])) \
-            .time(timestamp)
-        
-        # Write to InfluxDB
-        _influx_write_api.write(bucket=INFLUXDB_BUCKET_ALARMS, record=point)
-        print(f"💾 Saved alarm event to InfluxDB: {event['machine_id']} - {event['alarm_type']} ({event['state']})")
+        line = encode_alarm_event(_alarm_encoder, event)
     except Exception as e:
-        print(f"⚠️  Error saving alarm to InfluxDB: {e}")
+        print(f"⚠️  Error encoding alarm event for InfluxDB: {e}")
+        return
+    if not _alarm_writer.submit(line, event["machine_id"]):
+        print(f"⚠️  Alarm write queue full ({ALARM_WRITER_QUEUE_SIZE}), dropping InfluxDB event for {event['machine_id']}")
 
 def save_alarm_event(event):
-    """Save alarm event to file (append) - for debugging/verification"""
-    events = load_alarm_events()
-    events.append(event)
-    
-    # Keep only last MAX_EVENTS
-    if len(events) > MAX_EVENTS:
-        events = events[-MAX_EVENTS:]
-    
-    with open(ALARM_EVENTS_FILE, 'w') as f:
-        json.dump(events, f, indent=2)
+    """Number the event, update the active alarm set and append it to the event log"""
+    alarm_stream.record(event)
     
     # Also save to InfluxDB for persistent storage
     save_alarm_to_influxdb(event)
 
-async def broadcast_alarm(message):
-    """Broadcast alarm event to all connected WebSocket clients"""
-    if connected_clients:
-        # Create tasks for all clients
-        disconnected = set()
-        for client in connected_clients:
-            try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.add(client)
-            except Exception as e:
-                print(f"⚠️  Error broadcasting to client: {e}")
-                disconnected.add(client)
-        
-        # Remove disconnected clients
-        connected_clients.difference_update(disconnected)
+async def broadcast_alarm(message, received=None, keys=None):
+    """
+    Queue alarm event for subscribed WebSocket clients (received: perf_counter
+    at MQTT receive; keys: (machine_id, machine_type, alarm_type))
+    """
+    broadcaster.broadcast(message, received, keys)
 
-def check_alarm_transitions(machine_id, alarms, timestamp, machine_type="bottlefiller"):
+def check_alarm_transitions(machine_id, mask, alarm_set, received=None):
     """Check for alarm state transitions and record events"""
-    global previous_alarms
-    
-    # Map alarm names from MQTT to display names based on machine type
-    if machine_type == "lathe":
-        alarm_map = {
-            "spindle_overload": "AlarmSpindleOverload",
-            "chuck_not_clamped": "AlarmChuckNotClamped",
-            "door_open": "AlarmDoorOpen",
-            "tool_wear": "AlarmToolWear",
-            "coolant_low": "AlarmCoolantLow",
-        }
-    else:  # bottlefiller
-        alarm_map = {
-            "Overfill": "AlarmOverfill",
-            "Underfill": "AlarmUnderfill",
-            "LowProductLevel": "AlarmLowProductLevel",
-            "CapMissing": "AlarmCapMissing",
+    # Feed the raw alarm bitmask through the debounce/flap state machine
+    timestamp = None
+    for bit, state in debouncer.update_mask(machine_id, mask, time.monotonic()):
+        alarm_key = alarm_set.keys[bit]
+        alarm_name = alarm_set.alarm_types[bit]
+        if timestamp is None:
+            # Alarms topic doesn't have a timestamp, use current time in ISO format with Z suffix
+            # (timezone info removed before adding Z to avoid +00:00Z)
+            timestamp = datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+        
+        event = {
+            "timestamp": timestamp,
+            "machine_id": machine_id,
+            "alarm_name": alarm_key,  # Original name from MQTT
+            "alarm_type": alarm_name,  # Mapped name for UI
+            "alarm_label": alarm_key,
+            "machine_type": alarm_set.machine_type,
+            "state": state,  # RAISED, CLEARED or FLAPPING
+            "value": state != "CLEARED"
         }
-    
-    # Get previous state for this machine
-    prev = previous_alarms.get(machine_id, {})
-    
-    # Check each alarm for transitions
-    for alarm_key, alarm_name in alarm_map.items():
-        current_value = alarms.get(alarm_key, False)
-        prev_value = prev.get(alarm_key, False)
+        save_alarm_event(event)  # Keep for debugging
+        m_alarm_events.inc(state)
         
-        # Detect transition: false -> true (alarm raised)
-        if not prev_value and current_value:
-            event = {
-                "timestamp": timestamp,
-                "machine_id": machine_id,
-                "alarm_name": alarm_key,  # Original name from MQTT
-                "alarm_type": alarm_name,  # Mapped name for UI
-                "alarm_label": alarm_key,
-                "state": "RAISED",
-                "value": True
-            }
-            save_alarm_event(event)  # Keep for debugging
-            
-            # Broadcast via WebSocket
-            ws_message = json.dumps({
-                "machine_id": machine_id,
-                "alarm_name": alarm_key,
-                "alarm_type": alarm_name,
-                "state": "RAISED",
-                "timestamp": timestamp
-            })
-            if ws_loop is not None:
-                asyncio.run_coroutine_threadsafe(broadcast_alarm(ws_message), ws_loop)
-            
-            print(f"🚨 ALARM RAISED: {machine_id} - {alarm_name} at {timestamp}")
+        # Broadcast via WebSocket
+        ws_message = json.dumps(alarm_message(event))
+        if inbox is not None:
+            broadcaster.broadcast(ws_message, received, event_keys(event))  # already on the WebSocket loop
+        elif ws_loop is not None:
+            asyncio.run_coroutine_threadsafe(broadcast_alarm(ws_message, received, event_keys(event)), ws_loop)
         
-        # Detect transition: true -> false (alarm cleared)
-        elif prev_value and not current_value:
-            event = {
-                "timestamp": timestamp,
-                "machine_id": machine_id,
-                "alarm_name": alarm_key,
-                "alarm_type": alarm_name,
-                "alarm_label": alarm_key,
-                "state": "CLEARED",
-                "value": False
-            }
-            save_alarm_event(event)  # Keep for debugging
-            
-            # Broadcast via WebSocket
-            ws_message = json.dumps({
-                "machine_id": machine_id,
-                "alarm_name": alarm_key,
-                "alarm_type": alarm_name,
-                "state": "CLEARED",
-                "timestamp": timestamp
-            })
-            if ws_loop is not None:
-                asyncio.run_coroutine_threadsafe(broadcast_alarm(ws_message), ws_loop)
-            
+        if state == "RAISED":
+            print(f"🚨 ALARM RAISED: {machine_id} - {alarm_name} at {timestamp}")
+        elif state == "FLAPPING":
+            print(f"〰️  ALARM FLAPPING: {machine_id} - {alarm_name} at {timestamp}")
+        else:
             print(f"✅ ALARM CLEARED: {machine_id} - {alarm_name} at {timestamp}")
-    
-    # Update previous state
-    previous_alarms[machine_id] = alarms.copy()
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -219,77 +218,95 @@ def on_connect(client, userdata, flags, rc):
     else:
         print(f"❌ Failed to connect, return code {rc}")
 
-def on_message(client, userdata, msg):
+def process_message(topic, raw, received=None):
+    """Decode an alarms message and check it for transitions"""
     try:
-        payload = json.loads(msg.payload.decode())
-        topic = msg.topic
+        payload = json.loads(raw.decode())
         
-        # Determine machine type from topic
-        machine_type = "lathe" if "/lathe/alarms" in topic else "bottlefiller"
-        
-        # Extract machine_id from topic: plc/{machine_id}/bottlefiller/alarms or plc/{machine_id}/lathe/alarms
+        # Topic: plc/{machine_id}/{machine_type}/alarms
         parts = topic.split('/')
-        if len(parts) >= 2:
-            machine_id = parts[1]
-        else:
-            machine_id = "unknown"
-        
-        # Get timestamp (alarms topic doesn't have timestamp, use current time)
-        # Use ISO format with Z suffix (UTC timezone indicator)
-        # Remove timezone info before adding Z to avoid +00:00Z (invalid format)
-        utc_now = datetime.now(timezone.utc)
-        timestamp = utc_now.replace(tzinfo=None).isoformat() + "Z"
+        machine_id = parts[1] if len(parts) >= 2 else "unknown"
+        machine_type = parts[2] if len(parts) >= 3 else "bottlefiller"
+        alarm_set = catalog.get(machine_type) or catalog["bottlefiller"]
         
-        # Payload from alarms topic is directly the alarms object
-        alarms = {}
-        
-        if machine_type == "lathe":
-            # Map lathe alarm names from MQTT to our tracking format
-            if "spindle_overload" in payload:
-                alarms["spindle_overload"] = payload["spindle_overload"]
-            if "chuck_not_clamped" in payload:
-                alarms["chuck_not_clamped"] = payload["chuck_not_clamped"]
-            if "door_open" in payload:
-                alarms["door_open"] = payload["door_open"]
-            if "tool_wear" in payload:
-                alarms["tool_wear"] = payload["tool_wear"]
-            if "coolant_low" in payload:
-                alarms["coolant_low"] = payload["coolant_low"]
-        else:  # bottlefiller
-            # Map alarm names from MQTT to our tracking format
-            if "LowProductLevel" in payload:
-                alarms["LowProductLevel"] = payload["LowProductLevel"]
-            if "Overfill" in payload:
-                alarms["Overfill"] = payload["Overfill"]
-            if "Underfill" in payload:
-                alarms["Underfill"] = payload["Underfill"]
-            if "CapMissing" in payload:
-                alarms["CapMissing"] = payload["CapMissing"]
-        # NoBottle is in MQTT but we don't track it
-        
-        # Check for alarm transitions
-        if alarms:
-            check_alarm_transitions(machine_id, alarms, timestamp, machine_type)
+        # Payload from alarms topic is directly the alarms object; keys outside
+        # the catalog (e.g. NoBottle) are not tracked
+        mask, present = alarm_set.extract(payload)
+        if present:
+            check_alarm_transitions(machine_id, mask, alarm_set, received)
             
     except json.JSONDecodeError:
         pass
     except Exception as e:
         print(f"❌ Error processing message: {e}")
 
+def on_message(client, userdata, msg):
+    process_message(msg.topic, msg.payload, time.perf_counter())
+
+def on_message_async(client, userdata, msg):
+    """asyncio mode: runs on the event loop; hands the message to process_inbox"""
+    global inbox_dropped
+    try:
+        inbox.put_nowait((msg.topic, msg.payload, time.perf_counter()))
+    except asyncio.QueueFull:
+        inbox_dropped += 1
+        if inbox_dropped % 1000 == 1:
+            print(f"⚠️  Alarm inbox full ({ALARM_INBOX_SIZE}), dropped {inbox_dropped} MQTT messages so far")
+
+async def process_inbox():
+    """asyncio mode: the only place alarm state is touched"""
+    while True:
+        topic, raw, received = await inbox.get()
+        process_message(topic, raw, received)
+
+def handle_client_message(websocket, raw):
+    """
+    Apply a subscribe message:
+    {"type": "subscribe", "machine_ids": [...], "machine_types": [...], "alarm_types": [...], "resume_from": seq, "epoch": epoch}
+    then send the matching replay (if resume_from is from this epoch and still in the ring buffer) or snapshot
+    """
+    try:
+        message = json.loads(raw)
+    except (TypeError, ValueError):
+        return
+    if not isinstance(message, dict) or message.get("type") != "subscribe":
+        return
+    filters = []
+    for name in DIMENSIONS:
+        keys = message.get(name)
+        filters.append([str(key) for key in keys] if isinstance(keys, list) else None)
+    broadcaster.subscribe(websocket, *filters)
+    ack = {"type": "subscribed"}
+    ack.update((name, keys or []) for name, keys in zip(DIMENSIONS, filters))
+    if not broadcaster.send(websocket, json.dumps(ack)):
+        return  # queue full: the client was closed and will get a snapshot when it reconnects
+    
+    accepts = broadcaster.filter_for(websocket)
+    state = None
+    resume_from = message.get("resume_from")
+    if isinstance(resume_from, int):
+        epoch = message.get("epoch")
+        state = alarm_stream.replay(resume_from, accepts, epoch if isinstance(epoch, str) else None)
+    if state is None:
+        state = alarm_stream.snapshot(accepts)
+    broadcaster.send(websocket, json.dumps(state))
+
 # WebSocket server handler
 async def websocket_handler(websocket, path=None):
     """Handle new WebSocket connection"""
-    connected_clients.add(websocket)
-    print(f"🔌 WebSocket client connected. Total clients: {len(connected_clients)}")
+    broadcaster.add(websocket)
+    broadcaster.send(websocket, json.dumps(alarm_stream.snapshot()))
+    print(f"🔌 WebSocket client connected. Total clients: {len(broadcaster)}")
     
     try:
-        # Keep connection alive
-        await websocket.wait_closed()
+        # Keep connection alive; clients may send subscribe messages
+        async for raw in websocket:
+            handle_client_message(websocket, raw)
     except websockets.exceptions.ConnectionClosed:
         pass
     finally:
-        connected_clients.remove(websocket)
-        print(f"🔌 WebSocket client disconnected. Total clients: {len(connected_clients)}")
+        broadcaster.remove(websocket)
+        print(f"🔌 WebSocket client disconnected. Total clients: {len(broadcaster)}")
 
 async def start_websocket_server():
     """Start WebSocket server"""
@@ -297,6 +314,21 @@ async def start_websocket_server():
         print(f"🌐 WebSocket server started on ws://{WS_HOST}:{WS_PORT}")
         await asyncio.Future()  # Run forever
 
+async def run_single_loop():
+    """asyncio mode: MQTT, alarm processing and the WebSocket server on one event loop"""
+    global ws_loop, inbox
+    ws_loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue(maxsize=ALARM_INBOX_SIZE)
+    client.on_message = on_message_async
+    mqtt_loop = AsyncioMqtt(ws_loop, client)
+    async with websockets.serve(websocket_handler, WS_HOST, WS_PORT):
+        print(f"🌐 WebSocket server started on ws://{WS_HOST}:{WS_PORT}")
+        processor = asyncio.create_task(process_inbox())
+        try:
+            await mqtt_loop.run_forever(MQTT_BROKER, MQTT_PORT, 60)
+        finally:
+            processor.cancel()
+
 def run_websocket_server():
     """Run WebSocket server in a separate thread"""
     global ws_loop
@@ -328,9 +360,23 @@ if __name__ == "__main__":
     print("🚨 Alarm Monitor starting...")
     print(f"🔗 Connecting to {MQTT_BROKER}:{MQTT_PORT}")
     print(f"📡 Topics: {MQTT_TOPIC_BOTTLEFILLER} and {MQTT_TOPIC_LATHE}")
-    print(f"💾 Events file: {ALARM_EVENTS_FILE} (for debugging)")
+    print(f"💾 Events log: {ALARM_EVENTS_DIR} (for debugging)")
     print(f"🌐 WebSocket: ws://{WS_HOST}:{WS_PORT}")
-    print(f"⚠️  Tracking: Overfill, Underfill, LowProductLevel, CapMissing\n")
+    for machine_type, alarm_set in catalog.items():
+        print(f"⚠️  Tracking ({machine_type}): {', '.join(alarm_set.keys)}")
+    print(f"🧵 Mode: {ALARM_MONITOR_MODE}")
+    print(f"⏱️  Debounce: on-delay {ALARM_ON_DELAY}s, off-delay {ALARM_OFF_DELAY}s, "
+          f"flapping at {ALARM_FLAP_COUNT or 'off'} toggles / {ALARM_FLAP_WINDOW:.0f}s\n")
+    
+    event_log = AlarmEventLog(
+        ALARM_EVENTS_DIR,
+        segment_bytes=int(ALARM_EVENTS_SEGMENT_MB * 1024 * 1024),
+        max_bytes=int(ALARM_EVENTS_MAX_MB * 1024 * 1024),
+        ring_size=MAX_EVENTS
+    )
+    alarm_stream = AlarmStream(event_log)
+    print(f"   {len(event_log.ring)} recent events loaded, {event_log.total_bytes} bytes on disk, "
+          f"next seq {alarm_stream.seq + 1}\n")
     
     # Initialize InfluxDB client for alarm events
     print(f"🔗 Connecting to InfluxDB for alarm storage...")
@@ -341,28 +387,51 @@ if __name__ == "__main__":
             org=INFLUXDB_ORG
         )
         _influx_write_api = _influx_client.write_api(write_options=SYNCHRONOUS)
+        _alarm_writer = BatchWriter(
+            _influx_write_api,
+            INFLUXDB_BUCKET_ALARMS,
+            batch_size=ALARM_WRITER_BATCH_SIZE,
+            flush_interval=ALARM_WRITER_FLUSH_INTERVAL,
+            queue_size=ALARM_WRITER_QUEUE_SIZE,
+            spool=Spool(ALARM_SPOOL_DIR) if ALARM_SPOOL_DIR else None
+        ).start()
         print(f"✅ Connected to InfluxDB")
-        print(f"   Bucket: {INFLUXDB_BUCKET_ALARMS}\n")
+        print(f"   Bucket: {INFLUXDB_BUCKET_ALARMS}")
+        print(f"   Batching: {ALARM_WRITER_BATCH_SIZE} events / {ALARM_WRITER_FLUSH_INTERVAL}s, "
+              f"retry spool: {ALARM_SPOOL_DIR or 'disabled'}\n")
     except Exception as e:
-        print(f"⚠️  InfluxDB connection error (alarms will still be saved to file): {e}")
+        print(f"⚠️  InfluxDB connection error (alarms will still be saved to the event log): {e}")
         print(f"   Continuing without InfluxDB storage...\n")
         _influx_client = None
         _influx_write_api = None
+        _alarm_writer = None
     
-    # Start WebSocket server in a separate thread
-    ws_thread = Thread(target=run_websocket_server, daemon=True)
-    ws_thread.start()
-    
-    # Give WebSocket server time to start
-    import time
-    time.sleep(1)
+    if ALARM_METRICS_PORT:
+        try:
+            metrics.serve(ALARM_METRICS_PORT)
+            print(f"📈 Metrics: http://0.0.0.0:{ALARM_METRICS_PORT}/metrics\n")
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint disabled, could not listen on port {ALARM_METRICS_PORT}: {e}\n")
     
     try:
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        client.loop_forever()
+        if ALARM_MONITOR_MODE == "asyncio":
+            asyncio.run(run_single_loop())
+        else:
+            # Start WebSocket server in a separate thread
+            ws_thread = Thread(target=run_websocket_server, daemon=True)
+            ws_thread.start()
+            
+            # Give WebSocket server time to start
+            time.sleep(1)
+            
+            client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            client.loop_forever()
     except KeyboardInterrupt:
         print("\n🛑 Stopping alarm monitor...")
         client.disconnect()
+        event_log.close()
+        if _alarm_writer is not None:
+            _alarm_writer.stop()
     except Exception as e:
         print(f"❌ Error: {e}")
         exit(1)
@@ -0,0 +1,113 @@
+"""
+Sequenced alarm stream: snapshot on connect and resume from a sequence number
+
+Every recorded event gets the next sequence number (continuing from the event
+log after a restart) and updates the in-memory set of active alarms per
+machine. A WebSocket client gets:
+
+- on connect, and after each subscribe: a snapshot of the active alarms
+    {"type": "snapshot", "epoch": "3f9c0a1b2d4e", "seq": 812, "active": [{machine_id, machine_type, alarm_name, alarm_type, state, since, seq}, ...]}
+- after a subscribe carrying "resume_from": N (and the "epoch" it was seen
+  in), when the epoch matches and every event after N is still in the event
+  log's ring buffer: only those events
+    {"type": "replay", "epoch": "3f9c0a1b2d4e", "seq": 812, "events": [<alarm message>, ...]}
+  otherwise a snapshot as above
+
+The epoch identifies the sequence: it is the event log's (so it survives a
+restart that keeps the log) or a new one per process without a log. When the
+log is wiped, seq starts again at 0 under a new epoch. Alarm messages carry
+their "seq"; a client takes the seq of each snapshot/replay as its position
+(not the max with its old one, which may be from an earlier epoch) and ignores
+alarms at or below it. Snapshots are built on the
+WebSocket loop while events are recorded from the MQTT thread, hence the lock.
+"""
+import threading
+import uuid
+
+
+def alarm_message(event):
+    """The WebSocket message for a recorded event"""
+    return {
+        "seq": event.get("seq"),
+        "machine_id": event["machine_id"],
+        "machine_type": event.get("machine_type"),
+        "alarm_name": event.get("alarm_name", event["alarm_type"]),
+        "alarm_type": event["alarm_type"],
+        "state": event["state"],
+        "timestamp": event["timestamp"],
+    }
+
+
+def encode_alarm_event(encoder, event):
+    """Line-protocol record of an event for the alarm_events bucket"""
+    tags = (
+        ("machine_id", event["machine_id"]),
+        ("alarm_type", event["alarm_type"]),
+        ("alarm_name", event.get("alarm_name", event["alarm_type"])),
+        ("state", event["state"]),
+    )
+    fields = {"value": event["value"], "alarm_label": event.get("alarm_label", event["alarm_type"])}
+    return encoder.encode(tags, fields, encoder.parse_timestamp(event["timestamp"]))
+
+
+def event_keys(event):
+    """Subscription keys (machine_id, machine_type, alarm_type) of an event"""
+    return event["machine_id"], event.get("machine_type"), event["alarm_type"]
+
+
+class AlarmStream:
+    def __init__(self, event_log=None):
+        self.event_log = event_log
+        self._lock = threading.Lock()
+        self.active = {}  # machine_id -> {alarm_type: RAISED/FLAPPING event}
+        recent = event_log.recent() if event_log is not None else []
+        self.seq = max((e.get("seq") or 0 for e in recent), default=0)
+        self.epoch = event_log.epoch if event_log is not None else uuid.uuid4().hex[:12]
+
+    def record(self, event):
+        """Number the event, update the active set and append it to the event log"""
+        with self._lock:
+            self.seq += 1
+            event["seq"] = self.seq
+            machine = self.active.setdefault(event["machine_id"], {})
+            if event["state"] != "CLEARED":
+                machine[event["alarm_type"]] = event  # RAISED or FLAPPING
+            else:
+                machine.pop(event["alarm_type"], None)
+                if not machine:
+                    del self.active[event["machine_id"]]
+            if self.event_log is not None:
+                self.event_log.append(event)
+        return event
+
+    def snapshot(self, accepts=None):
+        """Active alarms (optionally only those whose keys pass accepts(keys))"""
+        with self._lock:
+            active = [
+                {
+                    "machine_id": e["machine_id"],
+                    "machine_type": e.get("machine_type"),
+                    "alarm_name": e.get("alarm_name", e["alarm_type"]),
+                    "alarm_type": e["alarm_type"],
+                    "state": e["state"],
+                    "since": e["timestamp"],
+                    "seq": e["seq"],
+                }
+                for alarms in self.active.values() for e in alarms.values()
+                if accepts is None or accepts(event_keys(e))
+            ]
+            return {"type": "snapshot", "epoch": self.epoch, "seq": self.seq, "active": active}
+
+    def replay(self, since_seq, accepts=None, epoch=None):
+        """Events after since_seq from the ring buffer, or None if some have already left it"""
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return None  # seq from another sequence (the event log was reset)
+            if since_seq > self.seq:
+                return None  # seq from before a reset of the event log
+            events = [e for e in (self.event_log.recent() if self.event_log is not None else [])
+                      if (e.get("seq") or 0) > since_seq]
+            if since_seq < self.seq and (not events or events[0]["seq"] != since_seq + 1):
+                return None
+            messages = [alarm_message(e) for e in events if accepts is None or accepts(event_keys(e))]
+            return {"type": "replay", "epoch": self.epoch, "seq": self.seq, "events": messages}
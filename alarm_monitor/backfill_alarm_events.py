@@ -1,134 +1,352 @@
 #!/usr/bin/env python3
 """
-Backfill Alarm Events - Query InfluxDB to find past alarm transitions
-and populate the alarm events file
+Backfill Alarm Events - Query InfluxDB to find past alarm transitions and
+write them to the alarm_events bucket (and optionally to a JSONL event log)
+
+Discovers every (machine, alarm field) series in the plc_data bucket (bottle
+filler and lathe, or only the machine ids given on the command line), queries
+them concurrently on BACKFILL_WORKERS threads and finds edges with a NumPy
+diff over each series' bool array. Events go to INFLUXDB_BUCKET_ALARMS through
+the writer's BatchWriter in batches of BACKFILL_BATCH_SIZE.
+
+Meant for ranges the live alarm monitor did not cover: its events are stamped
+with the receive time, the backfill's with the sample time, so InfluxDB alone
+would keep both (hence the tolerance match below). The backfill never appends
+to the monitor's event log (ALARM_EVENTS_DIR): two processes would pick
+segment numbers independently, and historical events without a seq would show
+up as the newest ones. BACKFILL_EVENTS_DIR (default empty: InfluxDB only)
+writes the events to a separate directory instead.
+
+With BACKFILL_CHECKPOINT_FILE set, the last processed sample of every series
+is checkpointed after a successful run, and the next run scans only newer data
+(series without a checkpoint start at TIME_RANGE), so it can run every few
+minutes as a reconciliation job. Series discovery then only looks at data
+since the last complete run, less BACKFILL_DISCOVERY_OVERLAP seconds so
+points that arrive late (a writer replaying its spool after an outage) still
+reveal their series. Runs stop at the last whole second so every 1s
+window they read is complete. An empty BACKFILL_CHECKPOINT_FILE rescans
+TIME_RANGE every time.
+
+Transitions the alarm_events bucket already holds are skipped: an event of
+the same machine, alarm and state within BACKFILL_MATCH_TOLERANCE seconds
+(the live monitor's, stamped at receive time, or one from an earlier
+backfill) counts as recorded. So reconciliation runs only add the events
+the monitor missed.
+
+Usage: python3 alarm_monitor/backfill_alarm_events.py [machine_id ...]
 """
-import json
 import os
-from influxdb_client import InfluxDBClient
-from datetime import datetime, timezone
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from influxdb_client import Dialect, InfluxDBClient
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alarm_monitor.alarm_catalog import load_catalog
+from alarm_monitor.alarm_stream import encode_alarm_event
+from alarm_monitor.backfill_checkpoint import BackfillCheckpoint
+from alarm_monitor.event_log import AlarmEventLog
+from influxdb_writer.batch_writer import BatchWriter
+from influxdb_writer.line_protocol import LineProtocolEncoder
 
 # Configuration
 INFLUXDB_URL = os.getenv("INFLUXDB_URL", "http://localhost:8086")
 INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token")
 INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "myorg")
 INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "plc_data_new")
-ALARM_EVENTS_FILE = os.getenv("ALARM_EVENTS_FILE", "/tmp/alarm_events.json")
+INFLUXDB_BUCKET_ALARMS = os.getenv("INFLUXDB_BUCKET_ALARMS", "alarm_events")
+ALARM_EVENTS_DIR = os.getenv("ALARM_EVENTS_DIR", "/tmp/alarm_events")  # the live monitor's log, never written here
+BACKFILL_EVENTS_DIR = os.getenv("BACKFILL_EVENTS_DIR", "")  # separate event log directory; empty: InfluxDB only
+ALARM_CATALOG_FILE = os.getenv("ALARM_CATALOG_FILE", "")
 TIME_RANGE = os.getenv("TIME_RANGE", "-24h")  # How far back to look
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))  # Concurrent Flux queries
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))  # Events per InfluxDB write
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "/tmp/alarm_backfill_checkpoint.json")
+BACKFILL_MATCH_TOLERANCE = float(os.getenv("BACKFILL_MATCH_TOLERANCE", "5"))  # seconds, sample vs recorded time
+BACKFILL_DISCOVERY_OVERLAP = float(os.getenv("BACKFILL_DISCOVERY_OVERLAP", "3600"))  # seconds before last_run to discover from
+
+# Plain CSV (header row, no annotations): only _time and _value are read
+CSV_DIALECT = Dialect(header=True, annotations=[])
+
+
+def alarm_names(catalog):
+    """{alarm field: (machine_type, payload key)} from the alarm catalog"""
+    names = {}
+    for machine_type, alarm_set in catalog.items():
+        for key, alarm_type in zip(alarm_set.keys, alarm_set.alarm_types):
+            names.setdefault(alarm_type, (machine_type, key))
+    return names
+
+
+def detect_transitions(times, values):
+    """
+    Detect alarm transitions in a series (times: RFC3339 strings, values: bools),
+    as (index, state) pairs. A RAISED edge is stamped with the last false sample
+    before it, a CLEARED edge with the first false sample.
+    """
+    values = np.asarray(values, dtype=bool)
+    if len(values) < 2:
+        return []
+    edges = np.flatnonzero(values[1:] != values[:-1]) + 1
+    raised = values[edges]
+    return [
+        (int(i) - 1, "RAISED") if up else (int(i), "CLEARED")
+        for i, up in zip(edges.tolist(), raised.tolist())
+    ]
+
+
+def discover_series(query_api, machine_ids=None, start=TIME_RANGE):
+    """(machine_id, machine_type, alarm field) for every alarm series with data since start"""
+    machine_filter = ""
+    if machine_ids:
+        machine_filter = " and (" + " or ".join(f'r["machine_id"] == "{m}"' for m in machine_ids) + ")"
+    query = f'''
+    from(bucket: "{INFLUXDB_BUCKET}")
+      |> range(start: {start})
+      |> filter(fn: (r) => r["_measurement"] == "plc_data" and r["_field"] =~ /^Alarm/{machine_filter})
+      |> last()
+    '''
+    series = set()
+    for table in query_api.query(query):
+        for record in table.records:
+            series.add((record.values.get("machine_id"), record.values.get("machine_type"), record.get_field()))
+    return sorted(series, key=lambda s: (s[0] or "", s[2]))
+
+
+def discovery_start(last_run, overlap=BACKFILL_DISCOVERY_OVERLAP):
+    """Discovery start for a checkpointed run: last_run (RFC3339) less overlap seconds, or TIME_RANGE"""
+    if not last_run:
+        return TIME_RANGE
+    start = datetime.fromisoformat(last_run.rstrip("Z")) - timedelta(seconds=overlap)
+    return start.isoformat() + "Z"
+
+
+def query_columns(query_api, query, columns):
+    """Rows of the given columns (as strings) from a Flux query, read as plain CSV"""
+    indexes = None
+    for row in query_api.query_csv(query, dialect=CSV_DIALECT):
+        if indexes is None:
+            if all(column in row for column in columns):
+                indexes = [row.index(column) for column in columns]
+            continue
+        if len(row) <= max(indexes) or row[indexes[0]] == columns[0]:
+            continue  # blank separator or repeated header
+        yield [row[i] for i in indexes]
+
+
+def query_series(query_api, machine_id, alarm_field, start, stop):
+    """Times (strings) and values (bool array) of one alarm field in [start, stop), 1s resolution"""
+    query = f'''
+    from(bucket: "{INFLUXDB_BUCKET}")
+      |> range(start: {start}, stop: {stop})
+      |> filter(fn: (r) => r["_measurement"] == "plc_data")
+      |> filter(fn: (r) => r["machine_id"] == "{machine_id}")
+      |> filter(fn: (r) => r["_field"] == "{alarm_field}")
+      |> aggregateWindow(every: 1s, fn: last, createEmpty: false)
+      |> keep(columns: ["_time", "_value"])
+      |> group()
+      |> sort(columns: ["_time"])
+    '''
+    times = []
+    values = []
+    for timestamp, value in query_columns(query_api, query, ("_time", "_value")):
+        times.append(timestamp)
+        values.append(value == "true")
+    return times, np.array(values, dtype=bool)
 
-# Alarm fields to check
-ALARM_FIELDS = [
-    "AlarmFault",
-    "AlarmOverfill",
-    "AlarmUnderfill",
-    "AlarmLowProductLevel",
-    "AlarmCapMissing"
-]
-
-def detect_transitions(values):
-    """Detect alarm transitions from a list of (time, value) tuples"""
-    transitions = []
-    prev_value = None
-    prev_time = None
-    
-    for time, value in values:
-        if prev_value is not None:
-            if prev_value == False and value == True:
-                transitions.append({
-                    "state": "RAISED",
-                    "timestamp": prev_time.isoformat() if prev_time else time.isoformat(),
-                    "value": True
-                })
-            elif prev_value == True and value == False:
-                transitions.append({
-                    "state": "CLEARED",
-                    "timestamp": time.isoformat(),
-                    "value": False
-                })
-        prev_value = value
-        prev_time = time
-    
-    return transitions
-
-def backfill_alarm_events(machine_id="machine-01"):
+
+def query_recorded(query_api, parse_timestamp, machine_id, alarm_field, start):
+    """{state: sorted epoch-ns list} of the events the alarm_events bucket holds since start"""
+    query = f'''
+    from(bucket: "{INFLUXDB_BUCKET_ALARMS}")
+      |> range(start: {start})
+      |> filter(fn: (r) => r["_measurement"] == "alarm_events" and r["_field"] == "value")
+      |> filter(fn: (r) => r["machine_id"] == "{machine_id}" and r["alarm_type"] == "{alarm_field}")
+      |> keep(columns: ["_time", "state"])
+      |> group()
+    '''
+    recorded = {}
+    for timestamp, state in query_columns(query_api, query, ("_time", "state")):
+        # A FLAPPING event is the monitor's report of a raise
+        recorded.setdefault("CLEARED" if state == "CLEARED" else "RAISED", []).append(parse_timestamp(timestamp))
+    return {state: sorted(times) for state, times in recorded.items()}
+
+
+def already_recorded(times_ns, recorded_ns, tolerance_ns):
+    """
+    Bool per entry of times_ns (ascending): matched to a recorded time within
+    tolerance. Matching is one-to-one and in order, so one recorded event
+    never covers two transitions.
+    """
+    known = []
+    j = 0
+    for t in times_ns:
+        while j < len(recorded_ns) and recorded_ns[j] < t - tolerance_ns:
+            j += 1
+        if j < len(recorded_ns) and recorded_ns[j] <= t + tolerance_ns:
+            known.append(True)
+            j += 1
+        else:
+            known.append(False)
+    return known
+
+
+def backfill_series(query_api, parse_timestamp, machine_id, machine_type, alarm_field, names, previous, stop):
+    """
+    Alarm events not yet in the alarm_events bucket for one (machine, alarm
+    field) series, the number of new samples, the (time, value) of the last
+    one and how many transitions were already recorded. previous:
+    checkpointed (time, value) the scan continues from, or None to start at
+    TIME_RANGE.
+    """
+    start = TIME_RANGE if previous is None else previous[0]
+    if previous is None:
+        times, values = query_series(query_api, machine_id, alarm_field, TIME_RANGE, stop)
+        count = len(values)
+    else:
+        # Windows are stamped with their stop, so data after the checkpoint starts at its time
+        times, values = query_series(query_api, machine_id, alarm_field, previous[0], stop)
+        count = len(values)
+        times = [previous[0]] + times
+        values = np.concatenate(([previous[1]], values))
+    last = (times[-1], bool(values[-1])) if count else None
+    known_type, alarm_key = names.get(alarm_field, (None, alarm_field[len("Alarm"):] or alarm_field))
+    machine_type = machine_type or known_type or "bottlefiller"
+    transitions = detect_transitions(times, values)
+    if transitions:
+        # Recorded events may lag the sample time, so look past stop as well
+        recorded = query_recorded(query_api, parse_timestamp, machine_id, alarm_field, start)
+        tolerance_ns = int(BACKFILL_MATCH_TOLERANCE * 1_000_000_000)
+        known = np.zeros(len(transitions), dtype=bool)
+        for state in ("RAISED", "CLEARED"):
+            rows = [n for n, (_, s) in enumerate(transitions) if s == state]
+            if rows and state in recorded:
+                sample_ns = [parse_timestamp(times[transitions[n][0]]) for n in rows]
+                known[rows] = already_recorded(sample_ns, recorded[state], tolerance_ns)
+        skipped = int(known.sum())
+        transitions = [t for t, seen in zip(transitions, known.tolist()) if not seen]
+    else:
+        skipped = 0
+    events = [
+        {
+            "timestamp": times[index],
+            "machine_id": machine_id,
+            "alarm_name": alarm_key,
+            "alarm_type": alarm_field,
+            "alarm_label": alarm_key,
+            "machine_type": machine_type,
+            "state": state,
+            "value": state == "RAISED",
+        }
+        for index, state in transitions
+    ]
+    return events, count, last, skipped
+
+
+def backfill_alarm_events(machine_ids=None):
     """Backfill alarm events from InfluxDB"""
     client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
     query_api = client.query_api()
-    
-    all_events = []
-    
-    print(f"🔍 Backfilling alarm events for {machine_id}...")
-    print(f"📅 Time range: {TIME_RANGE}")
+    names = alarm_names(load_catalog(ALARM_CATALOG_FILE or None))
+    checkpoint = BackfillCheckpoint(BACKFILL_CHECKPOINT_FILE) if BACKFILL_CHECKPOINT_FILE else None
+    # Stop at the last whole second so no 1s window is read half-filled
+    stop = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None).isoformat() + "Z"
+    encoder = LineProtocolEncoder("alarm_events")
+    writer = BatchWriter(
+        client.write_api(write_options=SYNCHRONOUS),
+        INFLUXDB_BUCKET_ALARMS,
+        batch_size=BACKFILL_BATCH_SIZE,
+        queue_size=BACKFILL_BATCH_SIZE * 4
+    ).start()
+
+    print(f"🔍 Backfilling alarm events for {', '.join(machine_ids) if machine_ids else 'all machines'}...")
+    print(f"📅 Time range: {TIME_RANGE} to {stop}"
+          f"{f', continuing from {len(checkpoint.entries)} checkpoints' if checkpoint and checkpoint.entries else ''}")
     print("=" * 60)
-    
-    for alarm_field in ALARM_FIELDS:
-        # Map InfluxDB field name to alarm label
-        alarm_label_map = {
-            "AlarmFault": "Fault",
-            "AlarmOverfill": "Overfill",
-            "AlarmUnderfill": "Underfill",
-            "AlarmLowProductLevel": "LowProductLevel",
-            "AlarmCapMissing": "CapMissing"
+
+    started = time.perf_counter()
+    # After a complete run, only series with data since then (give or take late arrivals) can have anything new
+    discover_start = discovery_start(checkpoint.last_run if checkpoint else None)
+    series = discover_series(query_api, machine_ids, discover_start)
+    print(f"🧭 {len(series)} alarm series on {len({s[0] for s in series})} machines, "
+          f"{BACKFILL_WORKERS} concurrent queries")
+
+    all_events = []
+    samples = 0
+    errors = 0
+    skipped = 0
+    progress = {}
+    with ThreadPoolExecutor(max_workers=max(1, BACKFILL_WORKERS)) as pool:
+        futures = {
+            pool.submit(backfill_series, query_api, encoder.parse_timestamp, machine_id, machine_type, alarm_field, names,
+                        checkpoint.get(machine_id, alarm_field) if checkpoint else None, stop):
+                (machine_id, alarm_field)
+            for machine_id, machine_type, alarm_field in series
         }
-        
-        alarm_label = alarm_label_map.get(alarm_field, alarm_field)
-        
-        # Query values sorted by time
-        query = f'''
-        from(bucket: "{INFLUXDB_BUCKET}")
-          |> range(start: {TIME_RANGE})
-          |> filter(fn: (r) => r["machine_id"] == "{machine_id}")
-          |> filter(fn: (r) => r["_field"] == "{alarm_field}")
-          |> sort(columns: ["_time"])
-          |> aggregateWindow(every: 1s, fn: last, createEmpty: false)
-        '''
-        
-        try:
-            results = query_api.query(query)
-            values = []
-            
-            for table in results:
-                for record in table.records:
-                    time = record.get_time()
-                    value = record.get_value()
-                    values.append((time, value))
-            
-            if values:
-                transitions = detect_transitions(values)
-                print(f"  {alarm_field}: {len(transitions)} transitions found")
-                
-                for transition in transitions:
-                    event = {
-                        "timestamp": transition["timestamp"],
-                        "machine_id": machine_id,
-                        "alarm_type": alarm_field,
-                        "alarm_label": alarm_label,
-                        "state": transition["state"],
-                        "value": transition["value"]
-                    }
-                    all_events.append(event)
-            else:
-                print(f"  {alarm_field}: No data found")
-                
-        except Exception as e:
-            print(f"  {alarm_field}: Error - {e}")
-    
-    # Sort all events by timestamp
-    all_events.sort(key=lambda x: x["timestamp"])
-    
-    # Save to file
-    with open(ALARM_EVENTS_FILE, 'w') as f:
-        json.dump(all_events, f, indent=2)
-    
+        for future in as_completed(futures):
+            machine_id, alarm_field = futures[future]
+            try:
+                events, count, last, known = future.result()
+            except Exception as e:
+                print(f"  {machine_id} {alarm_field}: Error - {e}")
+                errors += 1
+                continue
+            samples += count
+            skipped += known
+            if last is not None:
+                progress[(machine_id, alarm_field)] = last
+            print(f"  {machine_id} {alarm_field}: {len(events)} transitions in {count} samples"
+                  f"{f' ({known} already recorded)' if known else ''}")
+            for event in events:
+                line = encode_alarm_event(encoder, event)
+                while not writer.submit(line, machine_id):
+                    time.sleep(0.05)  # writer queue full; wait for it rather than drop
+            all_events.extend(events)
+
+    writer.stop(timeout=None)
+
+    events_dir = BACKFILL_EVENTS_DIR
+    if events_dir and os.path.abspath(events_dir) == os.path.abspath(ALARM_EVENTS_DIR):
+        print(f"⚠️  BACKFILL_EVENTS_DIR is the live monitor's event log ({ALARM_EVENTS_DIR}), not appending")
+        events_dir = ""
+    if events_dir:
+        # Sort all events by timestamp and append to the separate event log
+        all_events.sort(key=lambda x: x["timestamp"])
+        event_log = AlarmEventLog(events_dir, ring_size=0)
+        event_log.extend(all_events)
+        event_log.close()
+
+    # Advance checkpoints only once everything is written; otherwise the next run redoes this one
+    if checkpoint is not None:
+        not_written = writer.failed + writer.dropped + writer.rejected
+        if not_written:
+            print(f"⚠️  {not_written} events not written, checkpoints left unchanged")
+        else:
+            for (machine_id, alarm_field), (last_time, last_value) in progress.items():
+                checkpoint.set(machine_id, alarm_field, last_time, last_value)
+            if not errors and not machine_ids:
+                checkpoint.last_run = stop
+            checkpoint.save()
+            print(f"📌 Checkpoints: {len(progress)} series advanced"
+                  f"{f', {errors} failed series will be retried' if errors else ''} ({BACKFILL_CHECKPOINT_FILE})")
+
+    elapsed = time.perf_counter() - started
     print("=" * 60)
-    print(f"✅ Backfilled {len(all_events)} alarm events")
-    print(f"💾 Saved to: {ALARM_EVENTS_FILE}")
-    
+    print(f"✅ Backfilled {len(all_events)} alarm events from {samples} samples in {elapsed:.1f}s"
+          f"{f', skipped {skipped} already recorded' if skipped else ''}")
+    print(f"📤 Written to bucket {INFLUXDB_BUCKET_ALARMS}: {writer.written}"
+          f"{f', failed: {writer.failed}' if writer.failed else ''}"
+          f"{f', rejected: {writer.rejected}' if writer.rejected else ''}")
+    if events_dir:
+        print(f"💾 Appended to: {events_dir}")
+
     client.close()
     return all_events
 
 if __name__ == "__main__":
-    import sys
-    machine_id = sys.argv[1] if len(sys.argv) > 1 else "machine-01"
-    backfill_alarm_events(machine_id)
-
+    backfill_alarm_events(sys.argv[1:] or None)
@@ -0,0 +1,60 @@
+"""
+Checkpoints for the incremental alarm backfill
+
+One entry per (machine_id, alarm field): the time of the last sample the
+backfill processed and the alarm value at that sample. A re-run queries only
+data after that time and puts the stored value in front of the new samples,
+so an edge that falls between two runs is still detected exactly once.
+
+The stop time of the last complete run (every series, no errors) is kept as
+well: the next run only needs to discover series with data since then.
+
+Stored as a single JSON file, replaced atomically on save:
+
+    {"last_run": "2025-01-15T10:35:00Z",
+     "series": {"machine-01|AlarmOverfill": {"time": "2025-01-15T10:30:00Z", "value": false}, ...}}
+
+(files holding only the series mapping, from before last_run, still load)
+"""
+import json
+import os
+
+
+class BackfillCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.last_run = None
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if "series" in data:
+                self.entries = data["series"]
+                self.last_run = data.get("last_run")
+            else:
+                self.entries = data
+
+    @staticmethod
+    def _key(machine_id, alarm_field):
+        return f"{machine_id}|{alarm_field}"
+
+    def get(self, machine_id, alarm_field):
+        """(time, value) of the last processed sample, or None"""
+        entry = self.entries.get(self._key(machine_id, alarm_field))
+        if entry is None:
+            return None
+        return entry["time"], bool(entry["value"])
+
+    def set(self, machine_id, alarm_field, time, value):
+        self.entries[self._key(machine_id, alarm_field)] = {"time": time, "value": bool(value)}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"last_run": self.last_run, "series": self.entries}, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,89 @@
+"""
+Alarm debouncing and flap suppression
+
+The simulators draw Overfill, Underfill, CapMissing, ... at random every tick,
+so raw alarm bits toggle almost every message. Each (machine, alarm) pair runs
+a small state machine over the raw value and reports only settled changes:
+
+- RAISED once the raw value has been true for ON_DELAY seconds
+- CLEARED once it has been false for OFF_DELAY seconds
+- FLAPPING (once) when it toggles FLAP_COUNT times within FLAP_WINDOW seconds;
+  no further events until it stays put for FLAP_CLEAR seconds, after which
+  the settled value is reported as RAISED or CLEARED
+
+Delays are checked when the machine's next message arrives (the simulators
+publish every tick). Each update is O(1): a few comparisons and a deque of at
+most FLAP_COUNT toggle times. With all settings at 0 every raw change is
+reported immediately, like the plain transition check.
+
+update_mask() takes a machine's alarms as a bitmask (see alarm_catalog.py)
+and only visits bits that changed or are still settling, so a message where
+nothing moved costs one XOR.
+"""
+from collections import deque
+
+RAISED = "RAISED"
+CLEARED = "CLEARED"
+FLAPPING = "FLAPPING"
+
+
+class AlarmDebouncer:
+    def __init__(self, on_delay=0.0, off_delay=0.0, flap_window=0.0, flap_count=0, flap_clear=0.0):
+        self.on_delay = on_delay
+        self.off_delay = off_delay
+        self.flap_window = flap_window
+        self.flap_count = flap_count  # 0 disables flap detection
+        self.flap_clear = flap_clear
+
+        self._states = {}  # (machine_id, alarm) -> [reported, raw, raw_since, toggle times]
+        self._masks = {}  # machine_id -> [last raw mask, mask of bits still settling]
+
+    def update_mask(self, machine_id, mask, now):
+        """Feed a machine's raw alarm bitmask; returns [(bit, RAISED/CLEARED/FLAPPING), ...]"""
+        machine = self._masks.get(machine_id)
+        if machine is None:
+            machine = self._masks[machine_id] = [0, 0]
+        todo = (mask ^ machine[0]) | machine[1]
+        if not todo:
+            return ()
+        machine[0] = mask
+        events = []
+        settling = 0
+        while todo:
+            low = todo & -todo
+            todo ^= low
+            bit = low.bit_length() - 1
+            result = self.update(machine_id, bit, bool(mask & low), now)
+            if result is not None:
+                events.append((bit, result))
+            state = self._states[(machine_id, bit)]
+            if state[0] != state[1]:  # delay pending or FLAPPING
+                settling |= low
+        machine[1] = settling
+        return events
+
+    def update(self, machine_id, alarm, value, now):
+        """Feed one raw value (now: monotonic seconds); returns RAISED/CLEARED/FLAPPING or None"""
+        key = (machine_id, alarm)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = [False, False, now, deque(maxlen=max(self.flap_count, 1))]
+        reported, raw, since, toggles = state
+
+        if value != raw:
+            state[1] = raw = value
+            state[2] = since = now
+            toggles.append(now)
+            if (self.flap_count and reported != FLAPPING and len(toggles) == self.flap_count
+                    and now - toggles[0] <= self.flap_window):
+                state[0] = FLAPPING
+                return FLAPPING
+
+        if reported == FLAPPING:
+            if now - since < self.flap_clear:
+                return None
+            toggles.clear()
+        elif raw == reported or now - since < (self.on_delay if raw else self.off_delay):
+            return None
+        state[0] = raw
+        return RAISED if raw else CLEARED
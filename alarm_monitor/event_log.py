@@ -0,0 +1,141 @@
+"""
+Append-only alarm event log
+
+Alarm events are appended as one JSON object per line to segment files in
+ALARM_EVENTS_DIR (0000000001.jsonl, 0000000002.jsonl, ...), so recording an
+event costs one short write however much history is kept:
+
+- a segment is closed once it reaches SEGMENT_BYTES
+- when the log exceeds MAX_BYTES the oldest segments are deleted
+- the last RING_SIZE events are kept in memory (and reloaded from the newest
+  segments on startup) for "recent events" lookups
+- an EPOCH file identifies the log: it is created with a new random id when the
+  directory is empty or new, so a wiped log (and its restarted sequence
+  numbers) can be told apart from the old one
+
+Readers (the /api/alarms/events route, verify_alarm_data.py) read the newest
+segments backwards until they have enough events; the route stops after
+ALARM_EVENTS_SCAN_MAX_MB and returns a cursor to continue from.
+"""
+import json
+import os
+import threading
+import uuid
+from collections import deque
+
+SUFFIX = ".jsonl"
+EPOCH_FILE = "EPOCH"
+
+
+def list_segments(directory):
+    """Segment paths in the directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.endswith(SUFFIX) and name[:-len(SUFFIX)].isdigit()
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def read_events(directory, limit=None):
+    """Return up to `limit` most recent events (oldest first), skipping torn lines"""
+    if limit is not None and limit <= 0:
+        return []
+    events = []
+    for path in reversed(list_segments(directory)):
+        with open(path, "r") as f:
+            lines = f.readlines()
+        chunk = []
+        for line in lines:
+            try:
+                chunk.append(json.loads(line))
+            except ValueError:
+                continue  # partial line from a crash mid-write
+        events[:0] = chunk
+        if limit is not None and len(events) >= limit:
+            return events[-limit:]
+    return events
+
+
+class AlarmEventLog:
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, max_bytes=1024 * 1024 * 1024, ring_size=1000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments = [int(os.path.basename(p)[:-len(SUFFIX)]) for p in list_segments(directory)]
+        self._sizes = {seq: os.path.getsize(self._path(seq)) for seq in self._segments}
+        self.total_bytes = sum(self._sizes.values())
+        self.epoch = self._load_epoch()
+        self._file = None
+        self._file_seq = None
+
+        # Recent window, newest last
+        self.ring = deque(read_events(directory, ring_size), maxlen=ring_size)
+
+    def _load_epoch(self):
+        path = os.path.join(self.directory, EPOCH_FILE)
+        if self._segments and os.path.exists(path):
+            with open(path, "r") as f:
+                epoch = f.read().strip()
+            if epoch:
+                return epoch
+        epoch = uuid.uuid4().hex[:12]
+        with open(path, "w") as f:
+            f.write(epoch + "\n")
+        return epoch
+
+    def _path(self, seq):
+        return os.path.join(self.directory, f"{seq:010d}{SUFFIX}")
+
+    def append(self, event):
+        """Record one event: O(1), no reads"""
+        data = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None or self._sizes[self._file_seq] >= self.segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._sizes[self._file_seq] += len(data)
+            self.total_bytes += len(data)
+            self.ring.append(event)
+            self._evict()
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def recent(self, limit=None, machine_id=None):
+        """Most recent events from the in-memory window, oldest first"""
+        with self._lock:
+            events = list(self.ring)
+        if machine_id is not None:
+            events = [e for e in events if e.get("machine_id") == machine_id]
+        return events[-limit:] if limit else events
+
+    def _rotate(self):
+        # Always a fresh segment (also after a restart, so a torn last line is never appended to)
+        if self._file is not None:
+            self._file.close()
+        seq = self._segments[-1] + 1 if self._segments else 1
+        self._segments.append(seq)
+        self._sizes[seq] = 0
+        self._file = open(self._path(seq), "a")
+        self._file_seq = seq
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._segments) > 1:
+            seq = self._segments.pop(0)
+            self.total_bytes -= self._sizes.pop(seq)
+            os.remove(self._path(seq))
+            print(f"🗑️  Alarm event log over {self.max_bytes // (1024 * 1024)} MB, removed segment {seq}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._file_seq = None
@@ -0,0 +1,209 @@
+"""
+WebSocket fan-out with per-client backpressure
+
+Every connected client gets a bounded outbound queue and its own sender task,
+so broadcasting is a non-blocking put per client and one slow browser tab only
+delays itself. Each broadcast is serialized once (callers pass the JSON
+string) and the same object is queued to every client.
+
+When a client's queue is full the slow-consumer policy applies:
+
+- drop_oldest: discard the oldest queued message to make room (default)
+- disconnect: close the connection; the UI reconnects and reloads history
+
+A direct send (ack, snapshot, replay) that finds the queue full always closes
+the connection: the client would otherwise apply later events to state it
+never received.
+
+Clients may narrow what they receive with a subscribe message:
+
+    {"type": "subscribe", "machine_ids": ["machine-01"], "machine_types": ["lathe"], "alarm_types": ["AlarmOverfill"]}
+
+Each list is optional and an omitted or empty list means "any"; an alarm is
+delivered when every given list matches. A SubscriptionIndex maps each key to
+its subscribers, so a broadcast only touches interested sockets. Clients that
+never subscribe get everything.
+
+Everything here runs on the WebSocket event loop thread.
+"""
+import asyncio
+
+import websockets
+
+POLICIES = ("drop_oldest", "disconnect")
+
+# Subscription dimensions, in the order of the keys passed to broadcast()
+DIMENSIONS = ("machine_ids", "machine_types", "alarm_types")
+_NONE = frozenset()
+
+
+class SubscriptionIndex:
+    """Inverted index: per dimension, key -> subscribed channels, plus the channels not filtering on it"""
+
+    def __init__(self):
+        self._index = [{} for _ in DIMENSIONS]
+        self._any = [set() for _ in DIMENSIONS]
+        self._filters = {}  # channel -> tuple of frozenset (None = any) per dimension
+
+    def set(self, channel, filters=(None, None, None)):
+        """Replace a channel's filters (one iterable of keys or None per dimension)"""
+        self.remove(channel)
+        filters = tuple(frozenset(keys) if keys else None for keys in filters)
+        self._filters[channel] = filters
+        for index, any_, keys in zip(self._index, self._any, filters):
+            if keys is None:
+                any_.add(channel)
+                continue
+            for key in keys:
+                index.setdefault(key, set()).add(channel)
+
+    def remove(self, channel):
+        filters = self._filters.pop(channel, None)
+        if filters is None:
+            return
+        for index, any_, keys in zip(self._index, self._any, filters):
+            if keys is None:
+                any_.discard(channel)
+                continue
+            for key in keys:
+                subscribers = index[key]
+                subscribers.discard(channel)
+                if not subscribers:
+                    del index[key]
+
+    def accepts(self, channel, keys):
+        """True if the channel's filters let through an alarm with these keys"""
+        filters = self._filters.get(channel)
+        return filters is not None and all(f is None or key in f for f, key in zip(filters, keys))
+
+    def match(self, keys):
+        """Channels interested in an alarm with these (machine_id, machine_type, alarm_type) keys"""
+        # Walk the dimension with the fewest candidates, check the others per channel
+        best = None
+        for dim, key in enumerate(keys):
+            exact = self._index[dim].get(key, _NONE)
+            size = len(exact) + len(self._any[dim])
+            if best is None or size < best[0]:
+                best = (size, dim, exact)
+        _, dim, exact = best
+        others = [(i, key) for i, key in enumerate(keys) if i != dim]
+        filters = self._filters
+        matched = []
+        for group in (exact, self._any[dim]):
+            for channel in group:
+                f = filters[channel]
+                for i, key in others:
+                    if f[i] is not None and key not in f[i]:
+                        break
+                else:
+                    matched.append(channel)
+        return matched
+
+
+class ClientChannel:
+    def __init__(self, websocket, queue_size, on_sent=None):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.on_sent = on_sent
+        self.task = None
+
+    async def run(self):
+        """Sender task: write queued messages to this client in order"""
+        try:
+            while True:
+                message, received = await self.queue.get()
+                await self.websocket.send(message)
+                if self.on_sent is not None and received is not None:
+                    self.on_sent(received)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class Broadcaster:
+    def __init__(self, queue_size=256, policy="drop_oldest", on_sent=None):
+        """on_sent: optional fn(received) called after each delivery (received as passed to broadcast)"""
+        if policy not in POLICIES:
+            print(f"⚠️  Unknown slow-client policy '{policy}', using 'drop_oldest' (options: {', '.join(POLICIES)})")
+            policy = "drop_oldest"
+        self.queue_size = queue_size
+        self.policy = policy
+        self.on_sent = on_sent
+        self.clients = {}  # websocket -> ClientChannel
+        self.subscriptions = SubscriptionIndex()
+
+        # Counters
+        self.broadcasts = 0
+        self.dropped = 0  # messages discarded by drop_oldest
+        self.disconnected = 0  # clients closed as too slow (disconnect policy, or a direct send that didn't fit)
+
+    def add(self, websocket):
+        """Register a connection and start its sender task"""
+        channel = ClientChannel(websocket, self.queue_size, self.on_sent)
+        channel.task = asyncio.get_running_loop().create_task(channel.run())
+        self.clients[websocket] = channel
+        self.subscriptions.set(channel)
+        return channel
+
+    def subscribe(self, websocket, machine_ids=None, machine_types=None, alarm_types=None):
+        """Limit a client to matching alarms (None/empty: any)"""
+        channel = self.clients.get(websocket)
+        if channel is not None:
+            self.subscriptions.set(channel, (machine_ids, machine_types, alarm_types))
+
+    def filter_for(self, websocket):
+        """fn(keys) -> bool applying the client's current subscription"""
+        channel = self.clients.get(websocket)
+        return lambda keys: self.subscriptions.accepts(channel, keys)
+
+    def send(self, websocket, message):
+        """Queue a message for one client (acks, snapshots); if its queue is full, close it and return False"""
+        channel = self.clients.get(websocket)
+        if channel is None:
+            return False
+        if channel.queue.full():
+            self._disconnect(channel)
+            return False
+        channel.queue.put_nowait((message, None))
+        return True
+
+    def _disconnect(self, channel):
+        """Close a client that can't keep up; it reconnects and gets a fresh snapshot"""
+        self.disconnected += 1
+        self.remove(channel.websocket)
+        asyncio.get_running_loop().create_task(
+            channel.websocket.close(code=1013, reason="client too slow"))
+
+    def remove(self, websocket):
+        channel = self.clients.pop(websocket, None)
+        if channel is not None:
+            self.subscriptions.remove(channel)
+            channel.task.cancel()
+
+    def __len__(self):
+        return len(self.clients)
+
+    def broadcast(self, message, received=None, keys=None):
+        """
+        Queue one serialized message for every interested client; keys is the
+        alarm's (machine_id, machine_type, alarm_type), None sends to everyone
+        """
+        self.broadcasts += 1
+        drop_oldest = self.policy == "drop_oldest"
+        slow = []
+        item = (message, received)
+        channels = self.clients.values() if keys is None else self.subscriptions.match(keys)
+        for channel in channels:
+            queue = channel.queue
+            if queue.full():
+                if not drop_oldest:
+                    slow.append(channel)
+                    continue
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(item)
+        for channel in slow:
+            self._disconnect(channel)
+
+    @property
+    def queued(self):
+        return sum(channel.queue.qsize() for channel in self.clients.values())
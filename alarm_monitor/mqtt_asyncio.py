@@ -0,0 +1,81 @@
+"""
+Run a paho MQTT client on an asyncio event loop
+
+Instead of loop_forever() on its own thread, the client's socket is watched by
+the event loop (paho's external loop hooks: loop_read when readable,
+loop_write while paho has data to send, loop_misc once a second for
+keepalives), so on_message runs on the loop like any other callback and can
+hand messages to asyncio queues and tasks directly.
+
+run_forever() connects, reconnects with backoff after the connection drops and
+only returns when cancelled. Connecting itself still blocks the loop for the
+TCP/TLS handshake, as the threaded monitor did.
+"""
+import asyncio
+
+import paho.mqtt.client as mqtt
+
+
+class AsyncioMqtt:
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.disconnected = asyncio.Event()
+        self._misc = None
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self.disconnected.clear()
+        self.loop.add_reader(sock, self._on_readable)
+        self._misc = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+            self._misc = None
+        self.disconnected.set()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    def _on_readable(self):
+        self.client.loop_read()
+        # A TLS socket can hold decrypted bytes the selector doesn't see
+        sock = self.client.socket()
+        while sock is not None and getattr(sock, "pending", None) and sock.pending():
+            self.client.loop_read()
+            sock = self.client.socket()
+
+    async def _misc_loop(self):
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    async def run_forever(self, host, port, keepalive=60, min_delay=1.0, max_delay=30.0):
+        """Connect and stay connected; reconnects with exponential backoff"""
+        delay = min_delay
+        first = True
+        while True:
+            try:
+                if first:
+                    self.client.connect(host, port, keepalive)
+                else:
+                    self.client.reconnect()
+            except (OSError, ValueError) as e:
+                print(f"⚠️  MQTT connection failed: {e}, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+                continue
+            first = False
+            delay = min_delay
+            await self.disconnected.wait()
+            print(f"⚠️  MQTT connection lost, reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
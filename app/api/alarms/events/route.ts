@@ -1,27 +1,56 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { readFile } from 'fs/promises';
+import { readFile, readdir, stat } from 'fs/promises';
 import { existsSync } from 'fs';
+import path from 'path';
 
-const ALARM_EVENTS_FILE = '/tmp/alarm_events.json';
+// Append-only JSON-lines segments written by alarm_monitor (0000000001.jsonl, ...)
+const ALARM_EVENTS_DIR = process.env.ALARM_EVENTS_DIR || '/tmp/alarm_events';
+// Bytes of segments one request may read; a sparse machineId filter otherwise reads the whole log
+const ALARM_EVENTS_SCAN_MAX_BYTES = parseInt(process.env.ALARM_EVENTS_SCAN_MAX_MB || '16') * 1024 * 1024;
+const MAX_LIMIT = 1000;
 
 export async function GET(request: NextRequest) {
   try {
     const searchParams = request.nextUrl.searchParams;
     const machineId = searchParams.get('machineId');
-    const limit = parseInt(searchParams.get('limit') || '50');
+    const limit = Math.min(Math.max(parseInt(searchParams.get('limit') || '50') || 50, 1), MAX_LIMIT);
+    // Cursor from a previous partial response: only read segments older than this one
+    const before = searchParams.get('before');
     
-    // Check if file exists
-    if (!existsSync(ALARM_EVENTS_FILE)) {
+    // Check if the log exists
+    if (!existsSync(ALARM_EVENTS_DIR)) {
       return NextResponse.json({ events: [] });
     }
     
-    // Read alarm events
-    const fileContent = await readFile(ALARM_EVENTS_FILE, 'utf-8');
-    let events = JSON.parse(fileContent);
-    
-    // Filter by machine if specified
-    if (machineId) {
-      events = events.filter((e: any) => e.machine_id === machineId);
+    // Read segments newest first until we have enough events or hit the scan budget
+    const segments = (await readdir(ALARM_EVENTS_DIR))
+      .filter((name) => /^\d+\.jsonl$/.test(name) && (!before || name < before))
+      .sort()
+      .reverse();
+    let events: any[] = [];
+    let bytesRead = 0;
+    let nextBefore: string | null = null;
+    for (const [index, segment] of segments.entries()) {
+      if (bytesRead >= ALARM_EVENTS_SCAN_MAX_BYTES) {
+        // Budget spent: return what we have and where to continue
+        nextBefore = segments[index - 1];
+        break;
+      }
+      bytesRead += (await stat(path.join(ALARM_EVENTS_DIR, segment))).size;
+      const fileContent = await readFile(path.join(ALARM_EVENTS_DIR, segment), 'utf-8');
+      for (const line of fileContent.split('\n')) {
+        if (!line) continue;
+        try {
+          const event = JSON.parse(line);
+          // Filter by machine if specified
+          if (!machineId || event.machine_id === machineId) {
+            events.push(event);
+          }
+        } catch {
+          // Partial line from a crash mid-write
+        }
+      }
+      if (events.length >= limit) break;
     }
     
     // Sort by timestamp (newest first) and limit
@@ -29,10 +58,10 @@ export async function GET(request: NextRequest) {
       .sort((a: any, b: any) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime())
       .slice(0, limit);
     
-    return NextResponse.json({ events });
+    // partial: older segments were not read; pass next_before as ?before= to continue
+    return NextResponse.json({ events, partial: nextBefore !== null, next_before: nextBefore });
   } catch (error: any) {
     console.error('Error reading alarm events:', error);
     return NextResponse.json({ events: [] });
   }
 }
-
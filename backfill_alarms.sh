@@ -3,16 +3,27 @@
 
 cd /Users/khanhamza/mqtt-ot-network
 
-MACHINE_ID=${1:-machine-01}
+# Usage: ./backfill_alarms.sh [machine_id|all] [time_range]
+# Meant for ranges the live alarm monitor did not cover (its events are stamped
+# with receive time); transitions already in the bucket within
+# BACKFILL_MATCH_TOLERANCE seconds are skipped.
+MACHINE_ID=${1:-all}
 TIME_RANGE=${2:--24h}
 
 export INFLUXDB_URL=http://localhost:8086
 export INFLUXDB_TOKEN=my-super-secret-auth-token
 export INFLUXDB_ORG=myorg
 export INFLUXDB_BUCKET=plc_data_new
-export ALARM_EVENTS_FILE=/tmp/alarm_events.json
+export INFLUXDB_BUCKET_ALARMS=alarm_events
+export ALARM_EVENTS_DIR=/tmp/alarm_events  # the live monitor's log: never appended to by the backfill
+export BACKFILL_EVENTS_DIR=${BACKFILL_EVENTS_DIR-}  # separate event log directory; empty: InfluxDB only
+export BACKFILL_CHECKPOINT_FILE=${BACKFILL_CHECKPOINT_FILE-/tmp/alarm_backfill_checkpoint.json}  # empty: full rescan
 export TIME_RANGE=$TIME_RANGE
 
 echo "🔄 Backfilling alarm events for $MACHINE_ID..."
-python3 alarm_monitor/backfill_alarm_events.py $MACHINE_ID
+if [ "$MACHINE_ID" = "all" ]; then
+    python3 alarm_monitor/backfill_alarm_events.py
+else
+    python3 alarm_monitor/backfill_alarm_events.py $MACHINE_ID
+fi
 
@@ -0,0 +1,2 @@
+# Fleet Simulator Package
+
@@ -0,0 +1,42 @@
+"""
+Configuration file for the Fleet Simulator
+"""
+import os
+
+# Load .env file from project root
+try:
+    from dotenv import load_dotenv
+    # Load from project root (parent of fleet_sim directory)
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+    load_dotenv(env_path)
+except ImportError:
+    pass  # dotenv not installed, skip
+
+# MQTT Configuration
+MQTT_BROKER = os.getenv("MQTT_BROKER_HOST", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_BROKER_PORT", "1883"))
+MQTT_USERNAME = os.getenv("MQTT_USERNAME", None)
+MQTT_PASSWORD = os.getenv("MQTT_PASSWORD", None)
+MQTT_TLS_ENABLED = os.getenv("MQTT_TLS_ENABLED", "false").lower() == "true"
+CA_CERT_PATH = os.getenv("CA_CERT_PATH", "mosquitto/config/certs/ca.crt")
+MQTT_TLS_CHECK_HOSTNAME = os.getenv("MQTT_TLS_CHECK_HOSTNAME", "false").lower() == "true"
+MQTT_QOS = int(os.getenv("FLEET_MQTT_QOS", "1"))
+CLIENT_ID = "fleet_sim"
+
+# Fleet Configuration
+FLEET_BOTTLEFILLERS = int(os.getenv("FLEET_BOTTLEFILLERS", "100"))
+FLEET_LATHES = int(os.getenv("FLEET_LATHES", "20"))
+FLEET_BOTTLEFILLER_PREFIX = os.getenv("FLEET_BOTTLEFILLER_PREFIX", "machine-")  # machine-01, machine-02, ...
+FLEET_LATHE_PREFIX = os.getenv("FLEET_LATHE_PREFIX", "lathe")  # lathe01, lathe02, ...
+FLEET_MQTT_CONNECTIONS = int(os.getenv("FLEET_MQTT_CONNECTIONS", "4"))  # Shared by all machines
+PUBLISH_INTERVAL = float(os.getenv("FLEET_PUBLISH_INTERVAL", "2.0"))  # seconds, per machine
+FLEET_GENERATOR = os.getenv("FLEET_GENERATOR", "scalar").lower()  # scalar | vector (NumPy, whole fleet per tick)
+FLEET_PUBLISH_MODE = os.getenv("FLEET_PUBLISH_MODE", "split").lower()  # bottle fillers: split | compact (see mock_plc_agent)
+FLEET_ALARM_TOPIC = os.getenv("FLEET_ALARM_TOPIC", "false").lower() == "true"  # compact: also publish .../alarms
+STATS_INTERVAL = float(os.getenv("FLEET_STATS_INTERVAL", "10.0"))  # seconds between summary lines
+
+# Simulation (see mock_plc_agent/sim_clock.py): SIM_SEED makes readings reproducible,
+# SIM_SPEED > 1 compresses time (0: no sleeping), SIM_START fixes the first timestamp
+SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None
+SIM_SPEED = float(os.getenv("SIM_SPEED", "1.0"))
+SIM_START = os.getenv("SIM_START", "")  # ISO 8601, e.g. 2025-01-15T00:00:00Z
@@ -0,0 +1,80 @@
+"""
+Small pool of MQTT connections shared by every simulated machine
+
+Each connection runs paho's network loop on its own thread (loop_start) and
+reconnects on its own. A machine always publishes through the same
+connection (its index modulo the pool size), so its messages stay in order.
+"""
+import threading
+import time
+import uuid
+
+import paho.mqtt.client as mqtt
+
+
+class MqttPool:
+    def __init__(self, size, client_id, configure=None):
+        """configure: optional fn(client) applying credentials/TLS to each connection"""
+        self.clients = []
+        self._connected = set()
+        self._lock = threading.Lock()
+
+        # Counters (read by the fleet summary)
+        self.published = 0
+        self.unsent = 0  # publishes made while the connection was down
+        self.reconnects = 0
+
+        for i in range(max(1, size)):
+            client = mqtt.Client(client_id=f"{client_id}_{i}_{uuid.uuid4().hex[:8]}", clean_session=True)
+            client.user_data_set(i)
+            client.on_connect = self._on_connect
+            client.on_disconnect = self._on_disconnect
+            client.reconnect_delay_set(min_delay=1, max_delay=120)
+            if configure is not None:
+                configure(client)
+            self.clients.append(client)
+
+    def __len__(self):
+        return len(self.clients)
+
+    @property
+    def connected(self):
+        return len(self._connected)
+
+    def _on_connect(self, client, index, flags, rc):
+        if rc == 0:
+            with self._lock:
+                self._connected.add(index)
+        else:
+            print(f"❌ Connection {index} failed, return code {rc}")
+
+    def _on_disconnect(self, client, index, rc):
+        with self._lock:
+            self._connected.discard(index)
+        if rc != 0:
+            self.reconnects += 1
+            print(f"⚠️  Connection {index} lost (rc={rc}). Reconnecting...")
+
+    def connect(self, host, port, keepalive=60, timeout=10.0):
+        """Start every connection; returns how many were up within timeout"""
+        for client in self.clients:
+            client.connect_async(host, port, keepalive=keepalive)
+            client.loop_start()
+        deadline = time.monotonic() + timeout
+        while self.connected < len(self.clients) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return self.connected
+
+    def publish(self, index, topic, payload, qos=1):
+        """Publish for machine `index` on its connection; returns paho's MQTTMessageInfo"""
+        result = self.clients[index % len(self.clients)].publish(topic, payload, qos=qos)
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.published += 1
+        else:
+            self.unsent += 1
+        return result
+
+    def stop(self):
+        for client in self.clients:
+            client.disconnect()
+            client.loop_stop()
@@ -0,0 +1,296 @@
+"""
+Vectorized machine models for the fleet simulator
+
+BottleFillerFleet and LatheFleet hold the state of every machine of their
+type in NumPy arrays and draw all of a tick's random values for all machines
+in one call. step() advances the whole fleet by one tick; reading(i) builds
+machine i's payload dict (same shape and distributions as
+BottleFillerTags/LatheState.generate_mock_data) only when it is published.
+
+step() converts each column to a Python list once, so reading(i) is plain
+list indexing with no per-value NumPy scalar conversion.
+
+Only used with FLEET_GENERATOR=vector. Generation is a small part of a
+published machine-tick (paho's publish path dominates, see
+scripts/benchmark_fleet_generation.py), so this pays off mainly for
+generation-only runs.
+"""
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from mock_plc_agent.config import (
+    FILL_TARGET_DEFAULT, FILL_TIME_DEFAULT, FILL_SPEED_DEFAULT,
+    CONVEYOR_SPEED_DEFAULT, TOLERANCE_DEFAULT
+)
+
+
+def _uniform(u, low, high, decimals):
+    """Scale uniform [0, 1) draws to [low, high) and round like round(random.uniform(low, high), decimals)"""
+    return np.round(low + u * (high - low), decimals)
+
+
+class BottleFillerFleet:
+    # Rows of the per-tick uniform draw matrix
+    (NEW_BOTTLE, BOTTLE_PRESENT, BOTTLE_AT_CAP, LOW_LEVEL, HIGH_LEVEL, CAP_PRESENT, CAPPING,
+     FILL_LEVEL, FLOW_RATE, TEMPERATURE, PRESSURE, CONVEYOR, LOW_PRODUCT, OVERFILL, UNDERFILL,
+     CAP_MISSING) = range(16)
+    DRAWS = 16
+
+    def __init__(self, machine_ids, rng=None, clock=time.time):
+        self.machine_ids = list(machine_ids)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.clock = clock
+        n = len(self.machine_ids)
+        self.bottles_filled = np.zeros(n, dtype=np.int64)
+        self.bottles_rejected = np.zeros(n, dtype=np.int64)
+        self.system_running = np.ones(n, dtype=bool)
+        self.filling = np.zeros(n, dtype=bool)
+        self.start_time = clock()
+        self.columns = None
+
+    def __len__(self):
+        return len(self.machine_ids)
+
+    def step(self):
+        """Advance every machine by one tick"""
+        u = self.rng.random((self.DRAWS, len(self.machine_ids)))
+        running = self.system_running
+
+        # Simulate bottle filling cycle (30% chance of new bottle)
+        filling = self.filling = u[self.NEW_BOTTLE] > 0.7
+        self.bottles_filled += filling
+
+        # Calculate production rate
+        elapsed_time = max(1, self.clock() - self.start_time)
+        bottles_per_minute = np.round(self.bottles_filled / elapsed_time * 60, 1)
+
+        columns = {
+            "BottlePresent": u[self.BOTTLE_PRESENT] < 0.5,
+            "BottleAtFill": filling,
+            "BottleAtCap": filling & (u[self.BOTTLE_AT_CAP] < 0.5),
+            "LowLevel": u[self.LOW_LEVEL] > 0.9,
+            "HighLevel": u[self.HIGH_LEVEL] > 0.95,
+            "CapPresent": filling & (u[self.CAP_PRESENT] < 0.5),
+            "FillValve": filling,
+            "ConveyorMotor": running,
+            "CappingMotor": filling & (u[self.CAPPING] < 0.5),
+            "IndicatorGreen": running & ~filling,
+            "IndicatorRed": ~running,
+            "IndicatorYellow": filling,
+            "FillLevel": _uniform(u[self.FILL_LEVEL], 0, 100, 2),
+            "FillFlowRate": np.where(filling, _uniform(u[self.FLOW_RATE], 10, 50, 2), 0.0),
+            "TankTemperature": _uniform(u[self.TEMPERATURE], 20, 25, 1),
+            "TankPressure": _uniform(u[self.PRESSURE], 10, 15, 2),
+            "ConveyorSpeed": np.where(running, _uniform(u[self.CONVEYOR], 100, 150, 1), 0.0),
+            "Ready": ~filling & running,
+            "BottlesFilled": self.bottles_filled,
+            "BottlesRejected": self.bottles_rejected,
+            "BottlesPerMinute": bottles_per_minute,
+            "LowProductLevel": u[self.LOW_PRODUCT] > 0.94,
+            "Overfill": u[self.OVERFILL] > 0.96,
+            "Underfill": u[self.UNDERFILL] > 0.95,
+            "NoBottle": ~filling,
+            "CapMissing": filling & (u[self.CAP_MISSING] > 0.93),
+        }
+        self.columns = {name: values.tolist() for name, values in columns.items()}
+
+    def reading(self, i):
+        """Payload of machine i for the current tick"""
+        c = self.columns
+        filling = c["BottleAtFill"][i]
+        running = c["ConveyorMotor"][i]
+        return {
+            "timestamp": datetime.fromtimestamp(self.clock(), timezone.utc).isoformat(),
+            "machine_id": self.machine_ids[i],
+            "inputs": {
+                "BottlePresent": c["BottlePresent"][i],
+                "BottleAtFill": filling,
+                "BottleAtCap": c["BottleAtCap"][i],
+                "LowLevel": c["LowLevel"][i],
+                "HighLevel": c["HighLevel"][i],
+                "CapPresent": c["CapPresent"][i],
+            },
+            "outputs": {
+                "FillValve": filling,
+                "ConveyorMotor": running,
+                "CappingMotor": c["CappingMotor"][i],
+                "IndicatorGreen": c["IndicatorGreen"][i],
+                "IndicatorRed": c["IndicatorRed"][i],
+                "IndicatorYellow": filling,
+            },
+            "analog": {
+                "FillLevel": c["FillLevel"][i],
+                "FillFlowRate": c["FillFlowRate"][i],
+                "TankTemperature": c["TankTemperature"][i],
+                "TankPressure": c["TankPressure"][i],
+                "ConveyorSpeed": c["ConveyorSpeed"][i],
+            },
+            "setpoints": {
+                "FillTarget": FILL_TARGET_DEFAULT,
+                "FillTime": FILL_TIME_DEFAULT,
+                "FillSpeed": FILL_SPEED_DEFAULT,
+                "ConveyorSpeed": CONVEYOR_SPEED_DEFAULT,
+                "Tolerance": TOLERANCE_DEFAULT,
+            },
+            "status": {
+                "SystemRunning": running,
+                "Filling": filling,
+                "Ready": c["Ready"][i],
+                "Fault": False,
+                "AutoMode": True,
+            },
+            "counters": {
+                "BottlesFilled": c["BottlesFilled"][i],
+                "BottlesRejected": c["BottlesRejected"][i],
+                "BottlesPerMinute": c["BottlesPerMinute"][i],
+            },
+            "alarms": {
+                "LowProductLevel": c["LowProductLevel"][i],
+                "Overfill": c["Overfill"][i],
+                "Underfill": c["Underfill"][i],
+                "NoBottle": c["NoBottle"][i],
+                "CapMissing": c["CapMissing"][i],
+            }
+        }
+
+
+class LatheFleet:
+    # Rows of the per-tick uniform draw matrix
+    (PART, TOOL_WEAR, COOLANT_USE, DOOR, SPEED, LOAD, HIGH_LOAD, HIGH_LOAD_VALUE, X_POSITION, X_FEEDRATE,
+     Z_POSITION, Z_FEEDRATE, CYCLE_TIME, CHUCK, OFFSET_X, OFFSET_Z, COOLANT_FLOW, COOLANT_TEMPERATURE) = range(18)
+    DRAWS = 18
+
+    def __init__(self, machine_ids, rng=None, clock=time.time):
+        self.machine_ids = list(machine_ids)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.clock = clock
+        n = len(self.machine_ids)
+        self.parts_completed = np.zeros(n, dtype=np.int64)
+        self.parts_rejected = np.zeros(n, dtype=np.int64)
+        self.system_running = np.ones(n, dtype=bool)
+        self.machining = np.zeros(n, dtype=bool)
+        self.tool_life_percent = np.full(n, 100.0)
+        self.coolant_level_percent = np.full(n, 100.0)
+        self.current_tool = np.ones(n, dtype=np.int64)
+        self.start_time = clock()
+        self.columns = None
+
+    def __len__(self):
+        return len(self.machine_ids)
+
+    def step(self):
+        """Advance every machine by one tick"""
+        u = self.rng.random((self.DRAWS, len(self.machine_ids)))
+        running = self.system_running
+
+        # Simulate machining cycle (40% chance of completing a part); tool life and coolant wear down
+        machining = self.machining = u[self.PART] > 0.6
+        self.parts_completed += machining
+        self.tool_life_percent = np.maximum(
+            0, self.tool_life_percent - np.where(machining, 0.1 + u[self.TOOL_WEAR] * 0.4, 0.0))
+        self.coolant_level_percent = np.maximum(
+            0, self.coolant_level_percent - np.where(machining, 0.05 + u[self.COOLANT_USE] * 0.15, 0.0))
+
+        # Calculate production rate
+        elapsed_time = max(1, self.clock() - self.start_time)
+        parts_per_hour = np.round(self.parts_completed / elapsed_time * 3600, 1)
+
+        # Safety - door closed 95% of the time; occasionally high spindle load
+        door_closed = u[self.DOOR] > 0.05
+        load_percent = np.where(u[self.HIGH_LOAD] > 0.9,
+                                _uniform(u[self.HIGH_LOAD_VALUE], 85, 95, 1),
+                                _uniform(u[self.LOAD], 20, 80, 1))
+        chuck_not_clamped = u[self.CHUCK] > 0.98  # 2% chance (rare fault)
+        door_open = ~door_closed
+
+        columns = {
+            "door_closed": door_closed,
+            "speed_actual": _uniform(u[self.SPEED], 1400, 1600, 1),
+            "load_percent": load_percent,
+            "x_position": _uniform(u[self.X_POSITION], 0, 200, 2),
+            "x_feedrate": _uniform(u[self.X_FEEDRATE], 100, 250, 1),
+            "z_position": _uniform(u[self.Z_POSITION], 0, 300, 2),
+            "z_feedrate": _uniform(u[self.Z_FEEDRATE], 150, 300, 1),
+            "cycle_time_seconds": _uniform(u[self.CYCLE_TIME], 20, 50, 1),
+            "parts_completed": self.parts_completed,
+            "parts_rejected": self.parts_rejected,
+            "parts_per_hour": parts_per_hour,
+            "spindle_overload": load_percent > 90,
+            "chuck_not_clamped": chuck_not_clamped,
+            "door_open": door_open,
+            "tool_wear": self.tool_life_percent < 30,
+            "coolant_low": self.coolant_level_percent < 20,
+            "system_running": running,
+            "machining": machining,
+            "ready": ~machining & running,
+            "fault": chuck_not_clamped | door_open,
+            "tool_number": self.current_tool,
+            "tool_life_percent": np.round(self.tool_life_percent, 1),
+            "tool_offset_x": _uniform(u[self.OFFSET_X], -0.5, 0.5, 3),
+            "tool_offset_z": _uniform(u[self.OFFSET_Z], -0.5, 0.5, 3),
+            "flow_rate": np.where(running, _uniform(u[self.COOLANT_FLOW], 5, 10, 1), 0.0),
+            "temperature": _uniform(u[self.COOLANT_TEMPERATURE], 20, 25, 1),
+            "level_percent": np.round(self.coolant_level_percent, 1),
+        }
+        self.columns = {name: values.tolist() for name, values in columns.items()}
+
+    def reading(self, i):
+        """Payload of machine i for the current tick"""
+        c = self.columns
+        return {
+            "timestamp": datetime.fromtimestamp(self.clock(), timezone.utc).isoformat(),
+            "machine_id": self.machine_ids[i],
+            "safety": {
+                "door_closed": c["door_closed"][i],
+                "estop_ok": True,
+            },
+            "spindle": {
+                "speed_actual": c["speed_actual"][i],
+                "speed_setpoint": 1500.0,
+                "load_percent": c["load_percent"][i],
+            },
+            "axis_x": {
+                "position": c["x_position"][i],
+                "feedrate": c["x_feedrate"][i],
+                "homed": True,
+            },
+            "axis_z": {
+                "position": c["z_position"][i],
+                "feedrate": c["z_feedrate"][i],
+                "homed": True,
+            },
+            "production": {
+                "cycle_time_seconds": c["cycle_time_seconds"][i],
+                "parts_completed": c["parts_completed"][i],
+                "parts_rejected": c["parts_rejected"][i],
+                "parts_per_hour": c["parts_per_hour"][i],
+            },
+            "alarms": {
+                "spindle_overload": c["spindle_overload"][i],
+                "chuck_not_clamped": c["chuck_not_clamped"][i],
+                "door_open": c["door_open"][i],
+                "tool_wear": c["tool_wear"][i],
+                "coolant_low": c["coolant_low"][i],
+            },
+            "status": {
+                "system_running": c["system_running"][i],
+                "machining": c["machining"][i],
+                "ready": c["ready"][i],
+                "fault": c["fault"][i],
+                "auto_mode": True,
+            },
+            "tooling": {
+                "tool_number": c["tool_number"][i],
+                "tool_life_percent": c["tool_life_percent"][i],
+                "tool_offset_x": c["tool_offset_x"][i],
+                "tool_offset_z": c["tool_offset_z"][i],
+            },
+            "coolant": {
+                "flow_rate": c["flow_rate"][i],
+                "temperature": c["temperature"][i],
+                "level_percent": c["level_percent"][i],
+            }
+        }
+
@@ -12,7 +12,7 @@ interface AlarmEvent {
   machine_id: string;
   alarm_type: string;
   alarm_label: string;
-  state: 'RAISED' | 'CLEARED';
+  state: 'RAISED' | 'CLEARED' | 'FLAPPING';
   value: boolean;
 }
 
@@ -22,16 +22,54 @@ interface AlarmEventsProps {
 }
 
 interface WebSocketAlarm {
+  type?: string;
+  seq?: number;
   machine_id: string;
+  machine_type?: string;
   alarm_name: string;
   alarm_type: string;
-  state: 'RAISED' | 'CLEARED';
+  state: 'RAISED' | 'CLEARED' | 'FLAPPING';
   timestamp: string;
 }
 
+// Snapshot of active alarms / replay of missed events sent by the alarm monitor
+interface WebSocketState {
+  type: 'snapshot' | 'replay' | 'subscribed';
+  epoch?: string;
+  seq: number;
+  active?: { machine_id: string; alarm_name: string; alarm_type: string; state?: 'RAISED' | 'FLAPPING'; since: string; seq: number }[];
+  events?: WebSocketAlarm[];
+}
+
+const toAlarmEvent = (alarm: WebSocketAlarm): AlarmEvent => ({
+  timestamp: alarm.timestamp,
+  machine_id: alarm.machine_id,
+  alarm_type: alarm.alarm_type,
+  alarm_label: alarm.alarm_name,
+  state: alarm.state,
+  value: alarm.state !== 'CLEARED',
+});
+
+// Merge events into the list, newest first, without duplicates
+const mergeEvents = (incoming: AlarmEvent[], current: AlarmEvent[]): AlarmEvent[] => {
+  const seen = new Set<string>();
+  return [...incoming, ...current]
+    .filter((e) => {
+      const key = `${e.machine_id}|${e.alarm_type}|${e.state}|${e.timestamp}`;
+      if (seen.has(key)) return false;
+      seen.add(key);
+      return true;
+    })
+    .sort((a, b) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime())
+    .slice(0, 50);
+};
+
 export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEventsProps) {
   const [isExpanded, setIsExpanded] = useState(true);
   const wsRef = useRef<WebSocket | null>(null);
+  // Last alarm seq applied and the stream epoch it belongs to; sent as resume_from/epoch on reconnect
+  const lastSeqRef = useRef(0);
+  const epochRef = useRef<string | null>(null);
   const [wsConnected, setWsConnected] = useState(false);
   const [events, setEvents] = useState<AlarmEvent[]>([]);
   const [connectionStatus, setConnectionStatus] = useState<'connecting' | 'connected' | 'disconnected' | 'error'>('connecting');
@@ -48,11 +86,48 @@ export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEven
       console.log('✅ Connected to alarm WebSocket');
       setWsConnected(true);
       setConnectionStatus('connected');
+      // Only receive alarms for the selected machine, resuming after the last one seen
+      ws.send(JSON.stringify({
+        type: 'subscribe',
+        machine_ids: machineId ? [machineId] : [],
+        ...(lastSeqRef.current > 0 ? { resume_from: lastSeqRef.current } : {}),
+        ...(epochRef.current ? { epoch: epochRef.current } : {}),
+      }));
     };
 
     ws.onmessage = (event) => {
       try {
         const alarm: WebSocketAlarm = JSON.parse(event.data);
+        // Control messages carry a type; alarms don't
+        if (alarm.type) {
+          const state = alarm as unknown as WebSocketState;
+          if (state.type === 'snapshot' && state.active) {
+            // Alarms active right now (shown as their RAISED events). Take the snapshot's
+            // seq as is: after a monitor restart with a reset log it starts again at 0
+            lastSeqRef.current = state.seq;
+            epochRef.current = state.epoch ?? null;
+            const active = state.active
+              .filter((a) => !machineId || a.machine_id === machineId)
+              .map((a) => toAlarmEvent({ ...a, state: a.state || 'RAISED', timestamp: a.since }));
+            setEvents((prevEvents) => mergeEvents(active, prevEvents));
+          } else if (state.type === 'replay' && state.events) {
+            // Events missed while disconnected
+            lastSeqRef.current = state.seq;
+            epochRef.current = state.epoch ?? null;
+            const missed = state.events
+              .filter((e) => !machineId || e.machine_id === machineId)
+              .map(toAlarmEvent);
+            setEvents((prevEvents) => mergeEvents(missed, prevEvents));
+          }
+          return;
+        }
+        // Already covered by a snapshot/replay
+        if (alarm.seq !== undefined) {
+          if (alarm.seq <= lastSeqRef.current) {
+            return;
+          }
+          lastSeqRef.current = alarm.seq;
+        }
         console.log('📨 Received alarm via WebSocket:', alarm);
         console.log('   Machine:', alarm.machine_id);
         console.log('   Alarm Name:', alarm.alarm_name);
@@ -96,14 +171,7 @@ export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEven
           
           // Update local state directly from WebSocket message (no API call)
           // Update table for both RAISED and CLEARED to maintain complete history
-          const newEvent: AlarmEvent = {
-            timestamp: alarm.timestamp,
-            machine_id: alarm.machine_id,
-            alarm_type: alarm.alarm_type,
-            alarm_label: alarm.alarm_name,
-            state: alarm.state,
-            value: alarm.state === 'RAISED',
-          };
+          const newEvent = toAlarmEvent(alarm);
           
           // Add new event to the beginning of the list
           // Keep events for all machines in state, but filter when displaying
@@ -184,7 +252,7 @@ export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEven
 
   // Filter events to only show those for the selected machine
   const filteredEvents = events.filter(e => e.machine_id === machineId);
-  const activeAlarms = filteredEvents.filter(e => e.state === 'RAISED').length;
+  const activeAlarms = filteredEvents.filter(e => e.state !== 'CLEARED').length;
 
   const getConnectionStatusColor = () => {
     switch (connectionStatus) {
@@ -313,20 +381,23 @@ export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEven
                     <div
                       key={`${event.timestamp}-${index}`}
                       className={`p-3 rounded border ${
-                        event.state === 'RAISED'
+                        event.state !== 'CLEARED'
                           ? 'bg-red-500/10 border-red-500/30'
                           : 'bg-sage-500/10 border-sage-500/30'
                       }`}
                     >
                       <div className="flex items-center justify-between">
                         <div className="flex items-center gap-3 flex-1">
-                          {event.state === 'RAISED' ? (
+                          {event.state !== 'CLEARED' ? (
                             <AlertIcon className="w-4 h-4 text-red-400" />
                           ) : (
                             <CheckIcon className="w-4 h-4 text-sage-400" />
                           )}
                           <div className="flex-1">
-                            <div className="text-dark-text font-medium">{formatAlarmName(event.alarm_type)}</div>
+                            <div className="text-dark-text font-medium">
+                              {formatAlarmName(event.alarm_type)}
+                              {event.state === 'FLAPPING' && <span className="text-gray-400 text-xs ml-2">flapping</span>}
+                            </div>
                             <div className="text-gray-500 text-xs">{formatTime(event.timestamp)}</div>
                           </div>
                         </div>
@@ -335,7 +406,7 @@ export function AlarmEvents({ machineId = 'machine-01', machineType }: AlarmEven
                             onClick={() => setSelectedAlarm({
                               alarmType: event.alarm_type,
                               machineType: eventMachineType,
-                              state: event.state,
+                              state: event.state === 'CLEARED' ? 'CLEARED' : 'RAISED',
                             })}
                             className="flex items-center gap-1.5 text-xs bg-midnight-300 hover:bg-midnight-400 text-dark-text px-2 py-1 rounded transition-colors"
                           >
@@ -0,0 +1,188 @@
+"""
+Batching write stage for the InfluxDB writer
+
+on_message hands encoded line-protocol records (bytes) to a bounded in-process
+queue and returns immediately. A background thread drains the queue and writes
+to InfluxDB in batches, flushing when a batch reaches BATCH_SIZE records or its
+oldest record is FLUSH_INTERVAL seconds old, so the MQTT network loop never
+waits on an HTTP round trip.
+
+With a Spool attached, batches that fail to write (InfluxDB restart, network
+partition) go to disk instead of being lost. While the spool holds data, new
+batches are appended behind it so points reach InfluxDB in order, and the
+thread replays it at no more than REPLAY_RATE points/second, backing off
+between failed attempts.
+"""
+import queue
+import threading
+import time
+
+
+class BatchWriter:
+    # HTTP statuses that mean the data itself was rejected; retrying won't help
+    REJECTED_STATUSES = (400, 413, 422)
+
+    def __init__(self, write_api, bucket, batch_size=500, flush_interval=1.0, queue_size=10000,
+                 spool=None, replay_rate=5000.0, max_backoff=30.0, on_write=None):
+        """
+        on_write: optional fn(entries, seconds, ok) called after every write attempt
+        from the writer thread; entries are (line, machine_id, timestamp_ns) tuples
+        (machine_id/timestamp_ns are None for spool replays)
+        """
+        self.write_api = write_api
+        self.bucket = bucket
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.max_backoff = max_backoff
+        self.on_write = on_write
+
+        # Counters (read by the summary output in the writer)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+
+        # Spool replay pacing
+        self._next_replay = 0.0
+        self._backoff = 1.0
+        self._replay_started = None
+        self._replay_start_count = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="influx-batch-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, record, machine_id=None, timestamp_ns=None):
+        """
+        Queue an encoded line-protocol record for writing. machine_id/timestamp_ns
+        are passed through to on_write. Never blocks; returns False if the queue is full.
+        """
+        try:
+            self.queue.put_nowait((record, machine_id, timestamp_ns))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=10.0):
+        """Stop the writer thread after flushing everything still queued"""
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"⚠️  Batch writer for {self.bucket} still flushing after {timeout:.0f}s, "
+                  f"{self.queue.qsize()} queued points may be lost")
+
+    def _run(self):
+        batch = []
+        batch_started = 0.0
+
+        while True:
+            # Wait at most until the current batch (or the next spool replay) is due
+            now = time.monotonic()
+            if batch:
+                wait = max(0.0, batch_started + self.flush_interval - now)
+            else:
+                wait = self.flush_interval
+            if self.spool is not None and self.spool.pending:
+                wait = min(wait, max(0.0, self._next_replay - now))
+
+            try:
+                record = self.queue.get(timeout=wait)
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(record)
+                # Pull whatever else is already queued without waiting
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            due = batch and (len(batch) >= self.batch_size or
+                             time.monotonic() - batch_started >= self.flush_interval)
+            if due:
+                self._flush(batch)
+                batch = []
+
+            if self.spool is not None and self.spool.pending and time.monotonic() >= self._next_replay:
+                self._replay()
+
+            if self._stop.is_set() and self.queue.empty():
+                if batch:
+                    self._flush(batch)
+                if self.spool is not None:
+                    self.spool.close()
+                return
+
+    def _write(self, batch):
+        """Write one batch of entries; returns True if it's done with (written or rejected)"""
+        started = time.perf_counter()
+        ok = True
+        try:
+            self.write_api.write(bucket=self.bucket, record=b"\n".join(entry[0] for entry in batch))
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            if getattr(e, "status", None) in self.REJECTED_STATUSES:
+                self.rejected += len(batch)
+                print(f"❌ InfluxDB rejected batch of {len(batch)} points, dropping it: {e}")
+            else:
+                ok = False
+                print(f"❌ Failed to write batch of {len(batch)} points to InfluxDB: {e}")
+        if self.on_write is not None:
+            self.on_write(batch, time.perf_counter() - started, ok)
+        return ok
+
+    def _flush(self, batch):
+        if self.spool is None:
+            if not self._write(batch):
+                self.failed += len(batch)
+            return
+        # Keep ordering: anything newer than spooled data waits behind it
+        if self.spool.pending or not self._write(batch):
+            if not self.spool.pending:
+                self._schedule_retry()
+                print(f"💽 InfluxDB unavailable, spooling to {self.spool.directory}")
+            self.spool.append([entry[0] for entry in batch])
+
+    def _schedule_retry(self):
+        self._next_replay = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    def _replay(self):
+        """Write one rate-limited chunk of spooled points back to InfluxDB"""
+        lines = self.spool.read_batch(self.batch_size)
+        if not lines:
+            return
+        if self._replay_started is None:
+            self._replay_started = time.monotonic()
+            self._replay_start_count = self.spool.replayed
+
+        started = time.monotonic()
+        if not self._write([(line, None, None) for line in lines]):
+            self.spool.rollback()
+            self._schedule_retry()
+            return
+        self.spool.commit(len(lines))
+        self._backoff = 1.0
+        self._next_replay = started + (len(lines) / self.replay_rate if self.replay_rate > 0 else 0.0)
+
+        if not self.spool.pending:
+            elapsed = max(time.monotonic() - self._replay_started, 1e-9)
+            count = self.spool.replayed - self._replay_start_count
+            print(f"♻️  Spool drained: replayed {count} points in {elapsed:.1f}s ({count / elapsed:.0f} points/s)")
+            self._replay_started = None
+
+    @property
+    def replay_throughput(self):
+        """Points/second replayed from the spool in the current replay run (0 if idle)"""
+        if self._replay_started is None:
+            return 0.0
+        elapsed = max(time.monotonic() - self._replay_started, 1e-9)
+        return (self.spool.replayed - self._replay_start_count) / elapsed
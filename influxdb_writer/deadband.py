@@ -0,0 +1,83 @@
+"""
+Report-by-exception filter for the InfluxDB writer
+
+Simulators and gateways publish every field on every tick, even tags that
+almost never change (AxisXHomed, EStopOK, setpoints). This filter, keyed by
+machine_id, passes a field only when it differs from the last value written
+for that machine:
+
+- bool/int/str fields: on any change
+- float fields: when they move more than the field's deadband (absolute
+  units, DEFAULT for fields without their own; 0 means any change)
+
+Every HEARTBEAT seconds of payload time a machine's full field set is written
+again, so "last value" dashboard queries over a window always find data.
+If a filtered point is dropped (write queue full), forget() the machine so
+the next point is written in full.
+
+State is per machine, so with multiple writer workers use
+WRITER_SHARD_MODE=hash to keep each machine on one worker.
+"""
+
+
+def parse_deadbands(spec):
+    """Parse "FillLevel=0.5,TankTemperature=0.2" into {field: deadband}"""
+    deadbands = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            field, value = item.split("=", 1)
+            deadbands[field.strip()] = float(value)
+    return deadbands
+
+
+class DeadbandFilter:
+    def __init__(self, default_deadband=0.0, deadbands=None, heartbeat=60.0):
+        self.default_deadband = default_deadband
+        self.deadbands = deadbands or {}
+        self.heartbeat_ns = int(heartbeat * 1_000_000_000)
+
+        # Counters
+        self.fields_in = 0
+        self.fields_out = 0
+
+        self._last = {}  # machine_id -> {field: last written value}
+        self._last_full = {}  # machine_id -> payload time of the last full write (ns)
+
+    def filter(self, machine_id, fields, timestamp_ns):
+        """Return the subset of fields to write (empty dict: skip the point)"""
+        self.fields_in += len(fields)
+        last = self._last.get(machine_id)
+        if last is None or timestamp_ns - self._last_full[machine_id] >= self.heartbeat_ns \
+                or timestamp_ns < self._last_full[machine_id]:
+            # First point for this machine, heartbeat due, or the clock went backwards
+            self._last[machine_id] = dict(fields)
+            self._last_full[machine_id] = timestamp_ns
+            self.fields_out += len(fields)
+            return fields
+
+        changed = {}
+        deadbands = self.deadbands
+        for name, value in fields.items():
+            previous = last.get(name)
+            if value.__class__ is float and previous.__class__ is float:
+                if abs(value - previous) <= deadbands.get(name, self.default_deadband):
+                    continue
+            elif value == previous and value.__class__ is previous.__class__:
+                continue
+            changed[name] = value
+            last[name] = value
+        self.fields_out += len(changed)
+        return changed
+
+    def forget(self, machine_id):
+        """
+        Drop a machine's state after its point could not be queued, so the
+        next point is written in full instead of being compared against
+        values that never reached InfluxDB
+        """
+        self._last.pop(machine_id, None)
+        self._last_full.pop(machine_id, None)
+
+    @property
+    def suppressed(self):
+        return self.fields_in - self.fields_out
@@ -0,0 +1,178 @@
+"""
+Payload decoders for the InfluxDB writer
+
+Each machine type declares the fields it stores as a flat plan of
+(InfluxDB field, payload group, payload key, type, default) entries. The plan
+is compiled once at import into a single extraction function, and the registry routes a
+message by the machine type segment of its topic (plc/{machine_id}/{type}/data)
+instead of probing payload keys. Adding a machine type (mixer, press, ...) is a
+new plan plus a register() call - on_message does not change.
+"""
+
+
+class PayloadDecoder:
+    def __init__(self, machine_type, fields, requires=None, derive=None, site_tags=True):
+        """
+        machine_type: value for the machine_type tag
+        fields: list of (field, group, key, cast, default); group None reads the top level
+        requires: payload key that identifies this format when a type has several
+        derive: optional fn(data, fields) for fields computed from more than one key
+        site_tags: add the optional line/location tags
+        """
+        self.machine_type = machine_type
+        self.requires = requires
+        self.derive = derive
+        self.site_tags = site_tags
+        self.field_names = tuple(entry[0] for entry in fields)
+
+        self._extract = self._compile(fields)
+
+    @staticmethod
+    def _compile(fields):
+        """
+        Compile the plan into one extraction function, the same code a hand-written
+        decoder would have (each group fetched once, one dict literal), built the
+        way collections.namedtuple builds its methods.
+        """
+        groups, casts, items = {}, {}, []
+        for field, group, key, cast, default in fields:
+            if group is None:
+                source = "data"
+            else:
+                source = groups.setdefault(group, f"g{len(groups)}")
+            cast_name = casts.setdefault(cast, f"c{len(casts)}")
+            items.append(f"        {field!r}: {cast_name}({source}.get({key!r}, {default!r})),")
+        lines = ["def extract(data):"]
+        lines += [f"    {name} = data.get({group!r}) or {{}}" for group, name in groups.items()]
+        lines += ["    return {"] + items + ["    }"]
+        namespace = {name: cast for cast, name in casts.items()}
+        exec("\n".join(lines), namespace)
+        return namespace["extract"]
+
+    def decode(self, data):
+        """Extract the typed field dict from a parsed payload"""
+        fields = self._extract(data)
+        if self.derive is not None:
+            self.derive(data, fields)
+        return fields
+
+
+class DecoderRegistry:
+    def __init__(self):
+        self._by_type = {}
+        self._single = {}  # topic segment -> decoder, for segments with exactly one format
+
+    def register(self, decoder, topic_segment=None):
+        """Register a decoder under its topic segment (defaults to the machine type)"""
+        segment = topic_segment or decoder.machine_type
+        candidates = self._by_type.setdefault(segment, [])
+        candidates.append(decoder)
+        # Built here so the per-message route is one dict lookup for the common case
+        if len(candidates) == 1:
+            self._single[segment] = decoder
+        else:
+            self._single.pop(segment, None)
+
+    def machine_types(self):
+        return list(self._by_type)
+
+    def route(self, topic_parts, data):
+        """Pick the decoder for a message; returns None for unknown formats"""
+        if len(topic_parts) > 2:
+            segment = topic_parts[2]
+            decoder = self._single.get(segment)
+            if decoder is not None:
+                return decoder  # the topic alone identifies the format
+            candidates = self._by_type.get(segment)
+        else:
+            candidates = None
+        if candidates is None:
+            # Topic doesn't follow plc/{machine_id}/{type}/...: fall back to probing keys
+            candidates = [d for decoders in self._by_type.values() for d in decoders]
+        for decoder in candidates:
+            if decoder.requires is None or decoder.requires in data:
+                return decoder
+        return None
+
+
+# === Bottle filler (mock_plc_agent full dataset) ===
+def _derive_bottlefiller(data, fields):
+    # Fault alarm is raised by either the alarms or the status group
+    fields["AlarmFault"] = bool(fields["AlarmFault"] or fields["Fault"])
+
+
+BOTTLEFILLER = PayloadDecoder("bottlefiller", [
+    # Tier 1: Critical Status
+    ("SystemRunning", "status", "SystemRunning", bool, False),
+    ("Fault", "status", "Fault", bool, False),
+    ("Filling", "status", "Filling", bool, False),
+    ("Ready", "status", "Ready", bool, False),
+    # Tier 1: Critical Counters
+    ("BottlesFilled", "counters", "BottlesFilled", int, 0),
+    ("BottlesRejected", "counters", "BottlesRejected", int, 0),
+    ("BottlesPerMinute", "counters", "BottlesPerMinute", float, 0.0),
+    # Tier 1: Critical Alarms
+    ("AlarmFault", "alarms", "Fault", bool, False),
+    ("AlarmOverfill", "alarms", "Overfill", bool, False),
+    ("AlarmUnderfill", "alarms", "Underfill", bool, False),
+    ("AlarmLowProductLevel", "alarms", "LowProductLevel", bool, False),
+    ("AlarmCapMissing", "alarms", "CapMissing", bool, False),
+    # Tier 2: Important Analog
+    ("FillLevel", "analog", "FillLevel", float, 0.0),
+    ("TankTemperature", "analog", "TankTemperature", float, 0.0),
+    ("TankPressure", "analog", "TankPressure", float, 0.0),
+    ("FillFlowRate", "analog", "FillFlowRate", float, 0.0),
+    ("ConveyorSpeed", "analog", "ConveyorSpeed", float, 0.0),
+    # Tier 2: Important Inputs
+    ("LowLevelSensor", "inputs", "LowLevel", bool, False),
+], requires="counters", derive=_derive_bottlefiller)
+
+# === Bottle filler (edge gateway simplified format) ===
+BOTTLEFILLER_EDGE = PayloadDecoder("bottlefiller", [
+    ("BottleCount", None, "BottleCount", int, 0),
+    ("FillerSpeed", None, "FillerSpeed", float, 0.0),
+    ("LineRunning", None, "LineRunning", bool, False),
+], requires="BottleCount")
+
+# === CNC Lathe (lathe_sim) ===
+LATHE = PayloadDecoder("lathe", [
+    ("DoorClosed", "safety", "door_closed", bool, False),
+    ("EStopOK", "safety", "estop_ok", bool, False),
+    ("SpindleSpeed", "spindle", "speed_actual", float, 0.0),
+    ("SpindleSpeedSetpoint", "spindle", "speed_setpoint", float, 0.0),
+    ("SpindleLoad", "spindle", "load_percent", float, 0.0),
+    ("AxisXPosition", "axis_x", "position", float, 0.0),
+    ("AxisXFeedrate", "axis_x", "feedrate", float, 0.0),
+    ("AxisXHomed", "axis_x", "homed", bool, False),
+    ("AxisZPosition", "axis_z", "position", float, 0.0),
+    ("AxisZFeedrate", "axis_z", "feedrate", float, 0.0),
+    ("AxisZHomed", "axis_z", "homed", bool, False),
+    ("CycleTime", "production", "cycle_time_seconds", float, 0.0),
+    ("PartsCompleted", "production", "parts_completed", int, 0),
+    ("PartsRejected", "production", "parts_rejected", int, 0),
+    ("PartsPerHour", "production", "parts_per_hour", float, 0.0),
+    ("AlarmSpindleOverload", "alarms", "spindle_overload", bool, False),
+    ("AlarmChuckNotClamped", "alarms", "chuck_not_clamped", bool, False),
+    ("AlarmDoorOpen", "alarms", "door_open", bool, False),
+    ("AlarmToolWear", "alarms", "tool_wear", bool, False),
+    ("AlarmCoolantLow", "alarms", "coolant_low", bool, False),
+    ("SystemRunning", "status", "system_running", bool, False),
+    ("Machining", "status", "machining", bool, False),
+    ("Ready", "status", "ready", bool, False),
+    ("Fault", "status", "fault", bool, False),
+    ("AutoMode", "status", "auto_mode", bool, False),
+    ("ToolNumber", "tooling", "tool_number", int, 0),
+    ("ToolLifePercent", "tooling", "tool_life_percent", float, 0.0),
+    ("ToolOffsetX", "tooling", "tool_offset_x", float, 0.0),
+    ("ToolOffsetZ", "tooling", "tool_offset_z", float, 0.0),
+    ("CoolantFlowRate", "coolant", "flow_rate", float, 0.0),
+    ("CoolantTemperature", "coolant", "temperature", float, 0.0),
+    ("CoolantLevelPercent", "coolant", "level_percent", float, 0.0),
+], requires="spindle", site_tags=False)
+
+
+# Default registry used by the production writer
+registry = DecoderRegistry()
+registry.register(BOTTLEFILLER)
+registry.register(BOTTLEFILLER_EDGE)
+registry.register(LATHE)
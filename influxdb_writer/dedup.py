@@ -0,0 +1,38 @@
+"""
+Duplicate filter for QoS 1 redeliveries
+
+Publishers use qos=1, so after a reconnect the broker may deliver a message
+again (not always with the DUP flag set). Each machine keeps the keys of its
+last WINDOW messages, key = (payload timestamp, hash of the raw payload), and
+a message whose key is already in the window is dropped before it is decoded.
+
+Memory is WINDOW keys per machine, independent of the message rate. As with
+the other per-machine state, use WRITER_SHARD_MODE=hash with multiple workers.
+"""
+from collections import deque
+
+
+class DedupWindow:
+    def __init__(self, size=64):
+        self.size = size
+
+        # Counters
+        self.dropped = 0
+
+        self._seen = {}  # machine_id -> (set of keys, deque of keys oldest-first)
+
+    def is_duplicate(self, machine_id, timestamp, payload):
+        """True if this (timestamp, payload) was already seen for the machine; records it otherwise"""
+        key = (timestamp, hash(payload))
+        state = self._seen.get(machine_id)
+        if state is None:
+            state = self._seen[machine_id] = (set(), deque())
+        keys, order = state
+        if key in keys:
+            self.dropped += 1
+            return True
+        keys.add(key)
+        order.append(key)
+        if len(order) > self.size:
+            keys.discard(order.popleft())
+        return False
@@ -4,7 +4,7 @@ InfluxDB Writer Service (Production) - Subscribes to MQTT and writes to InfluxDB
 This runs on the IT network and subscribes to cloud MQTT broker
 Supports multiple machines via machine_id tags
 """
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 import paho.mqtt.client as mqtt
 import json
@@ -12,10 +12,22 @@ import sys
 import os
 import ssl
 import uuid
-from datetime import datetime, timezone
+import zlib
+import signal
+import time
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from influxdb_writer.batch_writer import BatchWriter
+from influxdb_writer.decoders import registry
+from influxdb_writer.line_protocol import LineProtocolEncoder
+from influxdb_writer.spool import Spool
+from influxdb_writer.supervisor import WorkerSupervisor
+from influxdb_writer.ingest_log import IngestLog
+from influxdb_writer.metrics import MetricsRegistry
+from influxdb_writer.dedup import DedupWindow
+from influxdb_writer.deadband import DeadbandFilter, parse_deadbands
+from influxdb_writer.rollups import RollupAggregator, parse_windows, window_label
 
 # Load .env file from project root
 try:
@@ -42,282 +54,249 @@ INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token")
 INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "myorg")
 INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "plc_data_new")
 
+# Optional site tags (payload line_id/location take precedence)
+LINE_ID = os.getenv("LINE_ID", None)
+LOCATION = os.getenv("LOCATION", None)
+
+# Batching Configuration (on_message only queues points; a writer thread flushes them)
+WRITER_BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", "500"))  # Flush when this many points are queued
+WRITER_FLUSH_INTERVAL = float(os.getenv("WRITER_FLUSH_INTERVAL", "1.0"))  # ...or when the oldest is this old (seconds)
+WRITER_QUEUE_SIZE = int(os.getenv("WRITER_QUEUE_SIZE", "10000"))  # Max queued points before new ones are dropped
+
+# Store-and-forward spool (buffers points on disk while InfluxDB is unreachable; empty dir disables)
+WRITER_SPOOL_DIR = os.getenv("WRITER_SPOOL_DIR", "/tmp/influxdb_writer_spool")
+WRITER_SPOOL_MAX_MB = float(os.getenv("WRITER_SPOOL_MAX_MB", "512"))  # Oldest segments are evicted above this
+WRITER_SPOOL_SEGMENT_MB = float(os.getenv("WRITER_SPOOL_SEGMENT_MB", "16"))
+WRITER_SPOOL_FSYNC_INTERVAL = float(os.getenv("WRITER_SPOOL_FSYNC_INTERVAL", "1.0"))  # seconds
+WRITER_SPOOL_REPLAY_RATE = float(os.getenv("WRITER_SPOOL_REPLAY_RATE", "5000"))  # points/second when draining
+
+# Multi-worker mode (WRITER_WORKERS > 1 turns this process into a supervisor of N workers)
+WRITER_WORKERS = int(os.getenv("WRITER_WORKERS", "1"))
+WRITER_WORKER_INDEX = os.getenv("WRITER_WORKER_INDEX")  # Set by the supervisor for each worker
+WRITER_SHARD_MODE = os.getenv("WRITER_SHARD_MODE", "shared")  # "shared" ($share subscription) or "hash" (by machine_id)
+WRITER_SHARE_GROUP = os.getenv("WRITER_SHARE_GROUP", "writers")
+WRITER_STOP_TIMEOUT = float(os.getenv("WRITER_STOP_TIMEOUT", "30"))  # seconds each batch writer gets for its final flush
+
+# Console logging (off | summary | sample | debug)
+WRITER_LOG_LEVEL = os.getenv("WRITER_LOG_LEVEL", "summary").lower()
+WRITER_LOG_SAMPLE_EVERY = int(os.getenv("WRITER_LOG_SAMPLE_EVERY", "100"))  # "sample": details every Nth message per machine
+WRITER_LOG_SUMMARY_INTERVAL = float(os.getenv("WRITER_LOG_SUMMARY_INTERVAL", "30"))  # seconds between summaries
+
+# Drop QoS 1 redeliveries: messages seen among a machine's last N (0 disables)
+WRITER_DEDUP_WINDOW = int(os.getenv("WRITER_DEDUP_WINDOW", "64"))
+
+# Report-by-exception filter (write a field only when it changes by more than its deadband)
+WRITER_DEADBAND_ENABLED = os.getenv("WRITER_DEADBAND_ENABLED", "false").lower() == "true"
+WRITER_DEADBAND_DEFAULT = float(os.getenv("WRITER_DEADBAND_DEFAULT", "0.0"))  # Float fields without their own deadband
+WRITER_DEADBAND_FIELDS = os.getenv("WRITER_DEADBAND_FIELDS", "")  # e.g. "FillLevel=0.5,TankTemperature=0.2"
+WRITER_DEADBAND_HEARTBEAT = float(os.getenv("WRITER_DEADBAND_HEARTBEAT", "60"))  # seconds between full re-writes
+
+# Downsampling rollups (min/max/mean/last/count per window, written to a separate bucket)
+WRITER_ROLLUPS_ENABLED = os.getenv("WRITER_ROLLUPS_ENABLED", "false").lower() == "true"
+WRITER_ROLLUP_WINDOWS = parse_windows(os.getenv("WRITER_ROLLUP_WINDOWS", "60,300,3600"))  # seconds
+WRITER_ROLLUP_GRACE = float(os.getenv("WRITER_ROLLUP_GRACE", "10"))  # close idle machines' windows this late
+INFLUXDB_ROLLUP_BUCKET = os.getenv("INFLUXDB_ROLLUP_BUCKET", "plc_data_rollup")
+WRITER_ROLLUP_SPOOL_SHARE = float(os.getenv("WRITER_ROLLUP_SPOOL_SHARE", "0.1"))  # of WRITER_SPOOL_MAX_MB, taken from the main spool
+
+# Prometheus metrics endpoint (0 disables; worker N listens on port + N)
+WRITER_METRICS_PORT = int(os.getenv("WRITER_METRICS_PORT", "9108"))
+
+if WRITER_WORKERS > 1 and WRITER_WORKER_INDEX is None:
+    # Workers stop their batch writers one after the other (plus the rollup writer), then a margin
+    stop_timeout = WRITER_STOP_TIMEOUT * (2 if WRITER_ROLLUPS_ENABLED else 1) + 5
+    WorkerSupervisor(os.path.abspath(__file__), WRITER_WORKERS, stop_timeout=stop_timeout).run()
+    sys.exit(0)
+
+WORKER_INDEX = int(WRITER_WORKER_INDEX or 0)
+HASH_SHARDING = WRITER_WORKERS > 1 and WRITER_SHARD_MODE == "hash"
+SUBSCRIBE_PREFIX = f"$share/{WRITER_SHARE_GROUP}/" if WRITER_WORKERS > 1 and WRITER_SHARD_MODE == "shared" else ""
+if WRITER_WORKERS > 1 and WRITER_SPOOL_DIR:
+    WRITER_SPOOL_DIR = os.path.join(WRITER_SPOOL_DIR, f"worker-{WORKER_INDEX}")  # One spool per worker
+
+# Metrics
+metrics = MetricsRegistry()
+m_messages = metrics.counter("writer_messages_received_total", "MQTT messages received", ("topic",))
+m_decode_errors = metrics.counter("writer_decode_errors_total", "Messages that could not be decoded", ("machine_id",))
+m_decode_seconds = metrics.histogram("writer_decode_seconds", "Time to parse, decode and encode one message")
+m_dropped = metrics.counter("writer_queue_dropped_total", "Points dropped because the write queue was full")
+m_write_seconds = metrics.histogram("writer_write_seconds", "InfluxDB write request latency", ("result",))
+m_batch_size = metrics.histogram("writer_batch_size", "Points per InfluxDB write request",
+                                 buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+m_points_written = metrics.counter("writer_points_written_total", "Points written to InfluxDB")
+m_reconnects = metrics.counter("writer_mqtt_reconnects_total", "MQTT reconnections after the first connect")
+m_lag = metrics.histogram("writer_ingest_lag_seconds", "Payload timestamp to InfluxDB write",
+                          buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600))
+m_machine_lag = metrics.gauge("writer_machine_lag_seconds", "Ingest lag of the newest point written per machine", ("machine_id",))
+metrics.gauge("writer_queue_depth", "Points waiting in the write queue", callback=lambda: batch_writer.queue.qsize())
+metrics.gauge("writer_spool_bytes", "Bytes waiting in the disk spool", callback=lambda: spool.total_bytes if spool else 0)
+metrics.gauge("writer_spool_segments", "Segment files in the disk spool", callback=lambda: spool.segment_count if spool else 0)
+metrics.counter("writer_duplicates_dropped_total", "Redelivered messages dropped by the dedup window",
+                callback=lambda: dedup.dropped if dedup else 0)
+metrics.counter("writer_rollup_rows_total", "Rollup window rows emitted", callback=lambda: rollups.rows if rollups else 0)
+metrics.counter("writer_rollup_late_points_total", "Points skipped by rollups because their window had already closed",
+                callback=lambda: rollups.late if rollups else 0)
+metrics.counter("writer_deadband_fields_suppressed_total", "Fields not written because they did not change",
+                callback=lambda: deadband.suppressed if deadband else 0)
+mqtt_connects = 0
+
 # MQTT callback
 def on_connect(client, userdata, flags, rc):
+    global mqtt_connects
     if rc == 0:
+        if mqtt_connects > 0:
+            m_reconnects.inc()
+        mqtt_connects += 1
         print(f"✅ Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC)  # Bottlefiller topics
-        client.subscribe("plc/+/lathe/data")  # Lathe topics
-        print(f"📡 Subscribed to: {MQTT_TOPIC} (bottlefiller)")
-        print(f"📡 Subscribed to: plc/+/lathe/data (lathe)\n")
+        client.subscribe(SUBSCRIBE_PREFIX + MQTT_TOPIC)  # Bottlefiller topics
+        client.subscribe(SUBSCRIBE_PREFIX + "plc/+/lathe/data")  # Lathe topics
+        print(f"📡 Subscribed to: {SUBSCRIBE_PREFIX}{MQTT_TOPIC} (bottlefiller)")
+        print(f"📡 Subscribed to: {SUBSCRIBE_PREFIX}plc/+/lathe/data (lathe)")
+        if HASH_SHARDING:
+            print(f"   Worker {WORKER_INDEX}/{WRITER_WORKERS}: handling machines where crc32(machine_id) % {WRITER_WORKERS} == {WORKER_INDEX}")
+        print()
     else:
         print(f"❌ Failed to connect to MQTT broker, return code {rc}")
 
+def print_summary(machine_id, machine_type, fields):
+    """Print a short summary of a queued point"""
+    if "BottlesFilled" in fields:
+        print(f"📥 Queued for InfluxDB [{machine_id}]:")
+        print(f"   📊 Production: {fields['BottlesFilled']} bottles | "
+              f"{fields['BottlesPerMinute']:.1f} bottles/min | "
+              f"{fields['BottlesRejected']} rejected")
+        print(f"   🔧 Status: Running={fields['SystemRunning']} | "
+              f"Filling={fields['Filling']} | Fault={fields['Fault']}")
+        print(f"   📈 Fill Level: {fields['FillLevel']:.1f}% | "
+              f"Temp: {fields['TankTemperature']:.1f}°C")
+        print(f"   ⚠️  Alarms: Fault={fields['AlarmFault']} | "
+              f"Overfill={fields['AlarmOverfill']} | Underfill={fields['AlarmUnderfill']}")
+        print()
+    elif machine_type == "lathe":
+        print(f"📥 Queued for InfluxDB [{machine_id} - Lathe]:")
+        print(f"   ⚙️  Spindle: Speed={fields['SpindleSpeed']:.1f} RPM | Load={fields['SpindleLoad']:.1f}%")
+        print(f"   📍 Axis: X={fields['AxisXPosition']:.2f} mm | Z={fields['AxisZPosition']:.2f} mm")
+        print(f"   📊 Production: Parts={fields['PartsCompleted']} | Rate={fields['PartsPerHour']:.1f}/hr | Cycle={fields['CycleTime']:.1f}s")
+        print(f"   🔧 Status: Running={fields['SystemRunning']} | Machining={fields['Machining']} | Fault={fields['Fault']}")
+        print(f"   ⚠️  Alarms: SpindleOverload={fields['AlarmSpindleOverload']} | ChuckNotClamped={fields['AlarmChuckNotClamped']}")
+        print()
+    elif "BottleCount" in fields:
+        print(f"📥 Queued [{machine_id}]: Bottles={fields['BottleCount']}, Speed={fields['FillerSpeed']:.2f}, Running={fields['LineRunning']}")
+    else:
+        print(f"📥 Queued [{machine_id} - {machine_type}]: {len(fields)} fields")
+
 def on_message(client, userdata, msg):
+    # Extract machine_id from topic: "plc/machine-01/bottlefiller/data"
+    topic_parts = msg.topic.split('/')
+    machine_id = topic_parts[1] if len(topic_parts) > 1 else "unknown"
+    
+    # Hash sharding: another worker owns this machine (checked before any parsing)
+    if HASH_SHARDING and zlib.crc32(machine_id.encode()) % WRITER_WORKERS != WORKER_INDEX:
+        return
+    
+    m_messages.inc(msg.topic)
+    started = time.perf_counter()
     try:
-        # Debug: Print ALL received messages
-        print(f"📨 Received message on topic: {msg.topic} (Machine: {msg.topic.split('/')[1] if len(msg.topic.split('/')) > 1 else 'unknown'})")
-        
         # Parse JSON message
-        data = json.loads(msg.payload.decode())
-        
-        # Extract machine_id from topic: "plc/machine-01/bottlefiller/data"
-        topic_parts = msg.topic.split('/')
-        machine_id = topic_parts[1] if len(topic_parts) > 1 else "unknown"
-        
-        # Optional: Extract additional metadata from environment or data
-        line_id = data.get("line_id") or os.getenv("LINE_ID", None)
-        location = data.get("location") or os.getenv("LOCATION", None)
+        data = json.loads(msg.payload)
         
-        # Debug: print received topic
-        print(f"📨 Received message on topic: {msg.topic} (Machine: {machine_id})")
+        # QoS 1 redelivery of a message this machine already sent
+        if dedup is not None and dedup.is_duplicate(machine_id, data.get("timestamp"), msg.payload):
+            return
         
-        # Handle different data formats
-        if "BottleCount" in data:
-            # Format from edge gateway (simplified)
-            bottle_count = int(data.get("BottleCount", 0))
-            filler_speed = float(data.get("FillerSpeed", 0.0))
-            line_running = bool(data.get("LineRunning", False))
-            
-            # Create InfluxDB point with basic fields and machine_id tag
-            point = Point("plc_data") \
-                .tag("machine_id", machine_id) \
-                .tag("machine_type", "bottlefiller")
-            
-            # Add optional tags if available
-            if line_id:
-                point = point.tag("line", line_id)
-            if location:
-                point = point.tag("location", location)
-            
-            # Parse timestamp (expecting UTC with timezone info)
-            timestamp_str = data.get("timestamp")
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    timestamp = datetime.now(timezone.utc)
-            else:
-                timestamp = datetime.now(timezone.utc)
-            
-            point = point \
-                .field("BottleCount", bottle_count) \
-                .field("FillerSpeed", filler_speed) \
-                .field("LineRunning", line_running) \
-                .time(timestamp)
-            
-        elif "counters" in data:
-            # Format from mock_plc_agent (full dataset)
-            # Extract all critical tags
-            
-            # === TIER 1: CRITICAL STATUS ===
-            status = data.get("status", {})
-            system_running = bool(status.get("SystemRunning", False))
-            fault = bool(status.get("Fault", False))
-            filling = bool(status.get("Filling", False))
-            ready = bool(status.get("Ready", False))
-            
-            # === TIER 1: CRITICAL COUNTERS ===
-            counters = data.get("counters", {})
-            bottles_filled = int(counters.get("BottlesFilled", 0))
-            bottles_rejected = int(counters.get("BottlesRejected", 0))
-            bottles_per_minute = float(counters.get("BottlesPerMinute", 0.0))
-            
-            # === TIER 1: CRITICAL ALARMS ===
-            alarms = data.get("alarms", {})
-            alarm_fault = bool(alarms.get("Fault", False) or fault)  # Check both
-            alarm_overfill = bool(alarms.get("Overfill", False))
-            alarm_underfill = bool(alarms.get("Underfill", False))
-            alarm_low_level = bool(alarms.get("LowProductLevel", False))
-            alarm_cap_missing = bool(alarms.get("CapMissing", False))
-            
-            # === TIER 2: IMPORTANT ANALOG ===
-            analog = data.get("analog", {})
-            fill_level = float(analog.get("FillLevel", 0.0))
-            tank_temperature = float(analog.get("TankTemperature", 0.0))
-            tank_pressure = float(analog.get("TankPressure", 0.0))
-            fill_flow_rate = float(analog.get("FillFlowRate", 0.0))
-            conveyor_speed = float(analog.get("ConveyorSpeed", 0.0))
-            
-            # === TIER 2: IMPORTANT INPUTS ===
-            inputs = data.get("inputs", {})
-            low_level_sensor = bool(inputs.get("LowLevel", False))
-            
-            # Create InfluxDB point with ALL critical tags and machine_id
-            # Tier 1: Critical Status, Counters, Alarms
-            # Tier 2: Important Analog and Inputs
-            point = Point("plc_data") \
-                .tag("machine_id", machine_id) \
-                .tag("machine_type", "bottlefiller")
-            
-            # Add optional tags if available
-            if line_id:
-                point = point.tag("line", line_id)
-            if location:
-                point = point.tag("location", location)
-            
-            point = point \
-                .field("SystemRunning", system_running) \
-                .field("Fault", fault) \
-                .field("Filling", filling) \
-                .field("Ready", ready) \
-                .field("BottlesFilled", bottles_filled) \
-                .field("BottlesRejected", bottles_rejected) \
-                .field("BottlesPerMinute", bottles_per_minute) \
-                .field("AlarmFault", alarm_fault) \
-                .field("AlarmOverfill", alarm_overfill) \
-                .field("AlarmUnderfill", alarm_underfill) \
-                .field("AlarmLowProductLevel", alarm_low_level) \
-                .field("AlarmCapMissing", alarm_cap_missing) \
-                .field("FillLevel", fill_level) \
-                .field("TankTemperature", tank_temperature) \
-                .field("TankPressure", tank_pressure) \
-                .field("FillFlowRate", fill_flow_rate) \
-                .field("ConveyorSpeed", conveyor_speed) \
-                .field("LowLevelSensor", low_level_sensor)
-            
-            # Parse timestamp (expecting UTC with timezone info)
-            timestamp_str = data.get("timestamp")
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    timestamp = datetime.now(timezone.utc)
-            else:
-                timestamp = datetime.now(timezone.utc)
-            
-            point = point.time(timestamp)
-            
-        elif "lathe" in msg.topic or "spindle" in data:
-            # Format from lathe_sim (CNC Lathe data)
-            # Extract machine_id from topic: "plc/lathe01/lathe/data"
-            print(f"🔧 Processing lathe data from topic: {msg.topic}")
-            machine_id = topic_parts[1] if len(topic_parts) > 1 else "unknown"
-            
-            # Extract lathe-specific data
-            safety = data.get("safety", {})
-            spindle = data.get("spindle", {})
-            axis_x = data.get("axis_x", {})
-            axis_z = data.get("axis_z", {})
-            production = data.get("production", {})
-            alarms = data.get("alarms", {})
-            status = data.get("status", {})
-            tooling = data.get("tooling", {})
-            coolant = data.get("coolant", {})
-            
-            # Create InfluxDB point for lathe with machine_type tag
-            point = Point("plc_data") \
-                .tag("machine_id", machine_id) \
-                .tag("machine_type", "lathe") \
-                .field("DoorClosed", bool(safety.get("door_closed", False))) \
-                .field("EStopOK", bool(safety.get("estop_ok", False))) \
-                .field("SpindleSpeed", float(spindle.get("speed_actual", 0.0))) \
-                .field("SpindleSpeedSetpoint", float(spindle.get("speed_setpoint", 0.0))) \
-                .field("SpindleLoad", float(spindle.get("load_percent", 0.0))) \
-                .field("AxisXPosition", float(axis_x.get("position", 0.0))) \
-                .field("AxisXFeedrate", float(axis_x.get("feedrate", 0.0))) \
-                .field("AxisXHomed", bool(axis_x.get("homed", False))) \
-                .field("AxisZPosition", float(axis_z.get("position", 0.0))) \
-                .field("AxisZFeedrate", float(axis_z.get("feedrate", 0.0))) \
-                .field("AxisZHomed", bool(axis_z.get("homed", False))) \
-                .field("CycleTime", float(production.get("cycle_time_seconds", 0.0))) \
-                .field("PartsCompleted", int(production.get("parts_completed", 0))) \
-                .field("PartsRejected", int(production.get("parts_rejected", 0))) \
-                .field("PartsPerHour", float(production.get("parts_per_hour", 0.0))) \
-                .field("AlarmSpindleOverload", bool(alarms.get("spindle_overload", False))) \
-                .field("AlarmChuckNotClamped", bool(alarms.get("chuck_not_clamped", False))) \
-                .field("AlarmDoorOpen", bool(alarms.get("door_open", False))) \
-                .field("AlarmToolWear", bool(alarms.get("tool_wear", False))) \
-                .field("AlarmCoolantLow", bool(alarms.get("coolant_low", False))) \
-                .field("SystemRunning", bool(status.get("system_running", False))) \
-                .field("Machining", bool(status.get("machining", False))) \
-                .field("Ready", bool(status.get("ready", False))) \
-                .field("Fault", bool(status.get("fault", False))) \
-                .field("AutoMode", bool(status.get("auto_mode", False))) \
-                .field("ToolNumber", int(tooling.get("tool_number", 0))) \
-                .field("ToolLifePercent", float(tooling.get("tool_life_percent", 0.0))) \
-                .field("ToolOffsetX", float(tooling.get("tool_offset_x", 0.0))) \
-                .field("ToolOffsetZ", float(tooling.get("tool_offset_z", 0.0))) \
-                .field("CoolantFlowRate", float(coolant.get("flow_rate", 0.0))) \
-                .field("CoolantTemperature", float(coolant.get("temperature", 0.0))) \
-                .field("CoolantLevelPercent", float(coolant.get("level_percent", 0.0)))
-            
-            # Parse timestamp (expecting UTC with timezone info)
-            timestamp_str = data.get("timestamp")
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    timestamp = datetime.now(timezone.utc)
-            else:
-                timestamp = datetime.now(timezone.utc)
-            
-            point = point.time(timestamp)
-            
-        else:
-            print(f"⚠️  Unknown data format, skipping. Keys: {list(data.keys())[:5]}")
+        # Route by the machine type segment of the topic
+        decoder = registry.route(topic_parts, data)
+        if decoder is None:
+            ingest_log.error(machine_id, f"Unknown data format on {msg.topic}, skipping. Keys: {list(data.keys())[:5]}")
             return
+        fields = decoder.decode(data)
         
-        # Write to InfluxDB with explicit error handling
-        try:
-            # Debug: Print point details (every 10th message to avoid spam)
-            import random
-            if random.randint(1, 10) == 1:  # Print debug info 10% of the time
-                data_timestamp = data.get("timestamp", "not provided")
-                print(f"🔍 DEBUG: Writing to bucket={INFLUXDB_BUCKET}, machine_id={machine_id}, timestamp={data_timestamp}")
-            
-            write_api.write(bucket=INFLUXDB_BUCKET, record=point)
-            
-            # Print detailed summary of what was written
-            if "counters" in data:
-                # Bottlefiller data
-                bottles_per_min = counters.get("BottlesPerMinute", 0.0)
-                print(f"💾 Written to InfluxDB [{machine_id}]:")
-                print(f"   📊 Production: {bottles_filled} bottles | "
-                      f"{bottles_per_min:.1f} bottles/min | "
-                      f"{bottles_rejected} rejected")
-                print(f"   🔧 Status: Running={system_running} | "
-                      f"Filling={filling} | Fault={fault}")
-                print(f"   📈 Fill Level: {fill_level:.1f}% | "
-                      f"Temp: {tank_temperature:.1f}°C")
-                print(f"   ⚠️  Alarms: Fault={alarm_fault} | "
-                      f"Overfill={alarm_overfill} | Underfill={alarm_underfill}")
-                print()
-            elif "lathe" in msg.topic or "spindle" in data:
-                # Lathe data - extract again for printing
-                lathe_safety = data.get("safety", {})
-                lathe_spindle = data.get("spindle", {})
-                lathe_axis_x = data.get("axis_x", {})
-                lathe_axis_z = data.get("axis_z", {})
-                lathe_production = data.get("production", {})
-                lathe_alarms = data.get("alarms", {})
-                lathe_status = data.get("status", {})
-                print(f"💾 Written to InfluxDB [{machine_id} - Lathe]:")
-                print(f"   ⚙️  Spindle: Speed={lathe_spindle.get('speed_actual', 0):.1f} RPM | Load={lathe_spindle.get('load_percent', 0):.1f}%")
-                print(f"   📍 Axis: X={lathe_axis_x.get('position', 0):.2f} mm | Z={lathe_axis_z.get('position', 0):.2f} mm")
-                print(f"   📊 Production: Parts={lathe_production.get('parts_completed', 0)} | Rate={lathe_production.get('parts_per_hour', 0):.1f}/hr | Cycle={lathe_production.get('cycle_time_seconds', 0):.1f}s")
-                print(f"   🔧 Status: Running={lathe_status.get('system_running', False)} | Machining={lathe_status.get('machining', False)} | Fault={lathe_status.get('fault', False)}")
-                print(f"   ⚠️  Alarms: SpindleOverload={lathe_alarms.get('spindle_overload', False)} | ChuckNotClamped={lathe_alarms.get('chuck_not_clamped', False)}")
-                print()
-            else:
-                print(f"💾 Written [{machine_id}]: Bottles={bottle_count}, Speed={filler_speed:.2f}, Running={line_running}")
-        except Exception as write_error:
-            print(f"❌ Failed to write to InfluxDB: {write_error}")
-            import traceback
-            traceback.print_exc()
-            return  # Don't continue if write failed
+        # Tags: machine_id, machine_type and the optional site tags (None values are skipped)
+        if decoder.site_tags:
+            tags = (("machine_id", machine_id), ("machine_type", decoder.machine_type),
+                    ("line", data.get("line_id") or LINE_ID), ("location", data.get("location") or LOCATION))
+        else:
+            tags = (("machine_id", machine_id), ("machine_type", decoder.machine_type))
         
+        # Encode straight to line protocol (nanosecond timestamp from the payload)
+        timestamp_ns = encoder.parse_timestamp(data.get("timestamp"))
+        if rollups is not None:
+            rollups.add(machine_id, tags, fields, timestamp_ns)  # raw values, before the deadband
+        changed = deadband.filter(machine_id, fields, timestamp_ns) if deadband is not None else fields
+        line = encoder.encode(tags, changed, timestamp_ns) if changed else None
     except json.JSONDecodeError as e:
-        print(f"⚠️  JSON decode error: {e}")
+        m_decode_errors.inc(machine_id)
+        ingest_log.error(machine_id, f"JSON decode error on {msg.topic}: {e}")
+        return
     except Exception as e:
-        print(f"⚠️  Error writing to InfluxDB: {e}")
-        import traceback
-        traceback.print_exc()
+        m_decode_errors.inc(machine_id)
+        ingest_log.error(machine_id, f"Error decoding message on {msg.topic}: {e!r}")
+        return
+    m_decode_seconds.observe(value=time.perf_counter() - started)
+    
+    if line is None:
+        # Nothing changed since the last write for this machine
+        ingest_log.record(machine_id, points=0)
+        return
+    
+    # Queue for the batch writer (never blocks the MQTT loop)
+    if not batch_writer.submit(line, machine_id, timestamp_ns):
+        if deadband is not None:
+            deadband.forget(machine_id)  # the filter already counted these values as written
+        m_dropped.inc()
+        ingest_log.error(machine_id, f"Write queue full ({WRITER_QUEUE_SIZE}), dropping points")
+        return
+    
+    ingest_log.record(machine_id)
+    if ingest_log.sample(machine_id):
+        print_summary(machine_id, decoder.machine_type, fields)
+
+def on_write(entries, seconds, ok):
+    """Batch writer callback (writer thread): write latency, batch size and ingest lag"""
+    m_write_seconds.observe("ok" if ok else "error", value=seconds)
+    if not ok:
+        return
+    m_batch_size.observe(value=len(entries))
+    m_points_written.inc(amount=len(entries))
+    newest = {}
+    for _, machine_id, timestamp_ns in entries:
+        if machine_id is not None and timestamp_ns > newest.get(machine_id, 0):
+            newest[machine_id] = timestamp_ns
+    now_ns = time.time_ns()
+    for machine_id, timestamp_ns in newest.items():
+        lag = (now_ns - timestamp_ns) / 1e9
+        m_lag.observe(value=lag)
+        m_machine_lag.set(machine_id, value=lag)
 
 def on_disconnect(client, userdata, rc):
     if rc != 0:
         print(f"⚠️  Unexpected MQTT disconnection (rc={rc})")
 
+def handle_sigterm(signum, frame):
+    # Shut down like Ctrl+C so queued points are flushed (the supervisor stops workers with SIGTERM).
+    # Only once: a repeated signal must not interrupt the flush and spool handoff in the cleanup
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+signal.signal(signal.SIGTERM, handle_sigterm)
+
+# Line-protocol encoder (caches escaped tag prefixes per machine)
+encoder = LineProtocolEncoder("plc_data")
+
+# Redelivery filter
+dedup = DedupWindow(WRITER_DEDUP_WINDOW) if WRITER_DEDUP_WINDOW > 0 else None
+
+# Report-by-exception filter
+deadband = None
+if WRITER_DEADBAND_ENABLED:
+    deadband = DeadbandFilter(
+        default_deadband=WRITER_DEADBAND_DEFAULT,
+        deadbands=parse_deadbands(WRITER_DEADBAND_FIELDS),
+        heartbeat=WRITER_DEADBAND_HEARTBEAT
+    )
+    print(f"🎚️  Deadband filter: default {WRITER_DEADBAND_DEFAULT}, "
+          f"{len(deadband.deadbands)} field overrides, heartbeat {WRITER_DEADBAND_HEARTBEAT:.0f}s")
+
 # Connect to InfluxDB
 print(f"🔗 Connecting to InfluxDB at {INFLUXDB_URL}...")
 try:
@@ -327,16 +306,98 @@ try:
         org=INFLUXDB_ORG
     )
     write_api = influx_client.write_api(write_options=SYNCHRONOUS)
+    spool = None
+    # The rollup spool's budget comes out of WRITER_SPOOL_MAX_MB, so both together stay within it
+    spool_bytes = int(WRITER_SPOOL_MAX_MB * 1024 * 1024)
+    segment_bytes = int(WRITER_SPOOL_SEGMENT_MB * 1024 * 1024)
+    rollup_spool_bytes = int(spool_bytes * WRITER_ROLLUP_SPOOL_SHARE) if WRITER_ROLLUPS_ENABLED else 0
+    if WRITER_SPOOL_DIR:
+        spool = Spool(
+            WRITER_SPOOL_DIR,
+            max_bytes=spool_bytes - rollup_spool_bytes,
+            segment_bytes=segment_bytes,
+            fsync_interval=WRITER_SPOOL_FSYNC_INTERVAL
+        )
+    batch_writer = BatchWriter(
+        write_api,
+        INFLUXDB_BUCKET,
+        batch_size=WRITER_BATCH_SIZE,
+        flush_interval=WRITER_FLUSH_INTERVAL,
+        queue_size=WRITER_QUEUE_SIZE,
+        spool=spool,
+        replay_rate=WRITER_SPOOL_REPLAY_RATE,
+        on_write=on_write
+    ).start()
+    rollup_writer = rollups = None
+    if WRITER_ROLLUPS_ENABLED:
+        rollup_writer = BatchWriter(
+            write_api,
+            INFLUXDB_ROLLUP_BUCKET,
+            batch_size=WRITER_BATCH_SIZE,
+            flush_interval=WRITER_FLUSH_INTERVAL,
+            queue_size=WRITER_QUEUE_SIZE,
+            spool=Spool(
+                os.path.join(WRITER_SPOOL_DIR, "rollup"),
+                max_bytes=rollup_spool_bytes,
+                segment_bytes=max(1, min(segment_bytes, rollup_spool_bytes // 4)),  # several segments to evict from
+                fsync_interval=WRITER_SPOOL_FSYNC_INTERVAL
+            ) if WRITER_SPOOL_DIR else None,
+            replay_rate=WRITER_SPOOL_REPLAY_RATE
+        ).start()
+        rollups = RollupAggregator(
+            LineProtocolEncoder("plc_data"),
+            rollup_writer.submit,
+            windows=WRITER_ROLLUP_WINDOWS,
+            grace=WRITER_ROLLUP_GRACE
+        ).start()
     print(f"✅ Connected to InfluxDB")
     print(f"   Org: {INFLUXDB_ORG}")
-    print(f"   Bucket: {INFLUXDB_BUCKET}\n")
+    print(f"   Bucket: {INFLUXDB_BUCKET}")
+    if rollups is not None:
+        print(f"   Rollups: {', '.join(window_label(w) for w in WRITER_ROLLUP_WINDOWS)} -> {INFLUXDB_ROLLUP_BUCKET}")
+    print(f"   Batching: {WRITER_BATCH_SIZE} points / {WRITER_FLUSH_INTERVAL}s (queue {WRITER_QUEUE_SIZE})")
+    if spool is not None:
+        rollup_share = f", {rollup_spool_bytes / 1048576:.0f} MB of it for rollups" if rollup_spool_bytes else ""
+        print(f"   Spool: {WRITER_SPOOL_DIR} (max {WRITER_SPOOL_MAX_MB:.0f} MB{rollup_share}, {spool.total_bytes} bytes pending)\n")
+    else:
+        print(f"   Spool: disabled\n")
 except Exception as e:
     print(f"❌ InfluxDB connection error: {e}")
     print(f"   Make sure InfluxDB is running at {INFLUXDB_URL}")
     exit(1)
 
+def writer_status():
+    """Batch writer/spool state for the periodic ingest summary"""
+    status = f"queue {batch_writer.queue.qsize()} | written {batch_writer.written} | dropped {batch_writer.dropped}"
+    if dedup is not None and dedup.dropped:
+        status += f" | duplicates dropped {dedup.dropped}"
+    if deadband is not None and deadband.fields_in:
+        status += f" | deadband suppressed {deadband.suppressed / deadband.fields_in:.0%} of fields"
+    if rollups is not None:
+        status += f" | rollup rows {rollups.rows} (queue {rollup_writer.queue.qsize()})"
+    if spool is not None:
+        status += f" | spool {spool.total_bytes} bytes in {spool.segment_count} segments"
+    return status
+
+ingest_log = IngestLog(
+    WRITER_LOG_LEVEL,
+    sample_every=WRITER_LOG_SAMPLE_EVERY,
+    summary_interval=WRITER_LOG_SUMMARY_INTERVAL,
+    extra=writer_status
+).start()
+print(f"📝 Logging: {ingest_log.level} (summary every {WRITER_LOG_SUMMARY_INTERVAL:.0f}s)")
+
+if WRITER_METRICS_PORT:
+    try:
+        metrics.serve(WRITER_METRICS_PORT + WORKER_INDEX)
+        print(f"📈 Metrics: http://0.0.0.0:{WRITER_METRICS_PORT + WORKER_INDEX}/metrics\n")
+    except OSError as e:
+        print(f"⚠️  Metrics endpoint disabled, could not listen on port {WRITER_METRICS_PORT + WORKER_INDEX}: {e}\n")
+else:
+    print()
+
 # Create MQTT client with unique ID to avoid conflicts
-client_id = f"influxdb_writer_it_{uuid.uuid4().hex[:8]}"
+client_id = f"influxdb_writer_it_{WORKER_INDEX}_{uuid.uuid4().hex[:8]}"
 mqtt_client = mqtt.Client(client_id=client_id, clean_session=True)
 mqtt_client.on_connect = on_connect
 mqtt_client.on_message = on_message
@@ -386,12 +447,22 @@ try:
 except KeyboardInterrupt:
     print("\n🛑 Stopping InfluxDB Writer...")
     mqtt_client.disconnect()
+    batch_writer.stop(WRITER_STOP_TIMEOUT)
+    if rollups is not None:
+        rollups.stop()
+        rollup_writer.stop(WRITER_STOP_TIMEOUT)
+    ingest_log.stop()
     write_api.close()
     influx_client.close()
     print("✅ InfluxDB Writer stopped")
 except Exception as e:
     print(f"❌ Error: {e}")
     mqtt_client.disconnect()
+    batch_writer.stop(WRITER_STOP_TIMEOUT)
+    if rollups is not None:
+        rollups.stop()
+        rollup_writer.stop(WRITER_STOP_TIMEOUT)
+    ingest_log.stop()
     write_api.close()
     influx_client.close()
     exit(1)
@@ -0,0 +1,119 @@
+"""
+Rate-limited console logging for the InfluxDB writer
+
+Replaces per-message prints with counters and a periodic aggregated summary
+(msgs/s, points/s, errors per machine). WRITER_LOG_LEVEL picks how chatty it is:
+
+- off: nothing is counted or printed; record/error/sample are no-ops
+- summary: one summary block every SUMMARY_INTERVAL seconds (default)
+- sample: summary + details for every SAMPLE_EVERY-th message per machine
+- debug: summary + details for every message (the old behaviour)
+
+Errors are always counted, but each machine prints at most one error line
+per summary interval.
+"""
+import threading
+import time
+
+LEVELS = ("off", "summary", "sample", "debug")
+
+
+def _noop(*args, **kwargs):
+    return False
+
+
+class IngestLog:
+    def __init__(self, level="summary", sample_every=100, summary_interval=30.0, extra=None):
+        """extra: optional fn() -> str appended to each summary (queue depth, spool, ...)"""
+        if level not in LEVELS:
+            print(f"⚠️  Unknown log level '{level}', using 'summary' (options: {', '.join(LEVELS)})")
+            level = "summary"
+        self.level = level
+        self.sample_every = max(1, sample_every)
+        self.summary_interval = summary_interval
+        self.extra = extra
+
+        self._lock = threading.Lock()
+        self._stats = {}  # machine_id -> [messages, points, errors]
+        self._error_printed = set()  # machines that already printed an error this interval
+        self._window_start = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Zero-cost disabled path: callers always go through these attributes
+        if level == "off":
+            self.record = self.error = self.sample = _noop
+        elif level == "debug":
+            self.sample = self._always
+        elif level == "summary":
+            self.sample = _noop
+
+    def start(self):
+        if self.level != "off":
+            self._thread = threading.Thread(target=self._run, name="ingest-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self.print_summary()
+
+    def record(self, machine_id, points=1):
+        """Count one successfully handled message"""
+        with self._lock:
+            stats = self._stats.get(machine_id)
+            if stats is None:
+                stats = self._stats[machine_id] = [0, 0, 0]
+            stats[0] += 1
+            stats[1] += points
+
+    def error(self, machine_id, message):
+        """Count a failed message; prints at most one line per machine per interval"""
+        with self._lock:
+            stats = self._stats.get(machine_id)
+            if stats is None:
+                stats = self._stats[machine_id] = [0, 0, 0]
+            stats[0] += 1
+            stats[2] += 1
+            if machine_id in self._error_printed:
+                return
+            self._error_printed.add(machine_id)
+        print(f"⚠️  [{machine_id}] {message}")
+
+    def sample(self, machine_id):
+        """True if this message's details should be printed (every SAMPLE_EVERY-th per machine)"""
+        stats = self._stats.get(machine_id)
+        return stats is not None and stats[0] % self.sample_every == 0
+
+    def _always(self, machine_id):
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.summary_interval):
+            self.print_summary()
+
+    def print_summary(self):
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            self._error_printed = set()
+            now = time.monotonic()
+            elapsed = max(now - self._window_start, 1e-9)
+            self._window_start = now
+
+        messages = sum(s[0] for s in stats.values())
+        points = sum(s[1] for s in stats.values())
+        errors = sum(s[2] for s in stats.values())
+        lines = [
+            f"📊 Ingest summary (last {elapsed:.0f}s): "
+            f"{messages} msgs ({messages / elapsed:.1f}/s) | "
+            f"{points} points ({points / elapsed:.1f}/s) | "
+            f"{errors} errors | {len(stats)} machines"
+        ]
+        if self.extra is not None:
+            lines.append(f"   {self.extra()}")
+        for machine_id, (m, p, e) in sorted(stats.items()):
+            if e:
+                lines.append(f"   ⚠️  {machine_id}: {e} errors / {m} msgs")
+        print("\n".join(lines), flush=True)
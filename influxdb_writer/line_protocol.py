@@ -0,0 +1,125 @@
+"""
+Line-protocol encoder for the InfluxDB writer
+
+Turns decoded field dicts straight into InfluxDB line-protocol bytes with
+nanosecond timestamps, skipping Point construction and re-serialization.
+The escaped "measurement,tags " prefix is built once per machine and the
+escaped "field=" keys once per field name, so the per-message work is just
+formatting values. Non-finite floats (NaN, inf) are not representable and are
+dropped from the line; a record left without fields encodes to None.
+"""
+import math
+import time
+from datetime import datetime, timezone
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def escape_measurement(value):
+    """Escape a measurement name"""
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+
+def escape_key(value):
+    """Escape a tag key/value or field key"""
+    return (str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+            .replace("\n", "\\n"))
+
+
+def format_value(value):
+    """Format a field value (bool before int: bool is an int subclass)"""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class TimestampParser:
+    """
+    ISO-8601 -> epoch nanoseconds. Payload timestamps are UTC
+    ("2025-01-15T10:30:00.123456+00:00" or "...Z"), so the date part is
+    converted once per day and the time of day is sliced out directly;
+    anything else goes through datetime.fromisoformat.
+    """
+
+    def __init__(self):
+        self._days = {}
+
+    def __call__(self, timestamp_str):
+        if not timestamp_str:
+            return time.time_ns()
+        try:
+            return self._fast(timestamp_str)
+        except (ValueError, IndexError, TypeError):
+            pass
+        try:
+            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            delta = timestamp - _EPOCH
+            return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+        except (ValueError, AttributeError, TypeError):
+            return time.time_ns()
+
+    def _fast(self, s):
+        if s[10] != "T" or not (s.endswith("+00:00") or s.endswith("Z")):
+            raise ValueError(s)
+        date = s[:10]
+        day_ns = self._days.get(date)
+        if day_ns is None:
+            day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            day_ns = (day - _EPOCH).days * 86400 * 1_000_000_000
+            self._days[date] = day_ns
+        seconds = int(s[11:13]) * 3600 + int(s[14:16]) * 60 + int(s[17:19])
+        end = len(s) - (1 if s[-1] == "Z" else 6)
+        nanos = 0
+        if end > 19:
+            if s[19] != ".":
+                raise ValueError(s)
+            nanos = int(s[20:end].ljust(9, "0")[:9])
+        return day_ns + seconds * 1_000_000_000 + nanos
+
+
+class LineProtocolEncoder:
+    def __init__(self, measurement="plc_data"):
+        self.measurement = escape_measurement(measurement)
+        self.parse_timestamp = TimestampParser()
+        self._prefixes = {}
+        self._field_keys = {}
+
+    def prefix(self, tags):
+        """Escaped 'measurement,k=v,...' for a tag tuple, built once and cached"""
+        prefix = self._prefixes.get(tags)
+        if prefix is None:
+            parts = [self.measurement]
+            for key, value in sorted(tags):
+                if value:
+                    parts.append(f"{escape_key(key)}={escape_key(value)}")
+            prefix = ",".join(parts) + " "
+            self._prefixes[tags] = prefix
+        return prefix
+
+    def encode(self, tags, fields, timestamp_ns):
+        """
+        tags: tuple of (key, value) pairs, e.g. (("machine_id", "machine-01"), ...)
+        fields: dict of field name -> bool/int/float/str
+        Returns one line of line protocol as bytes (no trailing newline), or
+        None when no field is left (all of them NaN/inf).
+        """
+        keys = self._field_keys
+        parts = []
+        for name, value in fields.items():
+            key = keys.get(name)
+            if key is None:
+                key = keys[name] = escape_key(name) + "="
+            if value.__class__ is float and not math.isfinite(value):
+                continue  # NaN/inf are not representable in line protocol
+            parts.append(key + format_value(value))
+        if not parts:
+            return None
+        return f"{self.prefix(tags)}{','.join(parts)} {timestamp_ns}".encode()
@@ -0,0 +1,202 @@
+"""
+Continuous downsampling rollups for the InfluxDB writer
+
+Long-range charts run aggregateWindow(every: 5m, fn: mean) over days of raw
+plc_data. This keeps per-machine, per-field min/max/mean/last/count for each
+rollup window (1m/5m/1h by default) in memory and writes one row per closed
+window to a separate rollup bucket:
+
+    plc_data,machine_id=machine-01,machine_type=bottlefiller,window=5m
+        FillLevel_min=..,FillLevel_max=..,FillLevel_mean=..,FillLevel_last=..,FillLevel_count=..
+
+Rows are timestamped at the window stop, like aggregateWindow, so a chart can
+switch to the rollup bucket by filtering window == "5m" and <field>_mean.
+
+Only the smallest window sees raw points; each closed window is merged into
+its parent, so the per-message cost does not grow with the number of windows.
+Windows close when a machine's payload time moves past them. For machines that
+stopped publishing, the payload time is extrapolated from the last point by the
+time since it arrived (on the monotonic clock, so a writer backlog, spool
+replay, clock skew or a simulated start time don't close windows early), and a
+window closes once that passes its stop by GRACE seconds. Points older than a
+machine's already-closed windows are counted as late and skipped.
+
+bool and str fields are not rolled up. State is per machine, so with multiple
+writer workers use WRITER_SHARD_MODE=hash. A restart mid-window rewrites that
+window's row with only the points seen since the restart.
+"""
+import threading
+import time
+
+NS = 1_000_000_000
+
+
+def window_label(seconds):
+    """60 -> "1m", 300 -> "5m", 3600 -> "1h", 30 -> "30s" """
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def parse_windows(spec):
+    """Parse "60,300,3600" (seconds) into a sorted tuple of ints"""
+    return tuple(sorted(int(item) for item in (spec or "").split(",") if item.strip()))
+
+
+class RollupAggregator:
+    def __init__(self, encoder, emit, windows=(60, 300, 3600), grace=10.0, flush_interval=5.0):
+        """
+        encoder: LineProtocolEncoder for the rollup measurement
+        emit: fn(line, machine_id, timestamp_ns) called for each closed window row
+        """
+        windows = tuple(sorted(windows))
+        for child, parent in zip(windows, windows[1:]):
+            if parent % child:
+                raise ValueError(f"Rollup window {parent}s is not a multiple of {child}s")
+        self.encoder = encoder
+        self.emit = emit
+        self.windows = windows
+        self.grace_ns = int(grace * NS)
+        self.flush_interval = flush_interval
+
+        # Counters
+        self.rows = 0  # window rows emitted
+        self.late = 0  # points older than an already-closed window
+
+        self._sizes = [w * NS for w in windows]
+        self._labels = [(("window", window_label(w)),) for w in windows]
+        self._lock = threading.Lock()
+        # machine_id -> [tags, floor_ns, [[start_ns, {field: [min, max, sum, count, last]}] | None per window],
+        #                last_timestamp_ns, last_arrival (monotonic)]
+        self._machines = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rollups", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the idle flusher and write out every open (partial) window"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        with self._lock:
+            for machine_id, state in self._machines.items():
+                self._roll(machine_id, state, None)
+
+    def add(self, machine_id, tags, fields, timestamp_ns):
+        """Fold one raw point into the machine's smallest open window"""
+        size = self._sizes[0]
+        start = timestamp_ns - timestamp_ns % size
+        arrival = time.monotonic()
+        with self._lock:
+            state = self._machines.get(machine_id)
+            if state is None:
+                state = self._machines[machine_id] = [tags, start, [None] * len(self._sizes), timestamp_ns, arrival]
+            elif timestamp_ns < state[1]:
+                self.late += 1
+                return
+            state[0] = tags
+            if timestamp_ns > state[3]:
+                state[3] = timestamp_ns
+            state[4] = arrival
+            current = state[2][0]
+            if current is None or current[0] != start:
+                self._roll(machine_id, state, start)
+                current = state[2][0] = [start, {}]
+
+            stats = current[1]
+            for name, value in fields.items():
+                if value.__class__ is not float and value.__class__ is not int:
+                    continue
+                s = stats.get(name)
+                if s is None:
+                    stats[name] = [value, value, value, 1, value]
+                    continue
+                if value < s[0]:
+                    s[0] = value
+                elif value > s[1]:
+                    s[1] = value
+                s[2] += value
+                s[3] += 1
+                s[4] = value
+
+    def flush_idle(self, now=None):
+        """
+        Close windows of idle machines: their payload time is extrapolated by the
+        time since their last point arrived (now: time.monotonic() seconds)
+        """
+        now = time.monotonic() if now is None else now
+        size = self._sizes[0]
+        with self._lock:
+            for machine_id, state in self._machines.items():
+                idle_ns = int((now - state[4]) * NS)
+                if idle_ns <= self.grace_ns:
+                    continue
+                projected = state[3] + idle_ns - self.grace_ns
+                start = projected - projected % size
+                if state[1] < start:
+                    self._roll(machine_id, state, start)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush_idle()
+
+    def _roll(self, machine_id, state, start):
+        """
+        Close every open window that `start` (a smallest-window start; None for
+        all) has moved past, merging each into its parent. Caller holds the lock.
+        """
+        windows = state[2]
+        last = len(self._sizes) - 1
+        for level, size in enumerate(self._sizes):
+            window = windows[level]
+            if window is None:
+                continue
+            if start is not None and window[0] == start - start % size:
+                break  # parents of a still-open window are still open too
+            windows[level] = None
+            self._emit(machine_id, state[0], level, window)
+            if level < last:
+                parent = windows[level + 1]
+                if parent is None:
+                    parent_size = self._sizes[level + 1]
+                    parent = windows[level + 1] = [window[0] - window[0] % parent_size, {}]
+                _merge(parent[1], window[1])
+        if start is not None:
+            state[1] = max(state[1], start)
+
+    def _emit(self, machine_id, tags, level, window):
+        if not window[1]:
+            return
+        fields = {}
+        for name, (low, high, total, count, last) in window[1].items():
+            fields[name + "_min"] = float(low)
+            fields[name + "_max"] = float(high)
+            fields[name + "_mean"] = total / count
+            fields[name + "_last"] = float(last)
+            fields[name + "_count"] = count
+        timestamp_ns = window[0] + self._sizes[level]
+        line = self.encoder.encode(tags + self._labels[level], fields, timestamp_ns)
+        if line is None:
+            return
+        self.emit(line, machine_id, timestamp_ns)
+        self.rows += 1
+
+
+def _merge(into, stats):
+    for name, (low, high, total, count, last) in stats.items():
+        s = into.get(name)
+        if s is None:
+            into[name] = [low, high, total, count, last]
+            continue
+        if low < s[0]:
+            s[0] = low
+        if high > s[1]:
+            s[1] = high
+        s[2] += total
+        s[3] += count
+        s[4] = last
@@ -0,0 +1,195 @@
+"""
+Disk-backed store-and-forward spool for the InfluxDB writer
+
+When InfluxDB is unreachable, encoded line-protocol batches are appended to
+segment files in SPOOL_DIR instead of being dropped, then replayed oldest-first
+once writes succeed again. Segments are plain line protocol, one point per
+line, named by an increasing sequence number (0000000001.lp, ...):
+
+- appends are fsync'ed at most every FSYNC_INTERVAL seconds (and on rotate/close)
+- a segment is closed once it reaches SEGMENT_BYTES
+- when the spool exceeds MAX_BYTES the oldest segments are evicted
+- replay reads the oldest segment in order and deletes it once fully written
+
+Replaying a batch twice after a crash is harmless: InfluxDB overwrites points
+with the same series and timestamp.
+"""
+import os
+import time
+
+
+class Spool:
+    SUFFIX = ".lp"
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, segment_bytes=16 * 1024 * 1024,
+                 fsync_interval=1.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+
+        # Counters
+        self.spooled = 0  # points appended
+        self.replayed = 0  # points written back to InfluxDB
+        self.evicted_bytes = 0  # bytes dropped by the size cap
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(
+            int(name[:-len(self.SUFFIX)]) for name in os.listdir(directory)
+            if name.endswith(self.SUFFIX) and name[:-len(self.SUFFIX)].isdigit()
+        )
+        self._sizes = {seq: os.path.getsize(self._path(seq)) for seq in self._segments}
+        self.total_bytes = sum(self._sizes.values())
+        if self._segments:
+            self._repair_tail(self._segments[-1])
+
+        self._writer = None  # append handle for the newest segment
+        self._writer_seq = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+        self._reader = None  # read handle for the oldest segment
+        self._reader_seq = None
+        self._read_offset = 0
+
+    def _path(self, seq):
+        return os.path.join(self.directory, f"{seq:010d}{self.SUFFIX}")
+
+    def _repair_tail(self, seq):
+        """Drop a partial last line left behind by a crash mid-append"""
+        path = self._path(seq)
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                keep = data.rfind(b"\n") + 1
+                f.truncate(keep)
+                self.total_bytes -= len(data) - keep
+                self._sizes[seq] = keep
+
+    @property
+    def pending(self):
+        """True while there are spooled points waiting to be replayed"""
+        return self.total_bytes > 0
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def append(self, lines):
+        """Append a batch of encoded line-protocol records (bytes, no newlines)"""
+        if self._writer is None or self._sizes[self._writer_seq] >= self.segment_bytes:
+            self._rotate()
+        data = b"\n".join(lines) + b"\n"
+        self._writer.write(data)
+        self._sizes[self._writer_seq] += len(data)
+        self.total_bytes += len(data)
+        self.spooled += len(lines)
+        self._dirty = True
+
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            self.sync()
+        self._evict()
+
+    def sync(self):
+        """Flush and fsync the segment being appended to"""
+        if self._writer is not None and self._dirty:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _rotate(self):
+        """Close the current append segment and start a new one"""
+        self._close_writer()
+        seq = self._segments[-1] + 1 if self._segments else 1
+        self._segments.append(seq)
+        self._sizes[seq] = 0
+        self._writer = open(self._path(seq), "ab")
+        self._writer_seq = seq
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+            self._writer = None
+            self._writer_seq = None
+
+    def _evict(self):
+        """Enforce MAX_BYTES by deleting the oldest segments"""
+        while self.total_bytes > self.max_bytes and len(self._segments) > 1:
+            seq = self._segments[0]
+            size = self._sizes[seq]
+            if seq == self._reader_seq:
+                size -= self._read_offset  # the replayed part is already gone from the count
+            self._drop_oldest()
+            self.evicted_bytes += size
+            print(f"⚠️  Spool over {self.max_bytes // (1024 * 1024)} MB, evicted segment {seq} ({size} bytes)")
+
+    def _drop_oldest(self):
+        seq = self._segments.pop(0)
+        if seq == self._reader_seq:
+            self._reader.close()
+            self._reader = None
+            self._reader_seq = None
+            self.total_bytes -= self._sizes.pop(seq) - self._read_offset
+            self._read_offset = 0
+        else:
+            self.total_bytes -= self._sizes.pop(seq)
+        if seq == self._writer_seq:
+            self._close_writer()
+        os.remove(self._path(seq))
+
+    def read_batch(self, max_lines):
+        """
+        Return up to max_lines records from the oldest segment without consuming
+        them; call commit() after they are written or rollback() if the write fails.
+        """
+        while self._segments:
+            seq = self._segments[0]
+            if seq == self._writer_seq:
+                self._close_writer()  # replay the active segment; new appends start a fresh one
+            if self._reader is None:
+                self._reader = open(self._path(seq), "rb")
+                self._reader.seek(self._read_offset)
+                self._reader_seq = seq
+
+            lines = []
+            for _ in range(max_lines):
+                line = self._reader.readline()
+                if not line:
+                    break
+                lines.append(line.rstrip(b"\n"))
+            if lines:
+                return lines
+            self.commit(0)  # empty segment (e.g. left by a crash): drop it and move on
+        return []
+
+    def commit(self, count):
+        """Mark the records returned by the last read_batch() as written"""
+        offset = self._reader.tell()
+        self.total_bytes -= offset - self._read_offset
+        self._read_offset = offset
+        self.replayed += count
+        if offset >= self._sizes[self._reader_seq]:
+            # Segment fully replayed
+            seq = self._reader_seq
+            self._reader.close()
+            self._reader = None
+            self._reader_seq = None
+            self._read_offset = 0
+            self._segments.remove(seq)
+            del self._sizes[seq]
+            os.remove(self._path(seq))
+
+    def rollback(self):
+        """Re-read the last read_batch() records next time"""
+        if self._reader is not None:
+            self._reader.seek(self._read_offset)
+
+    def close(self):
+        self._close_writer()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+            self._reader_seq = None
@@ -0,0 +1,106 @@
+"""
+Multi-worker supervisor for the InfluxDB writer
+
+Starts WRITER_WORKERS copies of the writer script as child processes, each
+with its own WRITER_WORKER_INDEX, and restarts any that exit. How messages are
+split between workers is decided in the writer itself (WRITER_SHARD_MODE):
+
+- shared: every worker subscribes to $share/<group>/plc/+/.../data and the
+  broker load-balances messages between them
+- hash: every worker subscribes normally and keeps only the machines where
+  crc32(machine_id) % WRITER_WORKERS == WRITER_WORKER_INDEX, so each machine
+  is always handled by the same worker
+
+Workers run in their own session, so Ctrl+C in the terminal reaches only the
+supervisor, which then stops every worker with a single SIGTERM and waits up
+to stop_timeout (WRITER_STOP_TIMEOUT based) for their final flush.
+
+Try it against a local mosquitto:
+    WRITER_WORKERS=4 python3 influxdb_writer/influxdb_writer_production.py
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+class WorkerSupervisor:
+    def __init__(self, script, workers, min_restart_delay=1.0, max_restart_delay=30.0, stable_after=60.0,
+                 stop_timeout=10.0):
+        self.script = script
+        self.workers = workers
+        self.stop_timeout = stop_timeout  # how long stop() waits for workers to flush before killing them
+        self.min_restart_delay = min_restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after  # a worker up this long gets its restart delay reset
+
+        self._procs = {}  # index -> Popen
+        self._started = {}  # index -> monotonic start time
+        self._delay = {}  # index -> next restart delay
+        self._restart_at = {}  # index -> monotonic time a crashed worker is due back
+        self._stopping = False
+
+    def _spawn(self, index):
+        env = os.environ.copy()
+        env["WRITER_WORKER_INDEX"] = str(index)
+        # Own session: the terminal's SIGINT must not start a second, uncoordinated shutdown in the worker
+        proc = subprocess.Popen([sys.executable, self.script], env=env, start_new_session=True)
+        self._procs[index] = proc
+        self._started[index] = time.monotonic()
+        print(f"👷 Started writer worker {index} (PID: {proc.pid})")
+
+    def _handle_signal(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        """Start all workers and keep them running until SIGINT/SIGTERM"""
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+
+        print(f"🚀 Supervising {self.workers} InfluxDB writer workers")
+        for index in range(self.workers):
+            self._delay[index] = self.min_restart_delay
+            self._spawn(index)
+
+        while not self._stopping:
+            now = time.monotonic()
+            for index in range(self.workers):
+                proc = self._procs.get(index)
+                if proc is not None and proc.poll() is not None:
+                    # Worker exited: schedule a restart with backoff
+                    if now - self._started[index] >= self.stable_after:
+                        self._delay[index] = self.min_restart_delay
+                    delay = self._delay[index]
+                    print(f"⚠️  Writer worker {index} exited (code {proc.returncode}), restarting in {delay:.0f}s")
+                    self._procs[index] = None
+                    self._restart_at[index] = now + delay
+                    self._delay[index] = min(delay * 2, self.max_restart_delay)
+                elif proc is None and now >= self._restart_at.get(index, 0):
+                    self._spawn(index)
+            time.sleep(0.5)
+
+        self.stop()
+
+    def stop(self, timeout=None):
+        """Forward SIGTERM to all workers and wait for them to flush and exit"""
+        timeout = self.stop_timeout if timeout is None else timeout
+        print(f"\n🛑 Stopping writer workers (waiting up to {timeout:.0f}s for their final flush)...")
+        for proc in self._procs.values():
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        killed = 0
+        for index, proc in self._procs.items():
+            if proc is None:
+                continue
+            try:
+                proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+                print(f"✅ Writer worker {index} stopped")
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                killed += 1
+                print(f"⚠️  Writer worker {index} force-killed after {timeout:.0f}s, its queued points are lost")
+        if killed:
+            print(f"⚠️  {killed}/{len(self._procs)} writer workers force-killed "
+                  f"(raise WRITER_STOP_TIMEOUT if InfluxDB is slow to accept the final flush)")
@@ -29,3 +29,8 @@ CLIENT_ID = "lathe_sim"
 # Machine ID - identifies which machine this agent represents
 MACHINE_ID = os.getenv("LATHE_MACHINE_ID", "lathe01")
 
+# Simulation (see mock_plc_agent/sim_clock.py): SIM_SEED makes readings reproducible,
+# SIM_SPEED > 1 compresses time (0: no sleeping), SIM_START fixes the first timestamp
+SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None
+SIM_SPEED = float(os.getenv("SIM_SPEED", "1.0"))
+SIM_START = os.getenv("SIM_START", "")  # ISO 8601, e.g. 2025-01-15T00:00:00Z
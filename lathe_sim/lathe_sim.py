@@ -5,10 +5,7 @@ Publishes to: plc/{machine-id}/lathe/data
 Supports multiple machines via LATHE_MACHINE_ID environment variable
 """
 import paho.mqtt.client as mqtt
-import json
 import time
-import random
-from datetime import datetime, timezone
 import sys
 import os
 import ssl
@@ -20,8 +17,12 @@ from lathe_sim.config import (
     MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_BASE,
     PUBLISH_INTERVAL, CLIENT_ID,
     MACHINE_ID, MQTT_USERNAME, MQTT_PASSWORD,
-    MQTT_TLS_ENABLED, CA_CERT_PATH, MQTT_TLS_CHECK_HOSTNAME
+    MQTT_TLS_ENABLED, CA_CERT_PATH, MQTT_TLS_CHECK_HOSTNAME,
+    SIM_SEED, SIM_SPEED, SIM_START
 )
+from mock_plc_agent.recorder import JsonlRecorder
+from mock_plc_agent.sim_clock import make_clock, make_random, parse_start
+from lathe_sim.state import LatheState, lathe_messages
 
 # Store MQTT_BROKER for TLS detection
 _MQTT_BROKER_HOST = MQTT_BROKER
@@ -29,136 +30,12 @@ _MQTT_BROKER_HOST = MQTT_BROKER
 # Debug/Output options
 PRINT_JSON_DATA = os.getenv("PRINT_JSON_DATA", "false").lower() == "true"
 SAVE_JSON_DATA = os.getenv("SAVE_JSON_DATA", "false").lower() == "true"
-JSON_OUTPUT_FILE = os.getenv("JSON_OUTPUT_FILE", f"/tmp/lathe_sim_data_{MACHINE_ID}.json")
-
-# CNC Lathe State
-class LatheState:
-    def __init__(self):
-        self.parts_completed = 0
-        self.parts_rejected = 0
-        self.system_running = True
-        self.machining = False
-        self.tool_life_percent = 100.0
-        self.coolant_level_percent = 100.0
-        self.start_time = time.time()
-        self.current_tool = 1
-        
-    def generate_mock_data(self):
-        """Generate realistic mock CNC Lathe telemetry"""
-        # Simulate machining cycle
-        if random.random() > 0.6:  # 40% chance of completing a part
-            self.parts_completed += 1
-            self.machining = True
-            # Slowly decrease tool life
-            self.tool_life_percent = max(0, self.tool_life_percent - random.uniform(0.1, 0.5))
-            # Slowly decrease coolant
-            self.coolant_level_percent = max(0, self.coolant_level_percent - random.uniform(0.05, 0.2))
-        else:
-            self.machining = False
-            
-        # Calculate production rate
-        elapsed_time = max(1, time.time() - self.start_time)
-        parts_per_hour = round((self.parts_completed / elapsed_time) * 3600, 1)
-        
-        # Safety - door closed 95% of the time
-        door_closed = random.random() > 0.05
-        estop_ok = True  # Always OK in normal operation
-        
-        # Spindle data
-        speed_setpoint = 1500.0
-        speed_actual = round(random.uniform(1400, 1600), 1)
-        load_percent = round(random.uniform(20, 80), 1)
-        # Occasionally high load
-        if random.random() > 0.9:
-            load_percent = round(random.uniform(85, 95), 1)
-        
-        # Axis positions
-        axis_x_position = round(random.uniform(0, 200), 2)
-        axis_x_feedrate = round(random.uniform(100, 250), 1)
-        axis_x_homed = True
-        
-        axis_z_position = round(random.uniform(0, 300), 2)
-        axis_z_feedrate = round(random.uniform(150, 300), 1)
-        axis_z_homed = True
-        
-        # Production metrics
-        cycle_time_seconds = round(random.uniform(20, 50), 1)
-        
-        # Alarms
-        spindle_overload = load_percent > 90
-        chuck_not_clamped = random.random() > 0.98  # 2% chance (rare fault)
-        door_open = not door_closed
-        tool_wear = self.tool_life_percent < 30
-        coolant_low = self.coolant_level_percent < 20
-        
-        # Status
-        ready = not self.machining and self.system_running
-        fault = chuck_not_clamped or door_open
-        
-        # Tooling
-        tool_number = self.current_tool
-        tool_offset_x = round(random.uniform(-0.5, 0.5), 3)
-        tool_offset_z = round(random.uniform(-0.5, 0.5), 3)
-        
-        # Coolant
-        coolant_flow_rate = round(random.uniform(5, 10), 1) if self.system_running else 0.0
-        coolant_temperature = round(random.uniform(20, 25), 1)
-        
-        data = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "machine_id": MACHINE_ID,
-            "safety": {
-                "door_closed": door_closed,
-                "estop_ok": estop_ok,
-            },
-            "spindle": {
-                "speed_actual": speed_actual,
-                "speed_setpoint": speed_setpoint,
-                "load_percent": load_percent,
-            },
-            "axis_x": {
-                "position": axis_x_position,
-                "feedrate": axis_x_feedrate,
-                "homed": axis_x_homed,
-            },
-            "axis_z": {
-                "position": axis_z_position,
-                "feedrate": axis_z_feedrate,
-                "homed": axis_z_homed,
-            },
-            "production": {
-                "cycle_time_seconds": cycle_time_seconds,
-                "parts_completed": self.parts_completed,
-                "parts_rejected": self.parts_rejected,
-                "parts_per_hour": parts_per_hour,
-            },
-            "alarms": {
-                "spindle_overload": spindle_overload,
-                "chuck_not_clamped": chuck_not_clamped,
-                "door_open": door_open,
-                "tool_wear": tool_wear,
-                "coolant_low": coolant_low,
-            },
-            "status": {
-                "system_running": self.system_running,
-                "machining": self.machining,
-                "ready": ready,
-                "fault": fault,
-                "auto_mode": True,
-            },
-            "tooling": {
-                "tool_number": tool_number,
-                "tool_life_percent": round(self.tool_life_percent, 1),
-                "tool_offset_x": tool_offset_x,
-                "tool_offset_z": tool_offset_z,
-            },
-            "coolant": {
-                "flow_rate": coolant_flow_rate,
-                "temperature": coolant_temperature,
-                "level_percent": round(self.coolant_level_percent, 1),
-            }
-        }
-        return data
+# SAVE_JSON_DATA appends JSONL segments next to this path (see mock_plc_agent/recorder.py)
+JSON_OUTPUT_FILE = os.getenv("JSON_OUTPUT_FILE", f"/tmp/lathe_sim_data_{MACHINE_ID}.jsonl")
+JSON_OUTPUT_COMPRESS = os.getenv("JSON_OUTPUT_COMPRESS", "false").lower() == "true"
+JSON_OUTPUT_ROTATE_MB = float(os.getenv("JSON_OUTPUT_ROTATE_MB", "64"))
+JSON_OUTPUT_ROTATE_SECONDS = float(os.getenv("JSON_OUTPUT_ROTATE_SECONDS", "3600"))  # 0: size only
+JSON_OUTPUT_KEEP_FILES = int(os.getenv("JSON_OUTPUT_KEEP_FILES", "0"))  # 0: keep all
 
 # MQTT Client Setup
 connected = False
@@ -258,11 +135,19 @@ def connect_broker():
 connect_broker()
 
 # Initialize lathe state
-lathe = LatheState()
+clock = make_clock(SIM_SPEED, parse_start(SIM_START))
+lathe = LatheState(MACHINE_ID, make_random(SIM_SEED, MACHINE_ID), clock.time)
 
 print("🚀 CNC Lathe Simulator started. Publishing data every {} seconds...".format(PUBLISH_INTERVAL))
 print(f"🏭 Machine ID: {MACHINE_ID}")
 print(f"📡 Topic: plc/{MACHINE_ID}/lathe/data")
+if clock is not time or SIM_SEED is not None:
+    print(f"🎲 Simulation: seed {SIM_SEED}, speed {f'{SIM_SPEED:g}x' if SIM_SPEED else 'unpaced'}, start {SIM_START or 'now'}")
+recorder = None
+if SAVE_JSON_DATA:
+    recorder = JsonlRecorder(JSON_OUTPUT_FILE, JSON_OUTPUT_COMPRESS, int(JSON_OUTPUT_ROTATE_MB * 1024 * 1024),
+                             JSON_OUTPUT_ROTATE_SECONDS, JSON_OUTPUT_KEEP_FILES)
+    print(f"💾 Recording to: {recorder.base}.*{'.jsonl.gz' if JSON_OUTPUT_COMPRESS else '.jsonl'}")
 print("Press Ctrl+C to stop\n")
 
 try:
@@ -277,13 +162,12 @@ try:
         data = lathe.generate_mock_data()
         
         try:
-            # Publish full dataset with machine_id in topic
-            topic_full = f"plc/{MACHINE_ID}/lathe/data"
-            payload = json.dumps(data, indent=2)
-            result = client.publish(topic_full, payload, qos=1, retain=False)
-            
-            # Publish alarms separately (for alarm monitor WebSocket)
-            client.publish(f"plc/{MACHINE_ID}/lathe/alarms", json.dumps(data["alarms"]), qos=1)
+            # Publish full dataset with machine_id in topic, then the alarms
+            # separately (for alarm monitor WebSocket)
+            messages = lathe_messages(data)
+            topic_full, payload = messages[0]
+            for topic, message in messages:
+                client.publish(topic, message, qos=1, retain=False)
             
             # Print detailed status with key metrics
             print(f"📤 [{MACHINE_ID}] Published to MQTT:")
@@ -303,33 +187,16 @@ try:
                 print(payload)
                 print("=" * 60)
             
-            # Save to JSON file if enabled
-            if SAVE_JSON_DATA:
+            # Append to the JSONL recording if enabled
+            if recorder is not None:
                 try:
-                    # Read existing data if file exists
-                    json_data = []
-                    if os.path.exists(JSON_OUTPUT_FILE):
-                        try:
-                            with open(JSON_OUTPUT_FILE, 'r') as f:
-                                json_data = json.load(f)
-                                if not isinstance(json_data, list):
-                                    json_data = [json_data]
-                        except (json.JSONDecodeError, ValueError):
-                            json_data = []
-                    
-                    # Append new data with timestamp
-                    json_data.append({
+                    recorder.write({
                         "timestamp": data['timestamp'],
                         "machine_id": MACHINE_ID,
                         "topic": topic_full,
                         "data": data
                     })
-                    
-                    # Write back to file
-                    with open(JSON_OUTPUT_FILE, 'w') as f:
-                        json.dump(json_data, f, indent=2)
-                    
-                    print(f"💾 Saved to: {JSON_OUTPUT_FILE} ({len(json_data)} entries)")
+                    print(f"💾 Saved to: {recorder.path} ({recorder.count} entries)")
                 except Exception as e:
                     print(f"⚠️  Error saving JSON: {e}")
             
@@ -338,16 +205,20 @@ try:
             print(f"⚠️  Error publishing: {e}")
             connected = False
         
-        time.sleep(PUBLISH_INTERVAL)
+        clock.sleep(PUBLISH_INTERVAL)
         
 except KeyboardInterrupt:
     print("\n🛑 Stopping lathe simulator...")
     client.loop_stop()
     client.disconnect()
+    if recorder is not None:
+        recorder.close()
     print("✅ Lathe simulator stopped")
 except Exception as e:
     print(f"\n❌ Error: {e}")
     client.loop_stop()
     client.disconnect()
+    if recorder is not None:
+        recorder.close()
     exit(1)
 
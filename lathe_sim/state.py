@@ -0,0 +1,146 @@
+"""
+CNC lathe state model, shared by the lathe simulator and the fleet simulator
+"""
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+# CNC Lathe State
+class LatheState:
+    def __init__(self, machine_id="lathe01", rng=random, clock=time.time):
+        """rng: random.Random-like source (default: the random module); clock: fn() -> epoch seconds"""
+        self.machine_id = machine_id
+        self.rng = rng
+        self.clock = clock
+        self.parts_completed = 0
+        self.parts_rejected = 0
+        self.system_running = True
+        self.machining = False
+        self.tool_life_percent = 100.0
+        self.coolant_level_percent = 100.0
+        self.start_time = self.clock()
+        self.current_tool = 1
+        
+    def generate_mock_data(self):
+        """Generate realistic mock CNC Lathe telemetry"""
+        # Simulate machining cycle
+        if self.rng.random() > 0.6:  # 40% chance of completing a part
+            self.parts_completed += 1
+            self.machining = True
+            # Slowly decrease tool life
+            self.tool_life_percent = max(0, self.tool_life_percent - self.rng.uniform(0.1, 0.5))
+            # Slowly decrease coolant
+            self.coolant_level_percent = max(0, self.coolant_level_percent - self.rng.uniform(0.05, 0.2))
+        else:
+            self.machining = False
+            
+        # Calculate production rate
+        elapsed_time = max(1, self.clock() - self.start_time)
+        parts_per_hour = round((self.parts_completed / elapsed_time) * 3600, 1)
+        
+        # Safety - door closed 95% of the time
+        door_closed = self.rng.random() > 0.05
+        estop_ok = True  # Always OK in normal operation
+        
+        # Spindle data
+        speed_setpoint = 1500.0
+        speed_actual = round(self.rng.uniform(1400, 1600), 1)
+        load_percent = round(self.rng.uniform(20, 80), 1)
+        # Occasionally high load
+        if self.rng.random() > 0.9:
+            load_percent = round(self.rng.uniform(85, 95), 1)
+        
+        # Axis positions
+        axis_x_position = round(self.rng.uniform(0, 200), 2)
+        axis_x_feedrate = round(self.rng.uniform(100, 250), 1)
+        axis_x_homed = True
+        
+        axis_z_position = round(self.rng.uniform(0, 300), 2)
+        axis_z_feedrate = round(self.rng.uniform(150, 300), 1)
+        axis_z_homed = True
+        
+        # Production metrics
+        cycle_time_seconds = round(self.rng.uniform(20, 50), 1)
+        
+        # Alarms
+        spindle_overload = load_percent > 90
+        chuck_not_clamped = self.rng.random() > 0.98  # 2% chance (rare fault)
+        door_open = not door_closed
+        tool_wear = self.tool_life_percent < 30
+        coolant_low = self.coolant_level_percent < 20
+        
+        # Status
+        ready = not self.machining and self.system_running
+        fault = chuck_not_clamped or door_open
+        
+        # Tooling
+        tool_number = self.current_tool
+        tool_offset_x = round(self.rng.uniform(-0.5, 0.5), 3)
+        tool_offset_z = round(self.rng.uniform(-0.5, 0.5), 3)
+        
+        # Coolant
+        coolant_flow_rate = round(self.rng.uniform(5, 10), 1) if self.system_running else 0.0
+        coolant_temperature = round(self.rng.uniform(20, 25), 1)
+        
+        data = {
+            "timestamp": datetime.fromtimestamp(self.clock(), timezone.utc).isoformat(),
+            "machine_id": self.machine_id,
+            "safety": {
+                "door_closed": door_closed,
+                "estop_ok": estop_ok,
+            },
+            "spindle": {
+                "speed_actual": speed_actual,
+                "speed_setpoint": speed_setpoint,
+                "load_percent": load_percent,
+            },
+            "axis_x": {
+                "position": axis_x_position,
+                "feedrate": axis_x_feedrate,
+                "homed": axis_x_homed,
+            },
+            "axis_z": {
+                "position": axis_z_position,
+                "feedrate": axis_z_feedrate,
+                "homed": axis_z_homed,
+            },
+            "production": {
+                "cycle_time_seconds": cycle_time_seconds,
+                "parts_completed": self.parts_completed,
+                "parts_rejected": self.parts_rejected,
+                "parts_per_hour": parts_per_hour,
+            },
+            "alarms": {
+                "spindle_overload": spindle_overload,
+                "chuck_not_clamped": chuck_not_clamped,
+                "door_open": door_open,
+                "tool_wear": tool_wear,
+                "coolant_low": coolant_low,
+            },
+            "status": {
+                "system_running": self.system_running,
+                "machining": self.machining,
+                "ready": ready,
+                "fault": fault,
+                "auto_mode": True,
+            },
+            "tooling": {
+                "tool_number": tool_number,
+                "tool_life_percent": round(self.tool_life_percent, 1),
+                "tool_offset_x": tool_offset_x,
+                "tool_offset_z": tool_offset_z,
+            },
+            "coolant": {
+                "flow_rate": coolant_flow_rate,
+                "temperature": coolant_temperature,
+                "level_percent": round(self.coolant_level_percent, 1),
+            }
+        }
+        return data
+
+
+def lathe_messages(data):
+    """(topic, payload) pairs for one reading: the full dataset, then the alarms (for the alarm monitor)"""
+    base = f"plc/{data['machine_id']}/lathe"
+    return [(f"{base}/data", json.dumps(data, indent=2)), (f"{base}/alarms", json.dumps(data["alarms"]))]
@@ -21,6 +21,12 @@ MQTT_TOPIC_BASE = "plc/bottlefiller"
 PUBLISH_INTERVAL = float(os.getenv("PUBLISH_INTERVAL", "2.0"))  # seconds
 CLIENT_ID = "mock_plc_agent"
 
+# Publish mode: split = full dataset (indented) plus one topic per tag group (7 publishes per tick)
+#               compact = one compact payload on .../data; run mock_plc_agent/topic_splitter.py
+#               if anything still needs the group topics
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", "split").lower()
+PUBLISH_ALARM_TOPIC = os.getenv("PUBLISH_ALARM_TOPIC", "false").lower() == "true"  # compact: also publish .../alarms
+
 # Bottle Filler Configuration
 FILL_TARGET_DEFAULT = 500.0  # mL
 FILL_TIME_DEFAULT = 5.0  # seconds
@@ -28,3 +34,8 @@ FILL_SPEED_DEFAULT = 75.0  # percentage
 CONVEYOR_SPEED_DEFAULT = 125.0  # RPM
 TOLERANCE_DEFAULT = 5.0  # mL
 
+# Simulation (see mock_plc_agent/sim_clock.py): SIM_SEED makes readings reproducible,
+# SIM_SPEED > 1 compresses time (0: no sleeping), SIM_START fixes the first timestamp
+SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None
+SIM_SPEED = float(os.getenv("SIM_SPEED", "1.0"))
+SIM_START = os.getenv("SIM_START", "")  # ISO 8601, e.g. 2025-01-15T00:00:00Z
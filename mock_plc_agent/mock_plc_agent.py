@@ -4,10 +4,7 @@ Mock PLC Agent - Simulates bottle filler PLC tags and publishes to MQTT
 Supports multiple machines via MACHINE_ID environment variable
 """
 import paho.mqtt.client as mqtt
-import json
 import time
-import random
-from datetime import datetime, timezone
 import sys
 import os
 import ssl
@@ -17,10 +14,12 @@ import uuid
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mock_plc_agent.config import (
     MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_BASE,
-    PUBLISH_INTERVAL, CLIENT_ID,
-    FILL_TARGET_DEFAULT, FILL_TIME_DEFAULT, FILL_SPEED_DEFAULT,
-    CONVEYOR_SPEED_DEFAULT, TOLERANCE_DEFAULT
+    PUBLISH_INTERVAL, CLIENT_ID, PUBLISH_MODE, PUBLISH_ALARM_TOPIC,
+    SIM_SEED, SIM_SPEED, SIM_START
 )
+from mock_plc_agent.recorder import JsonlRecorder
+from mock_plc_agent.sim_clock import make_clock, make_random, parse_start
+from mock_plc_agent.tags import BottleFillerTags, bottlefiller_messages
 
 # Store MQTT_BROKER for TLS detection
 _MQTT_BROKER_HOST = MQTT_BROKER
@@ -31,87 +30,12 @@ MACHINE_ID = os.getenv("MACHINE_ID", "machine-01")
 # Debug/Output options
 PRINT_JSON_DATA = os.getenv("PRINT_JSON_DATA", "false").lower() == "true"
 SAVE_JSON_DATA = os.getenv("SAVE_JSON_DATA", "false").lower() == "true"
-JSON_OUTPUT_FILE = os.getenv("JSON_OUTPUT_FILE", f"/tmp/mock_plc_data_{MACHINE_ID}.json")
-
-# Bottle Filler Tag States
-class BottleFillerTags:
-    def __init__(self):
-        self.bottles_filled = 0
-        self.bottles_rejected = 0
-        self.fill_target = FILL_TARGET_DEFAULT
-        self.system_running = False
-        self.filling = False
-        self.start_time = time.time()
-        
-    def generate_mock_data(self):
-        """Generate realistic mock PLC data"""
-        # Simulate bottle filling cycle
-        if random.random() > 0.7:  # 30% chance of new bottle
-            self.bottles_filled += 1
-            self.filling = True
-        else:
-            self.filling = False
-            
-        # Calculate production rate
-        elapsed_time = max(1, time.time() - self.start_time)
-        bottles_per_minute = round(self.bottles_filled / elapsed_time * 60, 1)
-        
-        # Generate sensor data
-        data = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "machine_id": MACHINE_ID,  # Include machine_id in payload
-            "inputs": {
-                "BottlePresent": random.choice([True, False]),
-                "BottleAtFill": self.filling,
-                "BottleAtCap": random.choice([True, False]) if self.filling else False,
-                "LowLevel": random.random() > 0.9,  # 10% chance
-                "HighLevel": random.random() > 0.95,  # 5% chance
-                "CapPresent": random.choice([True, False]) if self.filling else False,
-            },
-            "outputs": {
-                "FillValve": self.filling,
-                "ConveyorMotor": self.system_running,
-                "CappingMotor": self.filling and random.choice([True, False]),
-                "IndicatorGreen": self.system_running and not self.filling,
-                "IndicatorRed": not self.system_running,
-                "IndicatorYellow": self.filling,
-            },
-            "analog": {
-                "FillLevel": round(random.uniform(0, 100), 2),
-                "FillFlowRate": round(random.uniform(10, 50), 2) if self.filling else 0.0,
-                "TankTemperature": round(random.uniform(20, 25), 1),
-                "TankPressure": round(random.uniform(10, 15), 2),
-                "ConveyorSpeed": round(random.uniform(100, 150), 1) if self.system_running else 0.0,
-            },
-            "setpoints": {
-                "FillTarget": self.fill_target,
-                "FillTime": FILL_TIME_DEFAULT,
-                "FillSpeed": FILL_SPEED_DEFAULT,
-                "ConveyorSpeed": CONVEYOR_SPEED_DEFAULT,
-                "Tolerance": TOLERANCE_DEFAULT,
-            },
-            "status": {
-                "SystemRunning": self.system_running,
-                "Filling": self.filling,
-                "Ready": not self.filling and self.system_running,
-                "Fault": False,
-                "AutoMode": True,
-            },
-            "counters": {
-                "BottlesFilled": self.bottles_filled,
-                "BottlesRejected": self.bottles_rejected,
-                "BottlesPerMinute": bottles_per_minute,
-            },
-            "alarms": {
-                "LowProductLevel": random.random() > 0.94,  # 6% chance
-                "Overfill": random.random() > 0.96,  # 4% chance
-                "Underfill": random.random() > 0.95,  # 5% chance
-                "NoBottle": not self.filling,  # Only when not filling
-                "CapMissing": random.random() > 0.93 if self.filling else False,  # 7% chance when filling
-            }
-        }
-        
-        return data
+# SAVE_JSON_DATA appends JSONL segments next to this path (see mock_plc_agent/recorder.py)
+JSON_OUTPUT_FILE = os.getenv("JSON_OUTPUT_FILE", f"/tmp/mock_plc_data_{MACHINE_ID}.jsonl")
+JSON_OUTPUT_COMPRESS = os.getenv("JSON_OUTPUT_COMPRESS", "false").lower() == "true"
+JSON_OUTPUT_ROTATE_MB = float(os.getenv("JSON_OUTPUT_ROTATE_MB", "64"))
+JSON_OUTPUT_ROTATE_SECONDS = float(os.getenv("JSON_OUTPUT_ROTATE_SECONDS", "3600"))  # 0: size only
+JSON_OUTPUT_KEEP_FILES = int(os.getenv("JSON_OUTPUT_KEEP_FILES", "0"))  # 0: keep all
 
 # MQTT Client Setup
 connected = False
@@ -219,12 +143,23 @@ def connect_broker():
 connect_broker()
 
 # Initialize tag generator
-tags = BottleFillerTags()
+clock = make_clock(SIM_SPEED, parse_start(SIM_START))
+tags = BottleFillerTags(MACHINE_ID, make_random(SIM_SEED, MACHINE_ID), clock.time)
 tags.system_running = True
 
 print("🚀 Mock PLC Agent started. Publishing data every {} seconds...".format(PUBLISH_INTERVAL))
 print(f"🏭 Machine ID: {MACHINE_ID}")
 print(f"📡 Topic: plc/{MACHINE_ID}/bottlefiller/#")
+if clock is not time or SIM_SEED is not None:
+    print(f"🎲 Simulation: seed {SIM_SEED}, speed {f'{SIM_SPEED:g}x' if SIM_SPEED else 'unpaced'}, start {SIM_START or 'now'}")
+if PUBLISH_MODE == "compact":
+    print(f"📦 Publish mode: compact (one payload on .../data"
+          f"{', plus .../alarms' if PUBLISH_ALARM_TOPIC else ''})")
+recorder = None
+if SAVE_JSON_DATA:
+    recorder = JsonlRecorder(JSON_OUTPUT_FILE, JSON_OUTPUT_COMPRESS, int(JSON_OUTPUT_ROTATE_MB * 1024 * 1024),
+                             JSON_OUTPUT_ROTATE_SECONDS, JSON_OUTPUT_KEEP_FILES)
+    print(f"💾 Recording to: {recorder.base}.*{'.jsonl.gz' if JSON_OUTPUT_COMPRESS else '.jsonl'}")
 print("Press Ctrl+C to stop\n")
 
 try:
@@ -239,18 +174,12 @@ try:
         data = tags.generate_mock_data()
         
         try:
-            # Publish full dataset with machine_id in topic
-            topic_full = f"plc/{MACHINE_ID}/bottlefiller/data"
-            payload = json.dumps(data, indent=2)
-            result = client.publish(topic_full, payload, qos=1, retain=False)
-            
-            # Publish individual tag groups (for selective subscriptions)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/inputs", json.dumps(data["inputs"]), qos=1)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/outputs", json.dumps(data["outputs"]), qos=1)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/analog", json.dumps(data["analog"]), qos=1)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/status", json.dumps(data["status"]), qos=1)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/counters", json.dumps(data["counters"]), qos=1)
-            client.publish(f"plc/{MACHINE_ID}/bottlefiller/alarms", json.dumps(data["alarms"]), qos=1)
+            # Publish full dataset with machine_id in topic, then (split mode) the
+            # individual tag groups (for selective subscriptions)
+            messages = bottlefiller_messages(data, PUBLISH_MODE, PUBLISH_ALARM_TOPIC)
+            topic_full, payload = messages[0]
+            for topic, message in messages:
+                client.publish(topic, message, qos=1, retain=False)
             
             # Print detailed status with key metrics
             print(f"📤 [{MACHINE_ID}] Published to MQTT:")
@@ -273,33 +202,16 @@ try:
                 print(payload)
                 print("=" * 60)
             
-            # Save to JSON file if enabled
-            if SAVE_JSON_DATA:
+            # Append to the JSONL recording if enabled
+            if recorder is not None:
                 try:
-                    # Read existing data if file exists
-                    json_data = []
-                    if os.path.exists(JSON_OUTPUT_FILE):
-                        try:
-                            with open(JSON_OUTPUT_FILE, 'r') as f:
-                                json_data = json.load(f)
-                                if not isinstance(json_data, list):
-                                    json_data = [json_data]
-                        except (json.JSONDecodeError, ValueError):
-                            json_data = []
-                    
-                    # Append new data with timestamp
-                    json_data.append({
+                    recorder.write({
                         "timestamp": data['timestamp'],
                         "machine_id": MACHINE_ID,
                         "topic": topic_full,
                         "data": data
                     })
-                    
-                    # Write back to file
-                    with open(JSON_OUTPUT_FILE, 'w') as f:
-                        json.dump(json_data, f, indent=2)
-                    
-                    print(f"💾 Saved to: {JSON_OUTPUT_FILE} ({len(json_data)} entries)")
+                    print(f"💾 Saved to: {recorder.path} ({recorder.count} entries)")
                 except Exception as e:
                     print(f"⚠️  Error saving JSON: {e}")
             
@@ -308,16 +220,20 @@ try:
             print(f"⚠️  Error publishing: {e}")
             connected = False
         
-        time.sleep(PUBLISH_INTERVAL)
+        clock.sleep(PUBLISH_INTERVAL)
         
 except KeyboardInterrupt:
     print("\n🛑 Stopping agent...")
     client.loop_stop()
     client.disconnect()
+    if recorder is not None:
+        recorder.close()
     print("✅ Agent stopped")
 except Exception as e:
     print(f"\n❌ Error: {e}")
     client.loop_stop()
     client.disconnect()
+    if recorder is not None:
+        recorder.close()
     exit(1)
 
@@ -0,0 +1,117 @@
+"""
+Append-only JSONL recorder for the simulators' SAVE_JSON_DATA output
+
+Records are appended as one compact JSON object per line, so recording costs
+one short write however long the run is (instead of re-reading and rewriting
+the whole file every tick). Output goes to numbered segments next to the
+configured path: JSON_OUTPUT_FILE=/tmp/mock_plc_data_machine-01.jsonl writes
+/tmp/mock_plc_data_machine-01.000001.jsonl, .000002.jsonl, ...
+
+- every run starts a new segment (a torn last line is never appended to)
+- a segment is closed once it holds rotate_bytes of JSON, or rotate_seconds
+  after it was opened
+- compress=True writes gzip segments (.jsonl.gz); those are flushed every
+  flush_seconds rather than per record, so the compression stays effective
+- keep > 0 deletes the oldest segments beyond that many
+
+Read a recording back with read_records(path) (or zcat/jq on the segments).
+"""
+import glob
+import gzip
+import json
+import os
+import re
+import time
+
+SUFFIX = ".jsonl"
+GZIP_SUFFIX = ".jsonl.gz"
+
+
+def segment_base(path):
+    """The path without its .json/.jsonl(.gz) extension"""
+    return re.sub(r"\.jsonl?(\.gz)?$", "", path)
+
+
+def list_segments(path):
+    """Segment paths of a recording (plain and gzip), oldest first"""
+    base = segment_base(path)
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"\.(\d{6,})\.jsonl(\.gz)?$")
+    segments = []
+    for candidate in glob.glob(glob.escape(base) + ".*.jsonl*"):
+        match = pattern.match(os.path.basename(candidate))
+        if match:
+            segments.append((int(match.group(1)), candidate))
+    return [candidate for _, candidate in sorted(segments)]
+
+
+def read_records(path):
+    """Yield the records of a recording in order, skipping torn lines"""
+    for segment in list_segments(path):
+        opener = gzip.open if segment.endswith(".gz") else open
+        try:
+            with opener(segment, "rt") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # partial line from a crash mid-write
+        except (EOFError, OSError):
+            continue  # gzip segment cut off by a crash: keep what was read
+
+
+class JsonlRecorder:
+    def __init__(self, path, compress=False, rotate_bytes=64 * 1024 * 1024, rotate_seconds=3600,
+                 keep=0, flush_seconds=5.0):
+        self.base = segment_base(path)
+        self.compress = compress
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep = keep
+        self.flush_seconds = flush_seconds
+
+        directory = os.path.dirname(self.base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        existing = list_segments(path)
+        self._seq = int(existing[-1][len(self.base) + 1:].split(".", 1)[0]) if existing else 0
+        self._segments = existing
+        self._file = None
+        self.path = None
+        self.count = 0  # records written by this recorder
+        self.bytes = 0  # uncompressed bytes in the current segment
+
+    def write(self, record):
+        """Append one record: O(1), no reads"""
+        data = json.dumps(record, separators=(",", ":")) + "\n"
+        now = time.monotonic()
+        if (self._file is None or self.bytes >= self.rotate_bytes
+                or (self.rotate_seconds and now - self._opened >= self.rotate_seconds)):
+            self._rotate(now)
+        self._file.write(data.encode() if self.compress else data)
+        self.bytes += len(data)
+        self.count += 1
+        if not self.compress:
+            self._file.flush()
+        elif now - self._flushed >= self.flush_seconds:
+            self._file.flush()
+            self._flushed = now
+
+    def _rotate(self, now):
+        self.close()
+        self._seq += 1
+        self.path = f"{self.base}.{self._seq:06d}{GZIP_SUFFIX if self.compress else SUFFIX}"
+        self._file = gzip.open(self.path, "ab") if self.compress else open(self.path, "a")
+        self._segments.append(self.path)
+        self._opened = self._flushed = now
+        self.bytes = 0
+        while self.keep and len(self._segments) > self.keep:
+            oldest = self._segments.pop(0)
+            try:
+                os.remove(oldest)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,63 @@
+"""
+Simulation clock for the simulators (mock_plc_agent, lathe_sim, fleet_sim)
+
+The tag models read time through a clock (time() -> epoch seconds) and the
+publish loops wait through clock.sleep(). By default that is the wall clock
+(the time module itself). A SimClock instead keeps its own simulated time,
+starting at SIM_START, which only moves when the loop sleeps:
+
+- SIM_SPEED=60 runs an hour of simulated time per real minute
+- SIM_SPEED=0 doesn't sleep at all (as fast as the loop can go)
+
+Together with SIM_SEED (seeded random generators in the models) every run
+produces the same readings with the same timestamps, so workloads for the
+writer, the alarm monitor and the dashboards can be replayed exactly.
+"""
+import random
+import time
+from datetime import datetime
+
+
+class SimClock:
+    def __init__(self, speed=1.0, start=None):
+        """speed: simulated seconds per real second (0: no sleeping); start: epoch seconds"""
+        self.speed = speed
+        self._now = float(start) if start is not None else time.time()
+        self._elapsed = 0.0
+        self._real_start = time.monotonic()
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        """Advance simulated time; at a finite speed, wait for real time to catch up"""
+        if seconds <= 0:
+            return
+        self._now += seconds
+        self._elapsed += seconds
+        if self.speed > 0:
+            # Paced against the real start, so slow ticks don't make the run drift
+            delay = self._real_start + self._elapsed / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def parse_start(value):
+    """SIM_START (ISO 8601, e.g. 2025-01-15T00:00:00Z) as epoch seconds, or None"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def make_clock(speed=1.0, start=None):
+    """The wall clock (time module) unless a speed or start time asks for simulated time"""
+    if speed == 1.0 and start is None:
+        return time
+    return SimClock(speed, start)
+
+
+def make_random(seed, *key):
+    """A random.Random seeded from (seed, *key), or the global random module when seed is None"""
+    if seed is None:
+        return random
+    return random.Random(":".join(str(part) for part in (seed,) + key))
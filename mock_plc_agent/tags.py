@@ -0,0 +1,116 @@
+"""
+Bottle filler tag model, shared by the mock PLC agent and the fleet simulator
+"""
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from mock_plc_agent.config import (
+    FILL_TARGET_DEFAULT, FILL_TIME_DEFAULT, FILL_SPEED_DEFAULT,
+    CONVEYOR_SPEED_DEFAULT, TOLERANCE_DEFAULT
+)
+
+# Tag groups also published on their own topic (for selective subscriptions)
+TAG_GROUPS = ("inputs", "outputs", "analog", "status", "counters", "alarms")
+
+# Bottle Filler Tag States
+class BottleFillerTags:
+    def __init__(self, machine_id="machine-01", rng=random, clock=time.time):
+        """rng: random.Random-like source (default: the random module); clock: fn() -> epoch seconds"""
+        self.machine_id = machine_id
+        self.rng = rng
+        self.clock = clock
+        self.bottles_filled = 0
+        self.bottles_rejected = 0
+        self.fill_target = FILL_TARGET_DEFAULT
+        self.system_running = False
+        self.filling = False
+        self.start_time = self.clock()
+        
+    def generate_mock_data(self):
+        """Generate realistic mock PLC data"""
+        # Simulate bottle filling cycle
+        if self.rng.random() > 0.7:  # 30% chance of new bottle
+            self.bottles_filled += 1
+            self.filling = True
+        else:
+            self.filling = False
+            
+        # Calculate production rate
+        elapsed_time = max(1, self.clock() - self.start_time)
+        bottles_per_minute = round(self.bottles_filled / elapsed_time * 60, 1)
+        
+        # Generate sensor data
+        data = {
+            "timestamp": datetime.fromtimestamp(self.clock(), timezone.utc).isoformat(),
+            "machine_id": self.machine_id,  # Include machine_id in payload
+            "inputs": {
+                "BottlePresent": self.rng.choice([True, False]),
+                "BottleAtFill": self.filling,
+                "BottleAtCap": self.rng.choice([True, False]) if self.filling else False,
+                "LowLevel": self.rng.random() > 0.9,  # 10% chance
+                "HighLevel": self.rng.random() > 0.95,  # 5% chance
+                "CapPresent": self.rng.choice([True, False]) if self.filling else False,
+            },
+            "outputs": {
+                "FillValve": self.filling,
+                "ConveyorMotor": self.system_running,
+                "CappingMotor": self.filling and self.rng.choice([True, False]),
+                "IndicatorGreen": self.system_running and not self.filling,
+                "IndicatorRed": not self.system_running,
+                "IndicatorYellow": self.filling,
+            },
+            "analog": {
+                "FillLevel": round(self.rng.uniform(0, 100), 2),
+                "FillFlowRate": round(self.rng.uniform(10, 50), 2) if self.filling else 0.0,
+                "TankTemperature": round(self.rng.uniform(20, 25), 1),
+                "TankPressure": round(self.rng.uniform(10, 15), 2),
+                "ConveyorSpeed": round(self.rng.uniform(100, 150), 1) if self.system_running else 0.0,
+            },
+            "setpoints": {
+                "FillTarget": self.fill_target,
+                "FillTime": FILL_TIME_DEFAULT,
+                "FillSpeed": FILL_SPEED_DEFAULT,
+                "ConveyorSpeed": CONVEYOR_SPEED_DEFAULT,
+                "Tolerance": TOLERANCE_DEFAULT,
+            },
+            "status": {
+                "SystemRunning": self.system_running,
+                "Filling": self.filling,
+                "Ready": not self.filling and self.system_running,
+                "Fault": False,
+                "AutoMode": True,
+            },
+            "counters": {
+                "BottlesFilled": self.bottles_filled,
+                "BottlesRejected": self.bottles_rejected,
+                "BottlesPerMinute": bottles_per_minute,
+            },
+            "alarms": {
+                "LowProductLevel": self.rng.random() > 0.94,  # 6% chance
+                "Overfill": self.rng.random() > 0.96,  # 4% chance
+                "Underfill": self.rng.random() > 0.95,  # 5% chance
+                "NoBottle": not self.filling,  # Only when not filling
+                "CapMissing": self.rng.random() > 0.93 if self.filling else False,  # 7% chance when filling
+            }
+        }
+        
+        return data
+
+
+def bottlefiller_messages(data, mode="split", alarm_topic=False):
+    """
+    (topic, payload) pairs for one reading, the full dataset first. split: then
+    each tag group; compact: the dataset as compact JSON, plus the alarms
+    group when alarm_topic is set (the alarm monitor subscribes to it)
+    """
+    base = f"plc/{data['machine_id']}/bottlefiller"
+    if mode == "compact":
+        messages = [(f"{base}/data", json.dumps(data, separators=(",", ":")))]
+        if alarm_topic:
+            messages.append((f"{base}/alarms", json.dumps(data["alarms"], separators=(",", ":"))))
+        return messages
+    messages = [(f"{base}/data", json.dumps(data, indent=2))]
+    messages.extend((f"{base}/{group}", json.dumps(data[group])) for group in TAG_GROUPS)
+    return messages
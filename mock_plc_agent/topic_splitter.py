@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Topic Splitter - Derives the per-group bottle filler topics from compact publishes
+
+For agents running with PUBLISH_MODE=compact (one payload per tick on
+plc/{machine-id}/bottlefiller/data): subscribes to the data topic and
+republishes each tag group on plc/{machine-id}/bottlefiller/{group}, as the
+split mode would have. Only run it when something subscribes to the group
+topics, and not alongside split-mode agents (their groups would be doubled).
+
+SPLITTER_GROUPS selects the groups (default: all). With the alarm fast path
+(PUBLISH_ALARM_TOPIC=true on the agents) leave "alarms" out, so the alarm
+monitor doesn't get every alarm message twice.
+"""
+import json
+import os
+import ssl
+import sys
+import uuid
+
+import paho.mqtt.client as mqtt
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_plc_agent.config import MQTT_BROKER, MQTT_PORT
+from mock_plc_agent.tags import TAG_GROUPS
+
+SPLITTER_TOPIC = os.getenv("SPLITTER_TOPIC", "plc/+/bottlefiller/data")
+SPLITTER_GROUPS = [g.strip() for g in os.getenv("SPLITTER_GROUPS", ",".join(TAG_GROUPS)).split(",") if g.strip()]
+SPLITTER_QOS = int(os.getenv("SPLITTER_QOS", "1"))
+MQTT_USERNAME = os.getenv("MQTT_USERNAME", None)
+MQTT_PASSWORD = os.getenv("MQTT_PASSWORD", None)
+MQTT_TLS_ENABLED = os.getenv("MQTT_TLS_ENABLED", "false").lower() == "true"
+CA_CERT_PATH = os.getenv("CA_CERT_PATH", None)
+MQTT_TLS_CHECK_HOSTNAME = os.getenv("MQTT_TLS_CHECK_HOSTNAME", "true").lower() == "true"
+
+split_count = 0
+
+
+def on_connect(client, userdata, flags, rc):
+    if rc == 0:
+        client.subscribe(SPLITTER_TOPIC, qos=SPLITTER_QOS)
+        print(f"✅ Connected to MQTT broker, splitting {SPLITTER_TOPIC} into: {', '.join(SPLITTER_GROUPS)}")
+    else:
+        print(f"❌ Failed to connect, return code {rc}")
+
+
+def on_message(client, userdata, msg):
+    global split_count
+    try:
+        data = json.loads(msg.payload)
+    except ValueError:
+        return
+    if not isinstance(data, dict):
+        return
+    base = msg.topic.rsplit("/", 1)[0]
+    for group in SPLITTER_GROUPS:
+        if group in data:
+            client.publish(f"{base}/{group}", json.dumps(data[group]), qos=SPLITTER_QOS)
+    split_count += 1
+    if split_count % 1000 == 0:
+        print(f"📤 Split {split_count} payloads")
+
+
+if __name__ == "__main__":
+    client = mqtt.Client(client_id=f"topic_splitter_{uuid.uuid4().hex[:8]}", clean_session=True)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.reconnect_delay_set(min_delay=1, max_delay=120)
+    if MQTT_USERNAME and MQTT_PASSWORD:
+        client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+    if MQTT_TLS_ENABLED:
+        if CA_CERT_PATH and os.path.exists(CA_CERT_PATH):
+            client.tls_set(ca_certs=CA_CERT_PATH, cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLSv1_2)
+            if not MQTT_TLS_CHECK_HOSTNAME:
+                client.tls_insecure_set(True)
+        else:
+            client.tls_set(cert_reqs=ssl.CERT_NONE)
+            client.tls_insecure_set(True)
+
+    print(f"🔗 Connecting to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}...")
+    try:
+        client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+        client.loop_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping topic splitter...")
+        client.disconnect()
+    except Exception as e:
+        print(f"❌ Connection error: {e}")
+        exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark: alarm event volume with and without debouncing
+
+Generates the bottle filler simulator's alarm stream (mock_plc_agent draws
+LowProductLevel 6%, Overfill 4%, Underfill 5%, CapMissing 7% while filling,
+independently every 1 s tick) for MACHINES machines over TICKS ticks, plus
+one real, sustained Overfill on machine-00, and feeds it through
+alarm_monitor/debounce.py:
+
+- raw: all delays 0, flap detection off (every raw change is an event)
+- debounced: the settings below
+
+Prints events per state and the per-message cost of each run; the debounced
+run is repeated through update_mask() with payloads compiled by
+alarm_monitor/alarm_catalog.py, as the monitor does.
+
+Usage: python3 scripts/benchmark_alarm_debounce.py [machines] [ticks]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alarm_monitor.alarm_catalog import load_catalog
+from alarm_monitor.debounce import AlarmDebouncer
+
+ALARMS = (("LowProductLevel", 0.06), ("Overfill", 0.04), ("Underfill", 0.05), ("CapMissing", 0.07))
+DEBOUNCED = dict(on_delay=2.0, off_delay=5.0, flap_window=60.0, flap_count=6, flap_clear=120.0)
+SUSTAINED_FAULT = (600, 900)  # ticks during which machine-00 really overfills
+
+
+def build_stream(machines, ticks, seed=42):
+    rng = random.Random(seed)
+    stream = []
+    for tick in range(ticks):
+        for m in range(machines):
+            filling = rng.random() > 0.5
+            alarms = {}
+            for name, chance in ALARMS:
+                if name == "CapMissing" and not filling:
+                    alarms[name] = False
+                else:
+                    alarms[name] = rng.random() < chance
+            if m == 0 and SUSTAINED_FAULT[0] <= tick < SUSTAINED_FAULT[1]:
+                alarms["Overfill"] = True
+            stream.append((float(tick), f"machine-{m:02d}", alarms))
+    return stream
+
+
+def run(name, debouncer, stream):
+    counts = {"RAISED": 0, "CLEARED": 0, "FLAPPING": 0}
+    fault_events = []
+    update = debouncer.update
+    start = time.perf_counter()
+    for now, machine_id, alarms in stream:
+        for alarm, value in alarms.items():
+            state = update(machine_id, alarm, value, now)
+            if state is not None:
+                counts[state] += 1
+                if machine_id == "machine-00" and alarm == "Overfill" and \
+                        SUSTAINED_FAULT[0] - 60 <= now <= SUSTAINED_FAULT[1] + 60:
+                    fault_events.append(f"{state}@{now:.0f}s")
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"{name:10s} {total:8d} events  (RAISED {counts['RAISED']}, CLEARED {counts['CLEARED']}, "
+          f"FLAPPING {counts['FLAPPING']})  {elapsed / len(stream) * 1e6:.2f} µs/message")
+    print(f"{'':10s} machine-00 Overfill around the real fault ({SUSTAINED_FAULT[0]}-{SUSTAINED_FAULT[1]}s): "
+          f"{', '.join(fault_events[:8])}{' ...' if len(fault_events) > 8 else ''}")
+    return total
+
+
+def run_mask(name, debouncer, stream):
+    alarm_set = load_catalog()["bottlefiller"]
+    extract = alarm_set.extract
+    update_mask = debouncer.update_mask
+    total = 0
+    start = time.perf_counter()
+    for now, machine_id, alarms in stream:
+        mask, _ = extract(alarms)
+        total += len(update_mask(machine_id, mask, now))
+    elapsed = time.perf_counter() - start
+    print(f"{name:10s} {total:8d} events  (payload extraction included)  {elapsed / len(stream) * 1e6:.2f} µs/message")
+    return total
+
+
+if __name__ == "__main__":
+    machines = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 3600
+    stream = build_stream(machines, ticks)
+    print(f"Replaying {len(stream)} alarm messages ({machines} machines x {ticks} ticks)")
+    print(f"Debounce settings: {DEBOUNCED}\n")
+
+    before = run("raw", AlarmDebouncer(), stream)
+    after = run("debounced", AlarmDebouncer(**DEBOUNCED), stream)
+    run_mask("bitmask+extract", AlarmDebouncer(**DEBOUNCED), stream)
+    print(f"\nEvent volume: {before} -> {after} ({after / before:.1%} of raw)")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: fleet simulator cost per machine-tick on one core
+
+Runs TICKS ticks of a fleet of MACHINES machines (5 bottle fillers per lathe)
+through the scalar models (one BottleFillerTags/LatheState per machine) and the
+NumPy models in fleet_sim/vector_models.py, with and without serializing the
+readings to MQTT payloads (the full data payload plus group topics), and in
+compact mode (one payload per bottle filler reading).
+
+The last stage is the whole publish path: PUBLISH_MACHINES machines publish
+every message through fleet_sim's MqttPool (QoS 1) to a local sink broker
+process that only acknowledges, and the run ends when every publish is acked.
+That is the number to size a fleet by: paho's publish path costs more than
+generating and serializing the readings. The sink shares the machine, so on
+a small box its CPU time is included. No real broker is involved.
+
+Usage: python3 scripts/benchmark_fleet_generation.py [machines] [ticks] [publish_machines]
+       (defaults: 10000 machines, 3 ticks, 1000 publishing machines)
+"""
+import multiprocessing
+import os
+import selectors
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fleet_sim.fleet_sim import build_fleet
+from fleet_sim.mqtt_pool import MqttPool
+
+PUBLISH_INTERVAL = 2.0
+POOL_SIZE = 4
+HOST = "127.0.0.1"
+
+
+def report(name, elapsed, machine_ticks, messages=None):
+    per_machine = elapsed / machine_ticks
+    rate = f" | {messages / elapsed:,.0f} msgs/s" if messages is not None else ""
+    print(f"   {name:22s} {per_machine * 1e6:8.1f} µs/machine-tick | "
+          f"~{PUBLISH_INTERVAL / per_machine:,.0f} machines at {PUBLISH_INTERVAL:.0f}s on one core{rate}")
+    return per_machine
+
+
+def run(name, machines, ticks, generator, serialize, mode="split"):
+    groups, slots = build_fleet(machines - machines // 6, machines // 6, generator, mode)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for group in groups:
+            group.step()
+        for group, row, messages in slots:
+            reading = group.reading(row)
+            if serialize:
+                messages(reading)
+    return report(name, time.perf_counter() - start, ticks * len(slots))
+
+
+def sink_broker(listener):
+    """Accept MQTT connections and acknowledge everything (CONNACK, PUBACK, PINGRESP)"""
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    buffers = {}
+    while True:
+        for key, _ in selector.select():
+            sock = key.fileobj
+            if sock is listener:
+                conn, _ = listener.accept()
+                selector.register(conn, selectors.EVENT_READ)
+                buffers[conn] = b""
+                continue
+            data = sock.recv(1 << 16)
+            if not data:
+                selector.unregister(sock)
+                sock.close()
+                continue
+            buf = buffers[sock] + data
+            replies = []
+            while len(buf) >= 2:
+                # Fixed header: type byte, then the remaining length as a varint
+                length, multiplier, pos = 0, 1, 1
+                while pos < len(buf):
+                    byte = buf[pos]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    pos += 1
+                    if not byte & 0x80:
+                        break
+                else:
+                    break
+                if len(buf) < pos + length:
+                    break
+                kind, body = buf[0], buf[pos:pos + length]
+                buf = buf[pos + length:]
+                if kind >> 4 == 1:  # CONNECT
+                    replies.append(b"\x20\x02\x00\x00")
+                elif kind >> 4 == 3 and (kind >> 1) & 3:  # PUBLISH, QoS > 0: packet id follows the topic
+                    topic_length = int.from_bytes(body[:2], "big")
+                    replies.append(b"\x40\x02" + body[2 + topic_length:4 + topic_length])
+                elif kind >> 4 == 12:  # PINGREQ
+                    replies.append(b"\xd0\x00")
+            buffers[sock] = buf
+            if replies:
+                sock.sendall(b"".join(replies))
+
+
+def run_publish(name, machines, ticks, mode="split"):
+    listener = socket.socket()
+    listener.bind((HOST, 0))
+    listener.listen(POOL_SIZE)
+    broker = multiprocessing.Process(target=sink_broker, args=(listener,), daemon=True)
+    broker.start()
+
+    groups, slots = build_fleet(machines - machines // 6, machines // 6, "vector", mode)
+    pool = MqttPool(POOL_SIZE, "fleet_benchmark")
+    try:
+        if pool.connect(HOST, listener.getsockname()[1]) < len(pool):
+            print(f"   {name:22s} ❌ could not connect to the sink broker")
+            return None
+        last = {}
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for group in groups:
+                group.step()
+            for index, (group, row, messages) in enumerate(slots):
+                for topic, payload in messages(group.reading(row)):
+                    last[index % len(pool)] = pool.publish(index, topic, payload, 1)
+        for info in last.values():
+            info.wait_for_publish()  # acks arrive in order: the last one covers the connection
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.stop()
+        broker.terminate()
+        listener.close()
+    return report(name, elapsed, ticks * len(slots), pool.published)
+
+
+if __name__ == "__main__":
+    machines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    publish_machines = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    print(f"🧪 {machines:,} machines x {ticks} ticks")
+
+    print("📦 Generate readings")
+    scalar = run("scalar", machines, ticks, "scalar", False)
+    vector = run("vector", machines, ticks, "vector", False)
+    print(f"📊 Generation speedup: {scalar / vector:.2f}x")
+
+    print("📦 Generate + serialize payloads")
+    scalar = run("scalar", machines, ticks, "scalar", True)
+    vector = run("vector", machines, ticks, "vector", True)
+    print(f"📊 Speedup: {scalar / vector:.2f}x")
+
+    print("📦 Generate + serialize payloads, bottle fillers in compact mode")
+    run("vector, compact", machines, ticks, "vector", True, "compact")
+
+    print(f"📡 Generate + serialize + publish (QoS 1, {POOL_SIZE} connections to a local sink), "
+          f"{publish_machines:,} machines")
+    run_publish("vector", publish_machines, ticks)
+    run_publish("vector, compact", publish_machines, ticks, "compact")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: InfluxDB writer payload decoding, messages/second on one core
+
+Compares the old on_message approach (probe payload keys, then pull every
+field by hand) against the decoder registry in influxdb_writer/decoders.py.
+Both paths include json.loads of the raw payload, like the real callback.
+The last run adds line-protocol encoding (influxdb_writer/line_protocol.py),
+and, when influxdb_client is installed, the old Point construction and
+serialization is timed for comparison.
+
+The decode comparison alternates the two paths for ROUNDS rounds and reports
+the median and the min-max spread, since single runs on a shared box vary by
+more than the difference being measured.
+
+Usage: python3 scripts/benchmark_writer_decoders.py [messages] [rounds]
+"""
+import json
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from influxdb_writer.decoders import registry
+from influxdb_writer.line_protocol import LineProtocolEncoder
+
+try:
+    from influxdb_client import Point
+except ImportError:
+    Point = None
+
+encoder = LineProtocolEncoder("plc_data")
+
+BOTTLEFILLER_PAYLOAD = {
+    "timestamp": "2025-01-15T10:30:00.123456+00:00",
+    "machine_id": "machine-01",
+    "inputs": {"BottlePresent": True, "BottleAtFill": True, "BottleAtCap": False,
+               "LowLevel": False, "HighLevel": False, "CapPresent": True},
+    "outputs": {"FillValve": True, "ConveyorMotor": True, "CappingMotor": False,
+                "IndicatorGreen": False, "IndicatorRed": False, "IndicatorYellow": True},
+    "analog": {"FillLevel": 63.21, "FillFlowRate": 31.5, "TankTemperature": 22.4,
+               "TankPressure": 12.81, "ConveyorSpeed": 128.3},
+    "setpoints": {"FillTarget": 500.0, "FillTime": 5.0, "FillSpeed": 75.0,
+                  "ConveyorSpeed": 125.0, "Tolerance": 5.0},
+    "status": {"SystemRunning": True, "Filling": True, "Ready": False, "Fault": False, "AutoMode": True},
+    "counters": {"BottlesFilled": 1234, "BottlesRejected": 3, "BottlesPerMinute": 9.2},
+    "alarms": {"LowProductLevel": False, "Overfill": False, "Underfill": True,
+               "NoBottle": False, "CapMissing": False},
+}
+
+LATHE_PAYLOAD = {
+    "timestamp": "2025-01-15T10:30:00.123456+00:00",
+    "machine_id": "lathe01",
+    "safety": {"door_closed": True, "estop_ok": True},
+    "spindle": {"speed_actual": 1512.3, "speed_setpoint": 1500.0, "load_percent": 54.2},
+    "axis_x": {"position": 120.55, "feedrate": 180.2, "homed": True},
+    "axis_z": {"position": 210.13, "feedrate": 220.7, "homed": True},
+    "production": {"cycle_time_seconds": 33.1, "parts_completed": 421, "parts_rejected": 2,
+                   "parts_per_hour": 48.3},
+    "alarms": {"spindle_overload": False, "chuck_not_clamped": False, "door_open": False,
+               "tool_wear": False, "coolant_low": False},
+    "status": {"system_running": True, "machining": True, "ready": False, "fault": False,
+               "auto_mode": True},
+    "tooling": {"tool_number": 1, "tool_life_percent": 81.4, "tool_offset_x": 0.112,
+                "tool_offset_z": -0.241},
+    "coolant": {"flow_rate": 7.4, "temperature": 22.1, "level_percent": 88.6},
+}
+
+
+def legacy_decode(topic, data):
+    """The pre-registry on_message extraction: probe keys, then field by field"""
+    if "BottleCount" in data:
+        return {
+            "BottleCount": int(data.get("BottleCount", 0)),
+            "FillerSpeed": float(data.get("FillerSpeed", 0.0)),
+            "LineRunning": bool(data.get("LineRunning", False)),
+        }
+    elif "counters" in data:
+        status = data.get("status", {})
+        counters = data.get("counters", {})
+        alarms = data.get("alarms", {})
+        analog = data.get("analog", {})
+        inputs = data.get("inputs", {})
+        fault = bool(status.get("Fault", False))
+        return {
+            "SystemRunning": bool(status.get("SystemRunning", False)),
+            "Fault": fault,
+            "Filling": bool(status.get("Filling", False)),
+            "Ready": bool(status.get("Ready", False)),
+            "BottlesFilled": int(counters.get("BottlesFilled", 0)),
+            "BottlesRejected": int(counters.get("BottlesRejected", 0)),
+            "BottlesPerMinute": float(counters.get("BottlesPerMinute", 0.0)),
+            "AlarmFault": bool(alarms.get("Fault", False) or fault),
+            "AlarmOverfill": bool(alarms.get("Overfill", False)),
+            "AlarmUnderfill": bool(alarms.get("Underfill", False)),
+            "AlarmLowProductLevel": bool(alarms.get("LowProductLevel", False)),
+            "AlarmCapMissing": bool(alarms.get("CapMissing", False)),
+            "FillLevel": float(analog.get("FillLevel", 0.0)),
+            "TankTemperature": float(analog.get("TankTemperature", 0.0)),
+            "TankPressure": float(analog.get("TankPressure", 0.0)),
+            "FillFlowRate": float(analog.get("FillFlowRate", 0.0)),
+            "ConveyorSpeed": float(analog.get("ConveyorSpeed", 0.0)),
+            "LowLevelSensor": bool(inputs.get("LowLevel", False)),
+        }
+    elif "lathe" in topic or "spindle" in data:
+        safety = data.get("safety", {})
+        spindle = data.get("spindle", {})
+        axis_x = data.get("axis_x", {})
+        axis_z = data.get("axis_z", {})
+        production = data.get("production", {})
+        alarms = data.get("alarms", {})
+        status = data.get("status", {})
+        tooling = data.get("tooling", {})
+        coolant = data.get("coolant", {})
+        return {
+            "DoorClosed": bool(safety.get("door_closed", False)),
+            "EStopOK": bool(safety.get("estop_ok", False)),
+            "SpindleSpeed": float(spindle.get("speed_actual", 0.0)),
+            "SpindleSpeedSetpoint": float(spindle.get("speed_setpoint", 0.0)),
+            "SpindleLoad": float(spindle.get("load_percent", 0.0)),
+            "AxisXPosition": float(axis_x.get("position", 0.0)),
+            "AxisXFeedrate": float(axis_x.get("feedrate", 0.0)),
+            "AxisXHomed": bool(axis_x.get("homed", False)),
+            "AxisZPosition": float(axis_z.get("position", 0.0)),
+            "AxisZFeedrate": float(axis_z.get("feedrate", 0.0)),
+            "AxisZHomed": bool(axis_z.get("homed", False)),
+            "CycleTime": float(production.get("cycle_time_seconds", 0.0)),
+            "PartsCompleted": int(production.get("parts_completed", 0)),
+            "PartsRejected": int(production.get("parts_rejected", 0)),
+            "PartsPerHour": float(production.get("parts_per_hour", 0.0)),
+            "AlarmSpindleOverload": bool(alarms.get("spindle_overload", False)),
+            "AlarmChuckNotClamped": bool(alarms.get("chuck_not_clamped", False)),
+            "AlarmDoorOpen": bool(alarms.get("door_open", False)),
+            "AlarmToolWear": bool(alarms.get("tool_wear", False)),
+            "AlarmCoolantLow": bool(alarms.get("coolant_low", False)),
+            "SystemRunning": bool(status.get("system_running", False)),
+            "Machining": bool(status.get("machining", False)),
+            "Ready": bool(status.get("ready", False)),
+            "Fault": bool(status.get("fault", False)),
+            "AutoMode": bool(status.get("auto_mode", False)),
+            "ToolNumber": int(tooling.get("tool_number", 0)),
+            "ToolLifePercent": float(tooling.get("tool_life_percent", 0.0)),
+            "ToolOffsetX": float(tooling.get("tool_offset_x", 0.0)),
+            "ToolOffsetZ": float(tooling.get("tool_offset_z", 0.0)),
+            "CoolantFlowRate": float(coolant.get("flow_rate", 0.0)),
+            "CoolantTemperature": float(coolant.get("temperature", 0.0)),
+            "CoolantLevelPercent": float(coolant.get("level_percent", 0.0)),
+        }
+    return None
+
+
+def registry_decode(topic, data):
+    decoder = registry.route(topic.split('/'), data)
+    return decoder.decode(data) if decoder else None
+
+
+def registry_encode(topic, data):
+    parts = topic.split('/')
+    decoder = registry.route(parts, data)
+    fields = decoder.decode(data)
+    tags = (("machine_id", parts[1]), ("machine_type", decoder.machine_type))
+    return encoder.encode(tags, fields, encoder.parse_timestamp(data.get("timestamp")))
+
+
+def legacy_point(topic, data):
+    """Old path: probe/extract, Point with chained .field(), fromisoformat, serialize"""
+    from datetime import datetime
+    parts = topic.split('/')
+    point = Point("plc_data").tag("machine_id", parts[1]) \
+        .tag("machine_type", "lathe" if "lathe" in topic else "bottlefiller")
+    for name, value in legacy_decode(topic, data).items():
+        point = point.field(name, value)
+    point = point.time(datetime.fromisoformat(data["timestamp"].replace('Z', '+00:00')))
+    return point.to_line_protocol()
+
+
+def build_messages(count):
+    """Alternate bottlefiller and lathe messages across 200 machines"""
+    bottlefiller = json.dumps(BOTTLEFILLER_PAYLOAD).encode()
+    lathe = json.dumps(LATHE_PAYLOAD).encode()
+    messages = []
+    for i in range(count):
+        if i % 2:
+            messages.append((f"plc/lathe{i % 100:02d}/lathe/data", lathe))
+        else:
+            messages.append((f"plc/machine-{i % 100:02d}/bottlefiller/data", bottlefiller))
+    return messages
+
+
+def timed(decode, messages):
+    start = time.perf_counter()
+    for topic, payload in messages:
+        decode(topic, json.loads(payload))
+    return len(messages) / (time.perf_counter() - start)
+
+
+def run(name, decode, messages):
+    rate = timed(decode, messages)
+    print(f"   {name:<10} {rate:>12,.0f} msg/s   ({1e6 / rate:.2f} µs/msg)")
+    return rate
+
+
+def compare(paths, messages, rounds):
+    """Alternate the paths for `rounds` rounds; per-path rates and per-round speedups of the last over the first"""
+    rates = {name: [] for name, _ in paths}
+    for _ in range(rounds):
+        for name, decode in paths:
+            rates[name].append(timed(decode, messages))
+    for name, values in rates.items():
+        values = sorted(values)
+        print(f"   {name:<10} {median(values):>12,.0f} msg/s median   ({1e6 / median(values):.2f} µs/msg, "
+              f"range {values[0]:,.0f}-{values[-1]:,.0f})")
+    first, last = rates[paths[0][0]], rates[paths[-1][0]]
+    return sorted(b / a for a, b in zip(first, last))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    messages = build_messages(count)
+
+    # Both decoders must produce identical fields
+    for topic, payload in messages[:2]:
+        data = json.loads(payload)
+        assert legacy_decode(topic, data) == registry_decode(topic, data), topic
+
+    print(f"🧪 Decoding {count:,} messages (bottlefiller + lathe, single core), {rounds} alternating rounds")
+    speedups = compare([("before", legacy_decode), ("after", registry_decode)], messages, rounds)
+    print(f"📊 Decode speedup: {median(speedups):.2f}x median (rounds {speedups[0]:.2f}x-{speedups[-1]:.2f}x)")
+
+    print(f"\n🧪 Decode + serialize to line protocol")
+    encoded = run("encoder", registry_encode, messages)
+    if Point is not None:
+        points = run("Point", legacy_point, messages)
+        print(f"📊 Encode speedup: {encoded / points:.2f}x")
+    else:
+        print("   (influxdb_client not installed, skipping Point comparison)")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Load test: alarm WebSocket fan-out latency with many local clients
+
+Starts a WebSocket server on localhost backed by the alarm monitor's
+Broadcaster (alarm_monitor/fanout.py), connects CLIENTS clients from
+PROCESSES client processes, broadcasts MESSAGES alarm-shaped messages RATE
+per second, and reports latency percentiles from broadcast to receive, per
+delivery and per broadcast (time until the last fast client had it). SLOW
+clients read with a delay to show that they don't hold up the others.
+
+Usage: python3 scripts/load_test_alarm_websocket.py [clients] [messages] [rate] [slow] [processes]
+       (defaults: 1000 clients, 200 messages, 5/s, 0 slow clients, 4 processes)
+
+Clients and server share the machine, so on a small box the numbers include
+client-side CPU contention. Each client process raises its open file limit
+as far as the hard limit allows.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alarm_monitor.fanout import Broadcaster
+
+HOST = "127.0.0.1"
+SLOW_CLIENT_DELAY = 0.5  # seconds per message for slow clients
+RECEIVE_TIMEOUT = 5.0  # a client gives up after this long without a message (dropped messages never arrive)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def raise_fd_limit(wanted):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < wanted:
+        new = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new, hard))
+
+
+async def client(port, expected, delay, results):
+    async with websockets.connect(f"ws://{HOST}:{port}", max_queue=None) as ws:
+        for _ in range(expected):
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=RECEIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+            received = time.time()
+            data = json.loads(message)
+            results.append((data["seq"], received - data["sent"], delay > 0))
+            if delay:
+                await asyncio.sleep(delay)
+
+
+def run_clients(port, count, slow, expected, result_queue):
+    """Client process: `count` connections, the first `slow` of them slow readers"""
+    raise_fd_limit(count + 100)
+    results = []
+
+    async def main():
+        await asyncio.gather(*(
+            client(port, expected, SLOW_CLIENT_DELAY if i < slow else 0.0, results) for i in range(count)
+        ), return_exceptions=True)
+
+    asyncio.run(main())
+    result_queue.put(results)
+
+
+async def serve_and_broadcast(clients, messages, rate, slow, processes):
+    broadcaster = Broadcaster(queue_size=256, policy="drop_oldest")
+
+    async def handler(websocket, path=None):
+        broadcaster.add(websocket)
+        try:
+            await websocket.wait_closed()
+        finally:
+            broadcaster.remove(websocket)
+
+    server = await websockets.serve(handler, HOST, 0, max_queue=None)
+    port = server.sockets[0].getsockname()[1]
+
+    # Spread clients (and slow clients) over the client processes
+    result_queue = multiprocessing.Queue()
+    workers = []
+    connect_started = time.perf_counter()
+    for p in range(processes):
+        count = clients // processes + (1 if p < clients % processes else 0)
+        slow_here = slow // processes + (1 if p < slow % processes else 0)
+        worker = multiprocessing.Process(target=run_clients, args=(port, count, slow_here, messages, result_queue))
+        worker.start()
+        workers.append(worker)
+
+    deadline = time.perf_counter() + 60
+    while len(broadcaster) < clients and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    print(f"🔌 {len(broadcaster)}/{clients} clients connected in {time.perf_counter() - connect_started:.1f}s "
+          f"({slow} slow, {processes} client processes)")
+
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    for seq in range(messages):
+        message = json.dumps({
+            "seq": seq,
+            "sent": time.time(),
+            "machine_id": f"machine-{seq % 50:02d}",
+            "alarm_name": "Overfill",
+            "alarm_type": "AlarmOverfill",
+            "state": "RAISED" if seq % 2 == 0 else "CLEARED",
+            "timestamp": "2025-01-01T00:00:00Z",
+        })
+        broadcaster.broadcast(message)
+        await asyncio.sleep(max(0.0, started + (seq + 1) * interval - time.perf_counter()))
+    broadcast_seconds = time.perf_counter() - started
+
+    # Keep serving while the client processes finish
+    loop = asyncio.get_running_loop()
+    results = []
+    for _ in workers:
+        results.extend(await loop.run_in_executor(None, result_queue.get))
+    for worker in workers:
+        worker.join()
+    server.close()
+    await server.wait_closed()
+    return results, broadcaster.dropped, broadcast_seconds
+
+
+def report(results, messages, rate, dropped, broadcast_seconds):
+    fast = [latency for _, latency, is_slow in results if not is_slow]
+    slow = [latency for _, latency, is_slow in results if is_slow]
+    last = {}
+    for seq, latency, is_slow in results:
+        if not is_slow:
+            last[seq] = max(last.get(seq, 0.0), latency)
+
+    print(f"📨 {messages} broadcasts in {broadcast_seconds:.1f}s (target {rate}/s), "
+          f"{len(fast)} deliveries to fast clients")
+    for name, values in (("per delivery", fast), ("per broadcast (last client)", list(last.values())),
+                         ("slow clients", slow)):
+        if values:
+            print(f"   {name:28s} p50 {percentile(values, 50) * 1000:8.2f} ms | "
+                  f"p95 {percentile(values, 95) * 1000:8.2f} ms | p99 {percentile(values, 99) * 1000:8.2f} ms | "
+                  f"max {max(values) * 1000:8.2f} ms")
+    print(f"   dropped for slow clients: {dropped}")
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    slow = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    processes = int(sys.argv[5]) if len(sys.argv) > 5 else 4
+    raise_fd_limit(clients + 100)
+    results, dropped, broadcast_seconds = asyncio.run(serve_and_broadcast(clients, messages, rate, slow, processes))
+    report(results, messages, rate, dropped, broadcast_seconds)
@@ -11,7 +11,7 @@ export MQTT_PASSWORD=influxdb_writer_pass
 export MQTT_TLS_ENABLED=false  # Disable TLS for local dev - overrides .env
 export CA_CERT_PATH=mosquitto/config/certs/ca.crt
 export MQTT_TLS_CHECK_HOSTNAME=false
-export ALARM_EVENTS_FILE=/tmp/alarm_events.json
+export ALARM_EVENTS_DIR=/tmp/alarm_events
 
 echo "🚨 Starting Alarm Monitor..."
 python3 alarm_monitor/alarm_monitor.py
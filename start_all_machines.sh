@@ -1,6 +1,7 @@
 #!/bin/bash
 # Start mock PLC agents for all machines
 # This will start machine-01, machine-02, and machine-03 in separate terminals
+# For more machines, run them all in one process: ./start_fleet_sim.sh [bottlefillers] [lathes]
 
 cd "$(dirname "$0")"
 
@@ -0,0 +1,27 @@
+#!/bin/bash
+# Start the Fleet Simulator: many bottle fillers and lathes in one process
+# Usage: start_fleet_sim.sh [bottlefillers] [lathes] [mqtt connections]
+
+export FLEET_BOTTLEFILLERS=${1:-${FLEET_BOTTLEFILLERS:-100}}
+export FLEET_LATHES=${2:-${FLEET_LATHES:-20}}
+export FLEET_MQTT_CONNECTIONS=${3:-${FLEET_MQTT_CONNECTIONS:-4}}
+
+# Get script directory (works in both local and Replit)
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd "$SCRIPT_DIR"
+
+echo "🚀 Starting Fleet Simulator..."
+echo "   Working directory: $(pwd)"
+echo "   Machines: $FLEET_BOTTLEFILLERS bottle fillers, $FLEET_LATHES lathes over $FLEET_MQTT_CONNECTIONS MQTT connections"
+
+# Use python3 or python depending on what's available
+if command -v python3 &> /dev/null; then
+    PYTHON_CMD=python3
+elif command -v python &> /dev/null; then
+    PYTHON_CMD=python
+else
+    echo "❌ Error: Python not found!"
+    exit 1
+fi
+
+$PYTHON_CMD fleet_sim/fleet_sim.py
@@ -20,8 +20,8 @@ fi
 
 if [ "$MODE" == "save" ] || [ "$MODE" == "both" ]; then
     export SAVE_JSON_DATA=true
-    export JSON_OUTPUT_FILE="/tmp/mock_plc_data_${MACHINE_ID}.json"
-    echo "✅ JSON saving enabled: $JSON_OUTPUT_FILE"
+    export JSON_OUTPUT_FILE="/tmp/mock_plc_data_${MACHINE_ID}.jsonl"
+    echo "✅ JSON saving enabled: ${JSON_OUTPUT_FILE%.jsonl}.*.jsonl"
 fi
 
 echo "🚀 Starting Mock PLC Agent for $MACHINE_ID (Debug Mode)..."
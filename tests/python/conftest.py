@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Python packages (influxdb_writer, alarm_monitor, ...) live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
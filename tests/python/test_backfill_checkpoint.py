@@ -0,0 +1,55 @@
+import json
+
+from alarm_monitor.backfill_checkpoint import BackfillCheckpoint
+
+
+def test_missing_file_starts_empty(tmp_path):
+    checkpoint = BackfillCheckpoint(str(tmp_path / "checkpoint.json"))
+    assert checkpoint.entries == {}
+    assert checkpoint.last_run is None
+    assert checkpoint.get("machine-01", "AlarmOverfill") is None
+
+
+def test_saved_checkpoints_resume_in_a_new_run(tmp_path):
+    path = str(tmp_path / "state" / "checkpoint.json")  # directory is created on save
+    checkpoint = BackfillCheckpoint(path)
+    checkpoint.set("machine-01", "AlarmOverfill", "2025-01-15T10:30:00Z", 1)
+    checkpoint.set("machine-02", "AlarmOverfill", "2025-01-15T10:31:00Z", False)
+    checkpoint.last_run = "2025-01-15T10:35:00Z"
+    checkpoint.save()
+
+    resumed = BackfillCheckpoint(path)
+    assert resumed.get("machine-01", "AlarmOverfill") == ("2025-01-15T10:30:00Z", True)
+    assert resumed.get("machine-02", "AlarmOverfill") == ("2025-01-15T10:31:00Z", False)
+    assert resumed.get("machine-01", "AlarmUnderfill") is None
+    assert resumed.last_run == "2025-01-15T10:35:00Z"
+    assert sorted(p.name for p in (tmp_path / "state").iterdir()) == ["checkpoint.json"]  # no .tmp left
+
+
+def test_advancing_one_series_keeps_the_others(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = BackfillCheckpoint(path)
+    checkpoint.set("machine-01", "AlarmOverfill", "2025-01-15T10:30:00Z", True)
+    checkpoint.set("machine-01", "AlarmCapMissing", "2025-01-15T10:30:00Z", False)
+    checkpoint.save()
+
+    # A run filtered to one series advances it and leaves last_run alone
+    checkpoint = BackfillCheckpoint(path)
+    checkpoint.set("machine-01", "AlarmOverfill", "2025-01-15T11:00:00Z", False)
+    checkpoint.save()
+
+    resumed = BackfillCheckpoint(path)
+    assert resumed.get("machine-01", "AlarmOverfill") == ("2025-01-15T11:00:00Z", False)
+    assert resumed.get("machine-01", "AlarmCapMissing") == ("2025-01-15T10:30:00Z", False)
+    assert resumed.last_run is None
+
+
+def test_loads_files_from_before_last_run(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"machine-01|AlarmOverfill": {"time": "2025-01-15T10:30:00Z", "value": True}}))
+
+    checkpoint = BackfillCheckpoint(str(path))
+    assert checkpoint.get("machine-01", "AlarmOverfill") == ("2025-01-15T10:30:00Z", True)
+    assert checkpoint.last_run is None
+    checkpoint.save()  # rewritten in the current format
+    assert set(json.loads(path.read_text())) == {"last_run", "series"}
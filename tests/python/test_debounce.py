@@ -0,0 +1,51 @@
+from alarm_monitor.debounce import CLEARED, FLAPPING, RAISED, AlarmDebouncer
+
+
+def test_zero_delays_report_every_edge_of_every_bit():
+    debouncer = AlarmDebouncer()
+    assert debouncer.update_mask("m1", 0b101, 0.0) == [(0, RAISED), (2, RAISED)]
+    assert debouncer.update_mask("m1", 0b101, 1.0) == ()  # nothing moved
+    assert debouncer.update_mask("m1", 0b110, 2.0) == [(0, CLEARED), (1, RAISED)]
+    assert debouncer.update_mask("m2", 0b001, 2.0) == [(0, RAISED)]  # machines are independent
+
+
+def test_on_and_off_delays_settle_on_later_messages():
+    debouncer = AlarmDebouncer(on_delay=1.0, off_delay=2.0)
+    assert debouncer.update_mask("m1", 0b10, 0.0) == []
+    assert debouncer.update_mask("m1", 0b10, 0.5) == []  # unchanged but still settling
+    assert debouncer.update_mask("m1", 0b10, 1.0) == [(1, RAISED)]
+    assert debouncer.update_mask("m1", 0b10, 5.0) == ()  # settled bits are not revisited
+
+    assert debouncer.update_mask("m1", 0b00, 6.0) == []
+    assert debouncer.update_mask("m1", 0b00, 7.0) == []
+    assert debouncer.update_mask("m1", 0b00, 8.0) == [(1, CLEARED)]
+
+
+def test_blip_shorter_than_the_on_delay_is_not_reported():
+    debouncer = AlarmDebouncer(on_delay=1.0)
+    assert debouncer.update_mask("m1", 0b1, 0.0) == []
+    assert debouncer.update_mask("m1", 0b0, 0.4) == []
+    assert debouncer.update_mask("m1", 0b0, 5.0) == ()
+
+
+def test_flapping_is_reported_once_then_the_settled_value():
+    debouncer = AlarmDebouncer(flap_window=10.0, flap_count=4, flap_clear=5.0)
+    assert debouncer.update_mask("m1", 0b1, 0.0) == [(0, RAISED)]
+    assert debouncer.update_mask("m1", 0b0, 1.0) == [(0, CLEARED)]
+    assert debouncer.update_mask("m1", 0b1, 2.0) == [(0, RAISED)]
+    assert debouncer.update_mask("m1", 0b0, 3.0) == [(0, FLAPPING)]  # 4th toggle within 10s
+
+    assert debouncer.update_mask("m1", 0b1, 4.0) == []  # no events while flapping
+    assert debouncer.update_mask("m1", 0b0, 5.0) == []
+    assert debouncer.update_mask("m1", 0b0, 9.0) == []  # quiet for 4s < flap_clear
+    assert debouncer.update_mask("m1", 0b0, 10.0) == [(0, CLEARED)]
+    assert debouncer.update_mask("m1", 0b0, 11.0) == ()
+
+    # Toggle history was reset: it takes flap_count new toggles to flap again
+    assert debouncer.update_mask("m1", 0b1, 12.0) == [(0, RAISED)]
+
+
+def test_toggles_spread_beyond_the_flap_window_do_not_flap():
+    debouncer = AlarmDebouncer(flap_window=10.0, flap_count=4, flap_clear=5.0)
+    states = [debouncer.update_mask("m1", 0b1 if i % 2 == 0 else 0b0, i * 5.0) for i in range(6)]
+    assert [events[0][1] for events in states] == [RAISED, CLEARED] * 3
@@ -0,0 +1,87 @@
+import time
+
+from influxdb_writer.line_protocol import LineProtocolEncoder
+from influxdb_writer.rollups import RollupAggregator
+
+NS = 1_000_000_000
+TAGS = (("machine_id", "machine-01"), ("machine_type", "lathe"))
+
+
+def aggregator(windows=(60,), grace=10.0):
+    rows = []
+    rollups = RollupAggregator(LineProtocolEncoder("plc_data"), lambda line, *_: rows.append(parse(line)),
+                               windows=windows, grace=grace)
+    return rollups, rows
+
+
+def parse(line):
+    """(window, {field: value}, timestamp_ns) from an emitted row"""
+    head, fields, timestamp = line.decode().split(" ")
+    window = dict(tag.split("=") for tag in head.split(",")[1:])["window"]
+    values = {}
+    for item in fields.split(","):
+        name, value = item.split("=")
+        values[name] = int(value[:-1]) if value.endswith("i") else float(value)
+    return window, values, int(timestamp)
+
+
+def test_out_of_order_points_within_an_open_window_are_aggregated():
+    rollups, rows = aggregator()
+    for second, value in ((10, 3.0), (5, 1.0), (40, 5.0), (20, 2.0)):
+        rollups.add("machine-01", TAGS, {"Speed": value}, second * NS)
+    assert rows == []
+
+    rollups.add("machine-01", TAGS, {"Speed": 9.0}, 65 * NS)  # first point of the next window closes it
+    window, values, timestamp = rows[0]
+    assert (window, timestamp) == ("1m", 60 * NS)  # stamped at the window stop
+    assert values["Speed_min"] == 1.0
+    assert values["Speed_max"] == 5.0
+    assert values["Speed_mean"] == 11.0 / 4
+    assert values["Speed_count"] == 4
+    assert values["Speed_last"] == 2.0  # last to arrive
+    assert rollups.late == 0
+
+
+def test_points_for_a_closed_window_are_counted_late_and_skipped():
+    rollups, rows = aggregator()
+    rollups.add("machine-01", TAGS, {"Speed": 1.0}, 30 * NS)
+    rollups.add("machine-01", TAGS, {"Speed": 2.0}, 70 * NS)
+    rollups.add("machine-01", TAGS, {"Speed": 100.0}, 50 * NS)  # the 0-60s window is already written
+    rollups.add("machine-01", TAGS, {"Speed": 4.0}, 65 * NS)  # older than the newest point, same open window
+    assert rollups.late == 1
+    assert len(rows) == 1
+
+    rollups.stop()
+    window, values, timestamp = rows[1]
+    assert timestamp == 120 * NS
+    assert values["Speed_count"] == 2
+    assert values["Speed_max"] == 4.0
+
+
+def test_closed_windows_merge_into_their_parent():
+    rollups, rows = aggregator(windows=(60, 300))
+    for second in range(0, 310, 30):
+        rollups.add("machine-01", TAGS, {"Speed": float(second), "Running": True}, second * NS)
+    by_window = {}
+    for window, values, timestamp in rows:
+        by_window.setdefault(window, []).append((timestamp, values))
+
+    assert [timestamp for timestamp, _ in by_window["1m"]] == [s * NS for s in (60, 120, 180, 240, 300)]
+    (timestamp, values), = by_window["5m"]
+    assert timestamp == 300 * NS
+    assert values["Speed_count"] == 10
+    assert (values["Speed_min"], values["Speed_max"], values["Speed_last"]) == (0.0, 270.0, 270.0)
+    assert not any(name.startswith("Running") for name in values)  # bools are not rolled up
+
+
+def test_idle_machine_windows_close_on_arrival_time():
+    rollups, rows = aggregator(grace=10.0)
+    rollups.add("machine-01", TAGS, {"Speed": 1.0}, 55 * NS)
+    arrived = time.monotonic()
+
+    rollups.flush_idle(now=arrived + 14)  # projected 55 + 14 - 10 = 59s: still inside the window
+    assert rows == []
+    rollups.flush_idle(now=arrived + 16)  # projected 61s
+    assert [(window, timestamp) for window, _, timestamp in rows] == [("1m", 60 * NS)]
+    rollups.add("machine-01", TAGS, {"Speed": 2.0}, 58 * NS)
+    assert rollups.late == 1
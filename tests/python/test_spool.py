@@ -0,0 +1,79 @@
+import os
+
+from influxdb_writer.spool import Spool
+
+
+def lines(start, count):
+    return [f"m,machine_id=m{i} v={i}i {i}".encode() for i in range(start, start + count)]
+
+
+def replay_all(spool, max_lines=7):
+    out = []
+    while True:
+        batch = spool.read_batch(max_lines)
+        if not batch:
+            return out
+        out.extend(batch)
+        spool.commit(len(batch))
+
+
+def test_rotates_segments_at_segment_bytes(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=100, fsync_interval=0)
+    for start in range(0, 40, 4):
+        spool.append(lines(start, 4))
+    spool.close()
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == spool.segment_count > 1
+    assert names[0] == "0000000001.lp"
+    # A segment is only closed after it reaches segment_bytes, so all but the last are at least that big
+    assert all(os.path.getsize(tmp_path / name) >= 100 for name in names[:-1])
+    assert spool.total_bytes == sum(os.path.getsize(tmp_path / name) for name in names)
+
+
+def test_replays_oldest_first_across_segments_and_restarts(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=100, fsync_interval=0)
+    spool.append(lines(0, 10))
+    spool.append(lines(10, 10))
+    spool.close()
+
+    spool = Spool(str(tmp_path), segment_bytes=100, fsync_interval=0)
+    spool.append(lines(20, 5))  # goes to a new segment after the existing ones
+    assert replay_all(spool) == lines(0, 25)
+    assert not spool.pending
+    assert spool.replayed == 25
+    assert os.listdir(tmp_path) == []
+
+
+def test_rollback_rereads_the_same_batch(tmp_path):
+    spool = Spool(str(tmp_path), fsync_interval=0)
+    spool.append(lines(0, 5))
+    assert spool.read_batch(3) == lines(0, 3)
+    spool.rollback()
+    assert spool.read_batch(3) == lines(0, 3)
+    spool.commit(3)
+    assert replay_all(spool) == lines(3, 2)
+
+
+def test_size_cap_evicts_oldest_segments(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=300, segment_bytes=100, fsync_interval=0)
+    for start in range(0, 60, 5):
+        spool.append(lines(start, 5))
+
+    assert spool.total_bytes <= 300 + 100  # the newest segment may still be filling
+    assert spool.evicted_bytes > 0
+    replayed = replay_all(spool)
+    # What survives is a contiguous tail of what was appended, still in order
+    assert replayed == lines(60 - len(replayed), len(replayed))
+    assert len(replayed) < 60
+
+
+def test_reopen_drops_a_torn_last_line(tmp_path):
+    spool = Spool(str(tmp_path), fsync_interval=0)
+    spool.append(lines(0, 3))
+    spool.close()
+    with open(tmp_path / "0000000001.lp", "ab") as f:
+        f.write(b"m,machine_id=m9 v=")  # crash mid-append
+
+    spool = Spool(str(tmp_path), fsync_interval=0)
+    assert replay_all(spool) == lines(0, 3)
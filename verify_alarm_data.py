@@ -5,17 +5,21 @@ Verify Alarm Data - Check what alarms are being received and displayed
 import asyncio
 import websockets
 import json
+import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from alarm_monitor.event_log import read_events
+
 WS_URL = "ws://localhost:8765"
-ALARM_EVENTS_FILE = "/tmp/alarm_events.json"
+ALARM_EVENTS_DIR = os.getenv("ALARM_EVENTS_DIR", "/tmp/alarm_events")
 
 def load_json_events():
-    """Load events from JSON file"""
+    """Load the most recent events from the alarm event log"""
     try:
-        with open(ALARM_EVENTS_FILE, 'r') as f:
-            return json.load(f)
-    except:
+        return read_events(ALARM_EVENTS_DIR, limit=1000)
+    except OSError:
         return []
 
 async def verify_websocket_alarms():
@@ -91,16 +95,16 @@ async def verify_websocket_alarms():
         for machine_id, count in machines.items():
             print(f"   - {machine_id}: {count}")
     
-    # Compare with JSON file
+    # Compare with the event log
     print(f"\n{'='*80}")
-    print("📄 COMPARING WITH JSON FILE")
+    print("📄 COMPARING WITH EVENT LOG")
     print("=" * 80)
     json_events = load_json_events()
-    print(f"   Events in JSON file: {len(json_events)}")
+    print(f"   Events in event log: {len(json_events)}")
     
     if json_events:
         recent_json = json_events[-5:]  # Last 5 events
-        print(f"\n   Last 5 events in JSON file:")
+        print(f"\n   Last 5 events in event log:")
         for i, event in enumerate(recent_json, 1):
             print(f"   {i}. {event.get('alarm_type', 'N/A')} - {event.get('state', 'N/A')} - {event.get('timestamp', 'N/A')[:19]}")
     